@@ -0,0 +1,21 @@
+# configurations/gunicorn_asgi.py
+# Profil de déploiement ASGI (workers uvicorn, boucle asyncio par processus) :
+#   gunicorn -c configurations/gunicorn_asgi.py
+# Les vues asynchrones (flux SSE du tableau de bord, API JSON et HTMX) y
+# sont servies sans bloquer un worker ; les vues synchrones restent servies
+# via le pool de threads de Django.
+import multiprocessing
+
+import decouple
+
+from configurations.gunicorn_metriques import child_exit, on_starting, post_fork  # noqa: F401
+
+wsgi_app = 'configurations.asgi:application'
+bind = decouple.config('GUNICORN_BIND', default='127.0.0.1:8000')
+worker_class = 'uvicorn_worker.UvicornWorker'
+# Un worker asynchrone gère de nombreuses connexions : un par cœur suffit
+workers = decouple.config('GUNICORN_WORKERS', default=multiprocessing.cpu_count(), cast=int)
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+# Laisse aux flux SSE ouverts le temps de se fermer lors d'un redémarrage
+graceful_timeout = decouple.config('GUNICORN_GRACEFUL_TIMEOUT', default=10, cast=int)
+accesslog = decouple.config('GUNICORN_ACCESSLOG', default='-')
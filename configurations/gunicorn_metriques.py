@@ -0,0 +1,33 @@
+# configurations/gunicorn_metriques.py
+# Hooks gunicorn communs aux profils WSGI et ASGI : les workers écrivent leurs
+# métriques Prometheus dans PROMETHEUS_MULTIPROC_DIR, agrégé par /metrics
+import os
+import shutil
+from pathlib import Path
+
+import decouple
+
+REPERTOIRE_METRIQUES = decouple.config(
+    'PROMETHEUS_MULTIPROC_DIR',
+    default=str(Path(__file__).resolve().parent.parent / 'cache' / 'metriques'),
+)
+# Doit être défini avant le premier import de prometheus_client (hérité par les workers)
+os.environ['PROMETHEUS_MULTIPROC_DIR'] = REPERTOIRE_METRIQUES
+
+
+def on_starting(server):
+    """Repart de compteurs vides à chaque démarrage du master"""
+    shutil.rmtree(REPERTOIRE_METRIQUES, ignore_errors=True)
+    os.makedirs(REPERTOIRE_METRIQUES)
+
+
+def post_fork(server, worker):
+    """Numéro du worker (stable sur sa durée de vie) pour le label 'worker'"""
+    os.environ['GUNICORN_WORKER_ID'] = str(worker.age)
+
+
+def child_exit(server, worker):
+    """Retire les jauges du worker arrêté"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,16 @@
+# configurations/gunicorn_wsgi.py
+# Profil de déploiement WSGI (workers synchrones) :
+#   gunicorn -c configurations/gunicorn_wsgi.py
+import multiprocessing
+
+import decouple
+
+from configurations.gunicorn_metriques import child_exit, on_starting, post_fork  # noqa: F401
+
+wsgi_app = 'configurations.wsgi:application'
+bind = decouple.config('GUNICORN_BIND', default='127.0.0.1:8000')
+worker_class = 'sync'
+# Un worker synchrone traite une requête à la fois
+workers = decouple.config('GUNICORN_WORKERS', default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+accesslog = decouple.config('GUNICORN_ACCESSLOG', default='-')
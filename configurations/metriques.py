@@ -0,0 +1,211 @@
+# configurations/metriques.py
+"""
+Métriques Prometheus de l'application, exposées par la vue metrics (/metrics).
+
+Sous gunicorn, PROMETHEUS_MULTIPROC_DIR (voir configurations/gunicorn_metriques.py)
+fait écrire chaque worker dans des fichiers partagés : la vue agrège alors
+les valeurs de tous les workers, sans service extérieur.
+"""
+import hmac
+import os
+import time
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.backends.signals import connection_created
+from django.db.utils import OperationalError
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+SEUILS_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SEUILS_REQUETES = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SEUILS_TAILLE = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Identifiant du worker : numéro gunicorn (posé par post_fork) ou, à défaut, pid
+WORKER = os.environ.get('GUNICORN_WORKER_ID') or str(os.getpid())
+
+DUREE_REQUETES = Histogram(
+    'django_http_request_duration_seconds',
+    'Durée des requêtes HTTP par vue et statut',
+    ['view', 'status'],
+    buckets=SEUILS_DUREE,
+)
+REQUETES_SQL = Histogram(
+    'django_http_db_queries',
+    'Nombre de requêtes SQL par requête HTTP',
+    ['view'],
+    buckets=SEUILS_REQUETES,
+)
+DUREE_SQL = Histogram(
+    'django_http_db_duration_seconds',
+    'Temps passé en base par requête HTTP',
+    ['view'],
+    buckets=SEUILS_DUREE,
+)
+REQUETES_SQL_DUPLIQUEES = Counter(
+    'django_http_db_duplicate_queries',
+    'Requêtes SQL identiques (SQL et paramètres) répétées dans une même requête HTTP',
+    ['view'],
+)
+REQUETES_WORKER = Counter(
+    'django_worker_requests',
+    'Requêtes HTTP traitées par worker',
+    ['worker'],
+)
+INFO_WORKER = Gauge(
+    'django_worker_info',
+    'Workers vivants (1 par worker)',
+    ['worker'],
+    multiprocess_mode='liveall',
+)
+ACCES_CACHE = Counter(
+    'django_cache_requests',
+    'Lectures dans les caches Django',
+    ['cache', 'result'],
+)
+ATTENTE_VERROU_SQLITE = Histogram(
+    'django_sqlite_lock_wait_seconds',
+    "Durée d'acquisition du verrou d'écriture SQLite (BEGIN IMMEDIATE)",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5),
+)
+ATTENTES_VERROU_SQLITE = Counter(
+    'django_sqlite_lock_waits',
+    "Transactions ayant attendu le verrou d'écriture SQLite (nouvelles tentatives du busy handler)",
+)
+VERROU_SQLITE_EXPIRE = Counter(
+    'django_sqlite_lock_timeouts',
+    "Erreurs 'database is locked' (busy_timeout écoulé)",
+)
+EVALUATIONS_SOUMISES = Counter(
+    'suivi_evaluations_submitted',
+    'Évaluations enregistrées',
+)
+
+
+def observer_requete(mesure):
+    """Alimente les métriques à partir d'une mesure de MesurePerformanceMiddleware"""
+    vue = mesure['vue']
+    DUREE_REQUETES.labels(view=vue, status=mesure['statut']).observe(mesure['duree'])
+    REQUETES_SQL.labels(view=vue).observe(mesure['requetes'])
+    DUREE_SQL.labels(view=vue).observe(mesure['duree_bd'])
+    if mesure['doublons']:
+        REQUETES_SQL_DUPLIQUEES.labels(view=vue).inc(mesure['doublons'])
+    REQUETES_WORKER.labels(worker=WORKER).inc()
+    INFO_WORKER.labels(worker=WORKER).set(1)
+
+
+# Caches instrumentés : hit/miss comptés sur chaque get()
+
+_ABSENT = object()
+
+
+class CompteurCacheMixin:
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.nom_metrique = params.get('METRICS_NAME', location or 'default')
+
+    def get(self, key, default=None, version=None):
+        valeur = super().get(key, _ABSENT, version)
+        ACCES_CACHE.labels(cache=self.nom_metrique, result='miss' if valeur is _ABSENT else 'hit').inc()
+        return default if valeur is _ABSENT else valeur
+
+
+class LocMemCacheInstrumente(CompteurCacheMixin, LocMemCache):
+    pass
+
+
+class FileBasedCacheInstrumente(CompteurCacheMixin, FileBasedCache):
+    pass
+
+
+# Attente du verrou SQLite : avec transaction_mode IMMEDIATE, le BEGIN attend
+# (busy_timeout) qu'aucune autre connexion n'écrive ; sa durée est l'attente du verrou
+
+SEUIL_ATTENTE_VERROU = 0.001
+
+
+def mesurer_verrou_sqlite(execute, sql, params, many, context):
+    debut = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    except OperationalError as e:
+        if 'locked' in str(e):
+            VERROU_SQLITE_EXPIRE.inc()
+        raise
+    finally:
+        if sql.startswith('BEGIN'):
+            attente = time.perf_counter() - debut
+            ATTENTE_VERROU_SQLITE.observe(attente)
+            if attente > SEUIL_ATTENTE_VERROU:
+                ATTENTES_VERROU_SQLITE.inc()
+
+
+@receiver(connection_created)
+def instrumenter_connexion(sender, connection, **kwargs):
+    """
+    En tête de liste : la connexion peut être ouverte pendant un connection.execute_wrapper(),
+    qui retire en sortie le dernier wrapper de la liste
+    """
+    if connection.vendor == 'sqlite' and mesurer_verrou_sqlite not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, mesurer_verrou_sqlite)
+
+
+class CollecteurRatiosCache:
+    """Ajoute django_cache_hit_ratio, calculé à partir de django_cache_requests"""
+
+    def __init__(self, source):
+        self.source = source
+
+    def collect(self):
+        for famille in self.source.collect():
+            yield famille
+            if famille.name != 'django_cache_requests':
+                continue
+            acces = {}
+            for echantillon in famille.samples:
+                if echantillon.name.endswith('_total'):
+                    compteurs = acces.setdefault(echantillon.labels['cache'], {'hit': 0, 'miss': 0})
+                    compteurs[echantillon.labels['result']] += echantillon.value
+            ratio = GaugeMetricFamily(
+                'django_cache_hit_ratio', 'Part des lectures de cache réussies', labels=['cache']
+            )
+            for cache, compteurs in sorted(acces.items()):
+                total = compteurs['hit'] + compteurs['miss']
+                ratio.add_metric([cache], compteurs['hit'] / total if total else 0)
+            yield ratio
+
+
+def registre_metriques():
+    """Registre agrégeant tous les workers si PROMETHEUS_MULTIPROC_DIR est défini"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        source = CollectorRegistry()
+        multiprocess.MultiProcessCollector(source)
+    else:
+        source = REGISTRY
+    registre = CollectorRegistry(auto_describe=False)
+    registre.register(CollecteurRatiosCache(source))
+    return registre
+
+
+def jeton_valide(request):
+    """En-tête Authorization: Bearer égal à METRICS_TOKEN (comparaison à temps constant)"""
+    schema, _, jeton = request.headers.get('Authorization', '').partition(' ')
+    return bool(settings.METRICS_TOKEN) and schema.lower() == 'bearer' and hmac.compare_digest(
+        jeton.strip().encode(), settings.METRICS_TOKEN.encode()
+    )
+
+
+def metrics(request):
+    """
+    Métriques au format texte Prometheus : adresse dans METRICS_ALLOWED_IPS et jeton
+    METRICS_TOKEN exigés (une requête relayée par un proxy local vient de 127.0.0.1)
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS or not jeton_valide(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(registre_metriques()), content_type=CONTENT_TYPE_LATEST)
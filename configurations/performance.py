@@ -0,0 +1,264 @@
+# configurations/performance.py
+"""
+Mesure des performances par vue.
+
+Le middleware MesurePerformanceMiddleware enregistre, pour chaque vue résolue
+(ex. 'suivi_conducteurs:conducteur_list') : durée totale, temps passé en base,
+nombre de requêtes SQL, requêtes dupliquées et taille de la réponse. Les
+valeurs sont agrégées dans des histogrammes en mémoire (par processus).
+Un avertissement structuré est journalisé quand un budget est dépassé ou
+quand une même forme de requête SQL se répète (N+1 probable).
+"""
+import json
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.db import connections
+
+from . import metriques
+from .metriques import SEUILS_DUREE, SEUILS_REQUETES, SEUILS_TAILLE
+
+logger = logging.getLogger('performance')
+
+VUE_NON_RESOLUE = '<non résolue>'
+
+# Listes IN (%s, %s, ...) de longueur variable ramenées à une seule forme
+_LISTE_PARAMETRES = re.compile(r'\bIN \(\s*%s(?:\s*,\s*%s)*\s*\)', re.IGNORECASE)
+
+
+def forme_sql(sql):
+    """Forme d'une requête : le SQL paramétré, sans la longueur des listes IN"""
+    return _LISTE_PARAMETRES.sub('IN (%s, ...)', sql)
+
+
+class Histogramme:
+    """Histogramme cumulatif à seuils fixes (compatible avec le format Prometheus)"""
+
+    def __init__(self, seuils):
+        self.seuils = seuils
+        self.compteurs = [0] * (len(seuils) + 1)  # dernier compartiment : +Inf
+        self.somme = 0
+        self.nombre = 0
+
+    def observer(self, valeur):
+        self.compteurs[bisect_left(self.seuils, valeur)] += 1
+        self.somme += valeur
+        self.nombre += 1
+
+    def cumuls(self):
+        """Liste de (seuil, nombre d'observations <= seuil), +Inf en dernier"""
+        total = 0
+        resultat = []
+        for seuil, compteur in zip(self.seuils + (float('inf'),), self.compteurs):
+            total += compteur
+            resultat.append((seuil, total))
+        return resultat
+
+    def quantile(self, q):
+        """Estimation (borne haute du compartiment) du quantile q"""
+        if not self.nombre:
+            return None
+        rang = q * self.nombre
+        for seuil, cumul in self.cumuls():
+            if cumul >= rang:
+                return seuil
+        return float('inf')
+
+
+class StatistiquesVue:
+    """Histogrammes d'une vue"""
+
+    def __init__(self):
+        self.duree = Histogramme(SEUILS_DUREE)
+        self.duree_bd = Histogramme(SEUILS_DUREE)
+        self.requetes = Histogramme(SEUILS_REQUETES)
+        self.doublons = Histogramme(SEUILS_REQUETES)
+        self.taille = Histogramme(SEUILS_TAILLE)
+        self.statuts = Counter()
+
+
+class RegistrePerformance:
+    """Statistiques par vue, partagées par les threads d'un processus"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._vues = {}
+
+    def enregistrer(self, mesure):
+        with self._verrou:
+            stats = self._vues.setdefault(mesure['vue'], StatistiquesVue())
+            stats.duree.observer(mesure['duree'])
+            stats.duree_bd.observer(mesure['duree_bd'])
+            stats.requetes.observer(mesure['requetes'])
+            stats.doublons.observer(mesure['doublons'])
+            if mesure['taille'] is not None:
+                stats.taille.observer(mesure['taille'])
+            stats.statuts[mesure['statut']] += 1
+
+    def vues(self):
+        with self._verrou:
+            return dict(self._vues)
+
+    def vider(self):
+        with self._verrou:
+            self._vues.clear()
+
+
+registre = RegistrePerformance()
+
+
+class _CompteurRequetes:
+    """execute_wrapper : chronomètre et mémorise chaque requête SQL de la requête HTTP"""
+
+    def __init__(self):
+        self.duree = 0.0
+        self.requetes = []
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duree += time.perf_counter() - debut
+            self.requetes.append((sql, repr(params)))
+
+
+@contextmanager
+def wrapper_execution(connection, wrapper):
+    """
+    Comme connection.execute_wrapper, mais retire ce wrapper-là en sortie, et non le
+    dernier de la liste (un autre a pu être ajouté entre-temps, à l'ouverture de la connexion)
+    """
+    connection.execute_wrappers.append(wrapper)
+    try:
+        yield
+    finally:
+        connection.execute_wrappers.remove(wrapper)
+
+
+def budget_vue(vue):
+    """Budget de la vue : valeurs par défaut surchargées par PERFORMANCE_BUDGETS[vue]"""
+    budgets = getattr(settings, 'PERFORMANCE_BUDGETS', {})
+    budget = dict(budgets.get('default', {}))
+    budget.update(budgets.get(vue, {}))
+    return budget
+
+
+class MesurePerformanceMiddleware:
+    """
+    Mesure chaque requête HTTP et alimente le registre de performance. Synchrone et
+    asynchrone : sous ASGI, les vues asynchrones ne passent pas par un thread pour lui
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        compteur = _CompteurRequetes()
+        debut = time.perf_counter()
+        with self.instrumenter(compteur):
+            response = self.get_response(request)
+        self.enregistrer(request, response, compteur, time.perf_counter() - debut)
+        return response
+
+    async def __acall__(self, request):
+        # Les connexions sont propres à un thread : les wrappers sont posés (et retirés) dans
+        # le thread où sync_to_async exécute l'ORM pour cette requête (thread_sensitive)
+        compteur = _CompteurRequetes()
+        debut = time.perf_counter()
+        pile = await sync_to_async(self.instrumenter)(compteur)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pile.close)()
+        self.enregistrer(request, response, compteur, time.perf_counter() - debut)
+        return response
+
+    @staticmethod
+    def instrumenter(compteur):
+        pile = ExitStack()
+        for connection in connections.all():
+            pile.enter_context(wrapper_execution(connection, compteur))
+        return pile
+
+    def enregistrer(self, request, response, compteur, duree):
+        match = getattr(request, 'resolver_match', None)
+        vue = match.view_name if match else VUE_NON_RESOLUE
+        mesure = {
+            'vue': vue,
+            'methode': request.method,
+            'chemin': request.path,
+            'statut': response.status_code,
+            'duree': duree,
+            'duree_bd': compteur.duree,
+            'requetes': len(compteur.requetes),
+            'doublons': len(compteur.requetes) - len(set(compteur.requetes)),
+            'taille': self.taille_reponse(response),
+        }
+        registre.enregistrer(mesure)
+        metriques.observer_requete(mesure)
+        self.verifier_budget(mesure)
+        self.detecter_n_plus_un(mesure, compteur.requetes)
+
+    @staticmethod
+    def taille_reponse(response):
+        if response.has_header('Content-Length'):
+            return int(response['Content-Length'])
+        if response.streaming:
+            return None
+        return len(response.content)
+
+    def verifier_budget(self, mesure):
+        budget = budget_vue(mesure['vue'])
+        depassements = []
+        if 'queries' in budget and mesure['requetes'] > budget['queries']:
+            depassements.append('requetes')
+        if 'duration_ms' in budget and mesure['duree'] * 1000 > budget['duration_ms']:
+            depassements.append('duree')
+        if depassements:
+            self.journaliser('Budget de performance dépassé', {
+                **self.resume(mesure),
+                'depassements': depassements,
+                'budget': budget,
+            })
+
+    def detecter_n_plus_un(self, mesure, requetes):
+        seuil = getattr(settings, 'PERFORMANCE_N_PLUS_ONE_THRESHOLD', 5)
+        formes = Counter(forme_sql(sql) for sql, _ in requetes)
+        repetees = [(forme, nombre) for forme, nombre in formes.most_common() if nombre >= seuil]
+        if repetees:
+            self.journaliser('Requêtes N+1 probables', {
+                **self.resume(mesure),
+                'formes_repetees': [{'sql': forme, 'nombre': nombre} for forme, nombre in repetees],
+            })
+
+    @staticmethod
+    def resume(mesure):
+        return {
+            **mesure,
+            'duree_ms': round(mesure['duree'] * 1000, 1),
+            'duree_bd_ms': round(mesure['duree_bd'] * 1000, 1),
+        }
+
+    @staticmethod
+    def journaliser(message, donnees):
+        donnees = {cle: valeur for cle, valeur in donnees.items() if cle not in ('duree', 'duree_bd')}
+        logger.warning(
+            '%s %s', message, json.dumps(donnees, ensure_ascii=False, default=str),
+            extra={'performance': donnees},
+        )
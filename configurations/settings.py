@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from decouple import Csv, config
 from django.contrib.messages import constants as messages
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'configurations.performance.MesurePerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -81,10 +83,36 @@ WSGI_APPLICATION = 'configurations.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Réglages SQLite appliqués à chaque nouvelle connexion (PRAGMA via init_command)
+# - WAL : les lectures ne bloquent plus l'écriture (et inversement)
+# - synchronous=NORMAL : sûr en WAL, un fsync par checkpoint au lieu d'un par commit
+# - busy_timeout : attente (ms) du verrou d'écriture au lieu d'un "database is locked" immédiat
+# - cache_size négatif : taille du cache de pages en Kio ; mmap_size en octets
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-20000, cast=int),
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=134217728, cast=int),
+    'temp_store': config('SQLITE_TEMP_STORE', default='MEMORY'),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Connexions persistantes (secondes, 0 = une connexion par requête)
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # BEGIN IMMEDIATE : un écrivain prend le verrou dès le début de la
+            # transaction, ce qui évite l'échec lors du passage lecture -> écriture
+            'transaction_mode': config('SQLITE_TRANSACTION_MODE', default='IMMEDIATE'),
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+            'init_command': ';'.join(
+                f'PRAGMA {pragma}={valeur}' for pragma, valeur in SQLITE_PRAGMAS.items()
+            ),
+        },
     }
 }
 
@@ -108,6 +136,19 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Hash des mots de passe : le premier hasher sert à l'encodage, les suivants
+# restent disponibles pour vérifier les anciens hash. Pas de PBKDF2PasswordHasher
+# standard : même algorithme, il remplacerait le hasher configurable pour
+# identifier les hash existants (must_update, harden_runtime)
+PASSWORD_HASHERS = [
+    'gestion_groupes.hashers.PBKDF2IterationsConfigurablesHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -133,9 +174,72 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache
+# Les caches 'sessions' et 'partage' sont sur disque pour être partagés entre
+# les workers gunicorn (et les processus ASGI) d'un même hôte.
+# Les backends instrumentés comptent hits/misses pour /metrics (METRICS_NAME)
+CACHES = {
+    'default': {
+        'BACKEND': 'configurations.metriques.LocMemCacheInstrumente',
+        'METRICS_NAME': 'default',
+    },
+    'sessions': {
+        'BACKEND': 'configurations.metriques.FileBasedCacheInstrumente',
+        'LOCATION': config('SESSION_CACHE_LOCATION', default=str(BASE_DIR / 'cache' / 'sessions')),
+        'METRICS_NAME': 'sessions',
+    },
+    'partage': {
+        'BACKEND': 'configurations.metriques.FileBasedCacheInstrumente',
+        'LOCATION': config('SHARED_CACHE_LOCATION', default=str(BASE_DIR / 'cache' / 'partage')),
+        'METRICS_NAME': 'partage',
+    },
+}
+
+# /metrics : adresses autorisées (serveur Prometheus) et jeton exigé en en-tête
+# « Authorization: Bearer <jeton> » ; derrière un proxy local, l'adresse seule ne
+# prouve rien. Sans jeton, /metrics est fermé
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv(post_process=frozenset))
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Flux SSE du tableau de bord : fréquence de vérification des changements
+# et durée maximale d'une connexion avant reconnexion du navigateur (secondes)
+DASHBOARD_STREAM_INTERVAL = config('DASHBOARD_STREAM_INTERVAL', default=2, cast=float)
+DASHBOARD_STREAM_MAX_DURATION = config('DASHBOARD_STREAM_MAX_DURATION', default=300, cast=int)
+
+# Rétention de l'historique des groupes (mois) : au-delà, archive_group_history
+# déplace les entrées vers l'archive et le résumé mensuel
+HISTORIQUE_RETENTION_MOIS = config('HISTORIQUE_RETENTION_MOIS', default=12, cast=int)
+
+# Instantané binaire des notes projeté en mémoire par les workers (build_notes_snapshot) ;
+# reconstruit quand le nombre de notes créées depuis atteint le seuil
+NOTES_SNAPSHOT_PATH = config('NOTES_SNAPSHOT_PATH', default=str(BASE_DIR / 'cache' / 'notes.snapshot'))
+NOTES_SNAPSHOT_THRESHOLD = config('NOTES_SNAPSHOT_THRESHOLD', default=5000, cast=int)
+
+# Alertes de score à l'enregistrement d'une évaluation (suivi_conducteurs/alertes.py) :
+# score sous le seuil (% du maximum), ou baisse de plus de N points sur l'évaluation
+# précédente du conducteur pour le même type
+ALERTES_SCORE_SEUIL = config('ALERTES_SCORE_SEUIL', default=50, cast=float)
+ALERTES_SCORE_BAISSE = config('ALERTES_SCORE_BAISSE', default=15, cast=float)
+
+# Budgets de performance par vue (nom résolu, ex. 'suivi_conducteurs:conducteur_list') :
+# 'queries' = nombre maximal de requêtes SQL, 'duration_ms' = durée maximale.
+# Un dépassement est journalisé par le logger 'performance'
+PERFORMANCE_BUDGETS = {
+    'default': {
+        'queries': config('PERFORMANCE_BUDGET_QUERIES', default=30, cast=int),
+        'duration_ms': config('PERFORMANCE_BUDGET_DURATION_MS', default=500, cast=int),
+    },
+}
+# Nombre de répétitions d'une même forme de requête SQL signalé comme N+1
+PERFORMANCE_N_PLUS_ONE_THRESHOLD = config('PERFORMANCE_N_PLUS_ONE_THRESHOLD', default=5, cast=int)
+
 # Configuration des sessions
+SESSION_ENGINE = 'gestion_groupes.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
 SESSION_COOKIE_AGE = 3600 * 8  # 8 heures certainement trop long, à voir à l'usage
 SESSION_SAVE_EVERY_REQUEST = True
+# Délai (secondes) en dessous duquel une session non modifiée n'est pas réécrite
+SESSION_SAVE_THRESHOLD = config('SESSION_SAVE_THRESHOLD', default=300, cast=int)
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 
 # Sécurité - Configuration de base
@@ -188,6 +292,31 @@ MESSAGE_TAGS = {
     messages.ERROR: 'danger',  # Bootstrap utilise 'danger' au lieu de 'error'
 }
 
+# Avertissements de performance (budgets dépassés, N+1) sur la console
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '{levelname} {asctime} {name} {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        'performance': {
+            'handlers': ['console'],
+            'level': config('PERFORMANCE_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 # Configuration de logging pour debug
 # LOGGING = {
 #     'version': 1,
@@ -4,6 +4,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
 from gestion_groupes import auth_views
+from suivi_conducteurs import views as suivi_views
+from configurations import metriques
 
 def home_redirect(request):
     """Redirection intelligente selon l'état de connexion"""
@@ -28,6 +30,11 @@ urlpatterns = [
     path('dashboard/', include('suivi_conducteurs.urls')),
     path('groupes/', include('gestion_groupes.urls')),    
     path('api/dashboard-stats/', auth_views.dashboard_stats, name='dashboard_stats'),
+    path('api/recent-activities/', suivi_views.recent_activities, name='recent_activities'),
+    path('api/dashboard-stream/', suivi_views.dashboard_stream, name='dashboard_stream'),
+
+    # Métriques Prometheus (agrégées sur tous les workers gunicorn)
+    path('metrics', metriques.metrics, name='metrics'),
 ]
 
 # Servir les fichiers statiques en développement
@@ -1,11 +1,14 @@
 # gestion_groupes/admin.py
 from django.contrib import admin
-from django.contrib.auth.models import User, Group
+from django.contrib.auth.models import User, Group, Permission
 from django.contrib.auth.admin import UserAdmin, GroupAdmin
+from django.db.models import Count, Prefetch
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import ProfilUtilisateur, GroupeEtendu, HistoriqueGroupes
+from .models import (
+    ProfilUtilisateur, GroupeEtendu, HistoriqueGroupes, HistoriqueGroupesArchive, ResumeHistoriqueGroupes,
+)
 
 # Configuration pour ProfilUtilisateur
 class ProfilUtilisateurInline(admin.StackedInline):
@@ -29,6 +32,7 @@ class ProfilUtilisateurAdmin(admin.ModelAdmin):
     list_filter = ['actif', 'service', 'date_embauche', 'date_creation']
     search_fields = ['user__username', 'user__first_name', 'user__last_name', 'service', 'poste', 'telephone']
     readonly_fields = ['date_creation', 'date_modification']
+    list_select_related = ['user', 'service']
     
     fieldsets = (
         ('Utilisateur', {
@@ -88,11 +92,27 @@ class GroupeEtenduAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('group').annotate(
+            nb_utilisateurs=Count('group__user', distinct=True),
+            nb_permissions=Count('group__permissions', distinct=True)
+        )
+
     def group_name(self, obj):
         return obj.group.name
     group_name.short_description = 'Nom du groupe'
     group_name.admin_order_field = 'group__name'
 
+    def nombre_utilisateurs(self, obj):
+        return obj.nb_utilisateurs
+    nombre_utilisateurs.short_description = 'Nombre utilisateurs'
+    nombre_utilisateurs.admin_order_field = 'nb_utilisateurs'
+
+    def nombre_permissions(self, obj):
+        return obj.nb_permissions
+    nombre_permissions.short_description = 'Nombre permissions'
+    nombre_permissions.admin_order_field = 'nb_permissions'
+
     def couleur_display(self, obj):
         try:
             if obj.groupe_etendu and hasattr(obj.groupe_etendu, 'couleur'):
@@ -116,6 +136,7 @@ class HistoriqueGroupesAdmin(admin.ModelAdmin):
     search_fields = ['group__name', 'utilisateur_modifieur__username', 'utilisateur_cible__username', 'details']
     readonly_fields = ['group', 'action', 'utilisateur_modifieur', 'utilisateur_cible', 'permission_cible', 'details', 'date_action']
     date_hierarchy = 'date_action'
+    list_select_related = ['group', 'utilisateur_modifieur', 'utilisateur_cible']
     
     fieldsets = (
         ('Action', {
@@ -165,12 +186,44 @@ class HistoriqueGroupesAdmin(admin.ModelAdmin):
         return request.user.is_superuser  # Seul le superuser peut supprimer
 
 
+class LectureSeuleAdmin(admin.ModelAdmin):
+    """Données alimentées par archive_group_history : consultation uniquement"""
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+
+@admin.register(HistoriqueGroupesArchive)
+class HistoriqueGroupesArchiveAdmin(LectureSeuleAdmin):
+    list_display = ['group_nom', 'action', 'utilisateur_modifieur_nom', 'utilisateur_cible_nom', 'date_action', 'date_archivage']
+    list_filter = ['action', 'date_action']
+    search_fields = ['group_nom', 'utilisateur_modifieur_nom', 'utilisateur_cible_nom', 'details']
+    date_hierarchy = 'date_action'
+
+
+@admin.register(ResumeHistoriqueGroupes)
+class ResumeHistoriqueGroupesAdmin(LectureSeuleAdmin):
+    list_display = ['mois', 'group_nom', 'action', 'nombre']
+    list_filter = ['action', 'mois']
+    search_fields = ['group_nom']
+
+
 class CustomUserAdmin(UserAdmin):
     inlines = (ProfilUtilisateurInline,)
     
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'is_active', 'groupes_display', 'date_joined')
     list_filter = UserAdmin.list_filter + ('groups', 'profil__service', 'profil__actif')
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('profil').prefetch_related(
+            Prefetch('groups', queryset=Group.objects.select_related('groupe_etendu'))
+        )
+    
     def groupes_display(self, obj):
         if hasattr(obj, 'profil'):
             groupes = obj.groups.all()
@@ -195,11 +248,26 @@ class CustomUserAdmin(UserAdmin):
     groupes_display.short_description = 'Groupes'
 
 
+class PermissionListFilter(admin.RelatedFieldListFilter):
+    """Filtre par permission, types de contenu joints (une requête au lieu d'une par permission)"""
+    def field_choices(self, field, request, model_admin):
+        return [
+            (permission.pk, str(permission))
+            for permission in Permission.objects.select_related('content_type')
+        ]
+
+
 class CustomGroupAdmin(GroupAdmin):
     inlines = (GroupeEtenduInline,)
     
     list_display = ('name', 'niveau_acces_display', 'utilisateurs_count', 'permissions_count', 'couleur_display')
-    list_filter = ('permissions', 'groupe_etendu__niveau_acces', 'groupe_etendu__actif')
+    list_filter = (('permissions', PermissionListFilter), 'groupe_etendu__niveau_acces', 'groupe_etendu__actif')
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('groupe_etendu').annotate(
+            nb_utilisateurs=Count('user', distinct=True),
+            nb_permissions=Count('permissions', distinct=True)
+        )
     
     def niveau_acces_display(self, obj):
         try:
@@ -209,20 +277,22 @@ class CustomGroupAdmin(GroupAdmin):
     niveau_acces_display.short_description = "Niveau d'accès"
     
     def utilisateurs_count(self, obj):
-        count = obj.user_set.count()
+        count = obj.nb_utilisateurs
         if count > 0:
             url = reverse('admin:auth_user_changelist') + f'?groups__id__exact={obj.id}'
             return format_html('<a href="{}">{} utilisateur{}</a>', 
                              url, count, 's' if count > 1 else '')
         return '0 utilisateur'
     utilisateurs_count.short_description = 'Utilisateurs'
+    utilisateurs_count.admin_order_field = 'nb_utilisateurs'
     
     def permissions_count(self, obj):
-        count = obj.permissions.count()
+        count = obj.nb_permissions
         if count > 0:
             return f"{count} permission{'s' if count > 1 else ''}"
         return '0 permission'
     permissions_count.short_description = 'Permissions'
+    permissions_count.admin_order_field = 'nb_permissions'
     
     def couleur_display(self, obj):
         try:
@@ -1,57 +1,57 @@
 from django.shortcuts import render, redirect
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.contrib.auth.models import User
+from django.contrib.auth.models import User, Group
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm
 from django.contrib.auth import update_session_auth_hash
 from django.utils import timezone
 from django.http import JsonResponse
+from django.db.models import Count
 from datetime import timedelta
 
 from .models import ProfilUtilisateur, HistoriqueGroupes
+from .signals import get_service_non_defini_id
 
 
 def user_login(request):
     """Vue de connexion personnalisée"""
     if request.method == 'POST':
         form = AuthenticationForm(request, data=request.POST)
+        # AuthenticationForm.clean() appelle déjà authenticate() (un seul calcul
+        # du hash) et refuse les comptes inactifs via confirm_login_allowed()
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                if user.is_active:
-                    login(request, user)
-                    
-                    # Créer le profil s'il n'existe pas
-                    from .models import ProfilUtilisateur
-                    try:
-                        profil = user.profil
-                    except ProfilUtilisateur.DoesNotExist:
-                        ProfilUtilisateur.objects.create(
-                            user=user,
-                            service='Non défini',
-                            poste='Non défini',
-                            actif=user.is_active,
-                        )
-                    #comme pour le logout : pas très informatif tant qu'esthétiquement
-                    # il n'est pas amélioré
-                    #messages.success(request, f'Bienvenue {user.get_full_name() or user.username} !')
-                    
-                    # Redirection après connexion réussie
-                    next_page = request.GET.get('next')
-                    if next_page and next_page not in ['/login/', '/login']:
-                        return redirect(next_page)
-                    else:
-                        return redirect('/dashboard/')  # Redirection vers dashboard
-                else:
-                    messages.error(request, "Votre compte est désactivé.")
+            user = form.get_user()
+            login(request, user)
+
+            # Créer le profil s'il n'existe pas
+            try:
+                profil = user.profil
+            except ProfilUtilisateur.DoesNotExist:
+                ProfilUtilisateur.objects.create(
+                    user=user,
+                    service_id=get_service_non_defini_id(),
+                    poste='Non défini',
+                    actif=user.is_active,
+                )
+            #comme pour le logout : pas très informatif tant qu'esthétiquement
+            # il n'est pas amélioré
+            #messages.success(request, f'Bienvenue {user.get_full_name() or user.username} !')
+
+            # Redirection après connexion réussie
+            next_page = request.GET.get('next')
+            if next_page and next_page not in ['/login/', '/login']:
+                return redirect(next_page)
             else:
-                messages.error(request, "Nom d'utilisateur ou mot de passe incorrect.")
+                return redirect('/dashboard/')  # Redirection vers dashboard
         else:
-            messages.error(request, "Erreur dans le formulaire de connexion.")
+            codes = {error.code for error in form.errors.as_data().get('__all__', [])}
+            if 'inactive' in codes:
+                messages.error(request, "Votre compte est désactivé.")
+            elif 'invalid_login' in codes:
+                messages.error(request, "Nom d'utilisateur ou mot de passe incorrect.")
+            else:
+                messages.error(request, "Erreur dans le formulaire de connexion.")
     else:
         # Si l'utilisateur est déjà connecté
         if request.user.is_authenticated:
@@ -86,7 +86,7 @@ def user_profile(request):
         # Créer le profil s'il n'existe pas
         profil = ProfilUtilisateur.objects.create(
             user=user,
-            service='Non défini',
+            service_id=get_service_non_defini_id(),
             poste='Non défini',
             actif=user.is_active,
         )
@@ -96,9 +96,12 @@ def user_profile(request):
         utilisateur_cible=user
     ).select_related('group', 'utilisateur_modifieur').order_by('-date_action')[:10]
     
+    # Groupes de l'utilisateur, avec leurs informations étendues
+    groupes = list(user.groups.select_related('groupe_etendu'))
+    
     # Statistiques utilisateur
     stats = {
-        'groupes_count': user.groups.count(),
+        'groupes_count': len(groupes),
         'is_superuser': user.is_superuser,
         'is_staff': user.is_staff,
         'date_joined': user.date_joined,
@@ -108,6 +111,7 @@ def user_profile(request):
     context = {
         'user': user,
         'profil': profil,
+        'groupes': groupes,
         'historique_groupes': historique_groupes,
         'stats': stats,
     }
@@ -136,46 +140,57 @@ def change_password(request):
     return render(request, 'registration/change_password.html', context)
 
 
-def dashboard_stats(request):
-    """API pour les statistiques du dashboard utilisateur"""
+async def dashboard_stats(request):
+    """API pour les statistiques du dashboard utilisateur (vue asynchrone)"""
+    from suivi_conducteurs.models import Conducteur, Evaluation, TypologieEvaluation
+
+    user = await request.auser()
     # Stats pour l'utilisateur connecté
     stats = {}
     
     # Si l'utilisateur peut voir les évaluations
-    if request.user.has_perm('suivi_conducteurs.view_evaluation'):
-        from suivi_conducteurs.models import Evaluation, TypologieEvaluation
-        
+    if await user.ahas_perm('suivi_conducteurs.view_evaluation'):
         # Évaluations ce mois-ci
-        current_month = timezone.now().replace(day=1)
-        evaluations_ce_mois = Evaluation.objects.filter(
+        current_month = timezone.localdate().replace(day=1)
+        evaluations_ce_mois = await Evaluation.objects.filter(
             date_evaluation__gte=current_month
-        ).count()
+        ).acount()
         
-        # Évaluations par type
-        evaluations_par_type = {}
-        for type_eval in TypologieEvaluation.objects.all():
-            count = Evaluation.objects.filter(type_evaluation=type_eval).count()
-            evaluations_par_type[type_eval.nom] = count
+        # Évaluations par type, en une seule requête agrégée
+        evaluations_par_type = {
+            nom: count
+            async for nom, count in TypologieEvaluation.objects.annotate(
+                nb=Count('evaluation')
+            ).values_list('nom', 'nb')
+        }
         
         stats['evaluations'] = {
             'ce_mois': evaluations_ce_mois,
-            'total': Evaluation.objects.count(),
+            'total': await Evaluation.objects.acount(),
             'par_type': evaluations_par_type,
         }
     
     # Si l'utilisateur peut voir les conducteurs
-    if request.user.has_perm('suivi_conducteurs.view_conducteur'):
-        from suivi_conducteurs.models import Conducteur
+    if await user.ahas_perm('suivi_conducteurs.view_conducteur'):
         stats['conducteurs'] = {
-            'total': Conducteur.objects.count(),
-            'actifs': Conducteur.objects.filter(salactif=True).count(),
+            'total': await Conducteur.objects.acount(),
+            'actifs': await Conducteur.objects.filter(salactif=True).acount(),
         }
     
     # Stats des groupes utilisateur
+    if user.is_authenticated:
+        groupes = [nom async for nom in user.groups.values_list('name', flat=True)]
+        # Permissions directes + permissions de chaque groupe (comptées par groupe)
+        permissions_count = (
+            await user.user_permissions.acount()
+            + await Group.permissions.through.objects.filter(group__user=user).acount()
+        )
+    else:
+        groupes = []
+        permissions_count = 0
     stats['user'] = {
-        'groupes': [g.name for g in request.user.groups.all()],
-        'permissions_count': request.user.user_permissions.count() + 
-                           sum(g.permissions.count() for g in request.user.groups.all()),
+        'groupes': groupes,
+        'permissions_count': permissions_count,
     }
     
     return JsonResponse(stats)
@@ -0,0 +1,19 @@
+# gestion_groupes/hashers.py
+from decouple import config
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class PBKDF2IterationsConfigurablesHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 dont le nombre d'itérations est lu dans l'environnement
+    (PASSWORD_PBKDF2_ITERATIONS).
+
+    L'algorithme reste 'pbkdf2_sha256' : les hash existants sont reconnus et,
+    dès qu'une connexion réussit avec un nombre d'itérations différent,
+    must_update() déclenche le recalcul transparent du hash par Django.
+    """
+    iterations = config(
+        'PASSWORD_PBKDF2_ITERATIONS',
+        default=PBKDF2PasswordHasher.iterations,
+        cast=int,
+    )
@@ -0,0 +1,162 @@
+# gestion_groupes/management/commands/archive_group_history.py
+import gzip
+import json
+import time
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from gestion_groupes.models import HistoriqueGroupes, HistoriqueGroupesArchive, ResumeHistoriqueGroupes
+
+
+def soustraire_mois(moment, mois):
+    """moment reculé de mois mois (jour ramené au 28 au plus pour rester valide)"""
+    annee, index = divmod(moment.year * 12 + moment.month - 1 - mois, 12)
+    return moment.replace(year=annee, month=index + 1, day=min(moment.day, 28))
+
+
+def figer(entree):
+    """Copie d'une entrée d'historique sans clé étrangère (noms conservés si l'objet disparaît)"""
+    return {
+        'historique_id': entree.pk,
+        'group_id': entree.group_id,
+        'group_nom': entree.group.name,
+        'action': entree.action,
+        'utilisateur_modifieur_id': entree.utilisateur_modifieur_id,
+        'utilisateur_modifieur_nom': entree.utilisateur_modifieur.username if entree.utilisateur_modifieur else '',
+        'utilisateur_cible_id': entree.utilisateur_cible_id,
+        'utilisateur_cible_nom': entree.utilisateur_cible.username if entree.utilisateur_cible else '',
+        'permission_cible': (
+            f'{entree.permission_cible.content_type.app_label}.{entree.permission_cible.codename}'
+            if entree.permission_cible else ''
+        ),
+        'details': entree.details,
+        'date_action': entree.date_action,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive par lots les entrées de l'historique des groupes plus anciennes que la rétention "
+        '(table d\'archive ou fichier JSON lines compressé) et tient à jour le résumé mensuel'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=settings.HISTORIQUE_RETENTION_MOIS,
+            help=f'Rétention en mois (défaut: HISTORIQUE_RETENTION_MOIS = {settings.HISTORIQUE_RETENTION_MOIS})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Entrées déplacées par transaction (défaut: 1000)',
+        )
+        parser.add_argument(
+            '--destination',
+            choices=['table', 'jsonl'],
+            default='table',
+            help="Table HistoriqueGroupesArchive ou fichier JSON lines compressé (défaut: table)",
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Fichier .jsonl.gz, complété s\'il existe (défaut: historique-groupes-AAAAMMJJ.jsonl.gz)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.1,
+            help='Pause entre deux lots, en secondes, pour laisser passer les autres écritures (défaut: 0.1)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Affiche le nombre d\'entrées concernées sans rien déplacer',
+        )
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months doit être au moins 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size doit être au moins 1')
+
+        limite = soustraire_mois(timezone.now(), options['months'])
+        anciennes = HistoriqueGroupes.objects.filter(date_action__lt=limite)
+        self.stdout.write(f"🗄️  Rétention {options['months']} mois : entrées antérieures au {limite:%d/%m/%Y}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'   MODE DRY-RUN : {anciennes.count()} entrée(s) à archiver'))
+            return
+
+        fichier = None
+        if options['destination'] == 'jsonl':
+            sortie = options['output'] or f'historique-groupes-{datetime.now():%Y%m%d}.jsonl.gz'
+            # Mode ajout : chaque exécution ajoute un membre gzip, lisible d'un seul tenant
+            fichier = gzip.open(sortie, 'at', encoding='utf-8')
+
+        total = 0
+        try:
+            while True:
+                nombre = self.archiver_lot(anciennes, options['batch_size'], fichier)
+                if not nombre:
+                    break
+                total += nombre
+                self.stdout.write(f'   📦 {total} entrée(s) archivée(s)')
+                time.sleep(options['pause'])
+        finally:
+            if fichier:
+                fichier.close()
+
+        if fichier:
+            self.stdout.write(f'💾 Archive écrite dans {sortie}')
+        self.stdout.write(self.style.SUCCESS(f'\n✅ {total} entrée(s) archivée(s)'))
+
+    def archiver_lot(self, anciennes, taille, fichier):
+        """Déplace les taille entrées les plus anciennes dans une transaction courte ; renvoie leur nombre"""
+        with transaction.atomic():
+            lot = list(
+                anciennes.select_related(
+                    'group', 'utilisateur_modifieur', 'utilisateur_cible', 'permission_cible__content_type',
+                ).order_by('date_action', 'id')[:taille]
+            )
+            if not lot:
+                return 0
+
+            copies = [figer(entree) for entree in lot]
+            if fichier:
+                for copie in copies:
+                    fichier.write(json.dumps(copie, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n')
+                # Écrit sur disque avant la suppression : une erreur laisse au pire un doublon
+                # (dédoublonnable par historique_id), jamais une perte
+                fichier.flush()
+            else:
+                HistoriqueGroupesArchive.objects.bulk_create(
+                    [HistoriqueGroupesArchive(**copie) for copie in copies], ignore_conflicts=True,
+                )
+
+            self.cumuler(copies)
+            HistoriqueGroupes.objects.filter(pk__in=[entree.pk for entree in lot]).delete()
+        return len(lot)
+
+    @staticmethod
+    def cumuler(copies):
+        """Ajoute les entrées du lot au résumé par mois, groupe et action"""
+        comptes = Counter(
+            (timezone.localtime(copie['date_action']).date().replace(day=1), copie['group_nom'], copie['action'])
+            for copie in copies
+        )
+        for (mois, group_nom, action), nombre in comptes.items():
+            mis_a_jour = ResumeHistoriqueGroupes.objects.filter(
+                mois=mois, group_nom=group_nom, action=action,
+            ).update(nombre=F('nombre') + nombre)
+            if not mis_a_jour:
+                ResumeHistoriqueGroupes.objects.create(mois=mois, group_nom=group_nom, action=action, nombre=nombre)
@@ -0,0 +1,221 @@
+# gestion_groupes/management/commands/bench_asgi.py
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+PROFILS = {
+    'wsgi': 'configurations/gunicorn_wsgi.py',
+    'asgi': 'configurations/gunicorn_asgi.py',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare débit et latence p99 des endpoints JSON/HTMX entre le profil '
+        'gunicorn WSGI (workers sync) et le profil ASGI (workers uvicorn)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=200,
+            help='Nombre de clients simultanés (défaut: 200)',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10,
+            help='Durée de la mesure par profil, en secondes (défaut: 10)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Nombre de workers gunicorn (défaut: celui du profil)',
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8765,
+            help='Port local utilisé pour les serveurs de test (défaut: 8765)',
+        )
+        parser.add_argument(
+            '--profile',
+            choices=list(PROFILS),
+            action='append',
+            help='Profil(s) à mesurer (défaut: tous)',
+        )
+        parser.add_argument(
+            '--username',
+            type=str,
+            help='Utilisateur avec lequel se connecter (défaut: anonyme)',
+        )
+        parser.add_argument(
+            '--password',
+            type=str,
+            help='Mot de passe de --username',
+        )
+
+    def handle(self, *args, **options):
+        from suivi_conducteurs.models import CritereEvaluation
+
+        critere = CritereEvaluation.objects.filter(actif=True).first()
+        if critere is None:
+            raise CommandError(
+                'Aucun critère actif : générez des données avant de lancer le benchmark'
+            )
+
+        self.hote = '127.0.0.1'
+        self.port = options['port']
+        self.endpoints = [
+            ('GET', reverse('dashboard_stats'), None),
+            ('GET', reverse('gestion_groupes:api_stats'), None),
+            ('GET', reverse('suivi_conducteurs:load_criteres_htmx') + '?' + urlencode(
+                {'type_evaluation': critere.type_evaluation_id}), None),
+            ('POST', reverse('suivi_conducteurs:validate_field_htmx'), urlencode({
+                'field_name': 'note',
+                'field_value': critere.valeur_mini,
+                'critere_id': critere.pk,
+            })),
+        ]
+
+        self.stdout.write(
+            f"⏱️  {options['clients']} clients simultanés, {options['duration']:.0f} s par profil\n"
+        )
+        for nom in options['profile'] or list(PROFILS):
+            serveur = self.demarrer_serveur(PROFILS[nom], options['workers'])
+            try:
+                self.attendre_serveur(serveur)
+                cookies = asyncio.run(self.authentifier(options['username'], options['password']))
+                resultats = asyncio.run(self.charger(options['clients'], options['duration'], cookies))
+            finally:
+                serveur.terminate()
+                serveur.wait(timeout=30)
+            self.afficher(nom, resultats, options['duration'])
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark terminé'))
+
+    def demarrer_serveur(self, profil, workers):
+        env = dict(
+            os.environ,
+            GUNICORN_BIND=f'{self.hote}:{self.port}',
+            GUNICORN_ACCESSLOG='/dev/null',
+        )
+        if workers:
+            env['GUNICORN_WORKERS'] = str(workers)
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', profil],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def attendre_serveur(self, serveur, delai=30):
+        limite = time.monotonic() + delai
+        while time.monotonic() < limite:
+            if serveur.poll() is not None:
+                raise CommandError('Le serveur gunicorn s\'est arrêté au démarrage')
+            try:
+                with socket.create_connection((self.hote, self.port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError('Le serveur gunicorn ne répond pas')
+
+    async def requete(self, methode, chemin, corps=None, cookies=None):
+        """Requête HTTP/1.1 minimale (une connexion par requête) : (statut, en-têtes, corps)"""
+        reader, writer = await asyncio.open_connection(self.hote, self.port)
+        lignes = [
+            f'{methode} {chemin} HTTP/1.1',
+            f'Host: {self.hote}',
+            'Connection: close',
+        ]
+        if cookies:
+            lignes.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in cookies.items()))
+            if 'csrftoken' in cookies:
+                lignes.append(f"X-CSRFToken: {cookies['csrftoken']}")
+        donnees = (corps or '').encode()
+        if corps is not None:
+            lignes.append('Content-Type: application/x-www-form-urlencoded')
+            lignes.append(f'Content-Length: {len(donnees)}')
+        writer.write(('\r\n'.join(lignes) + '\r\n\r\n').encode() + donnees)
+        await writer.drain()
+        reponse = await reader.read()
+        writer.close()
+        entete, _, contenu = reponse.partition(b'\r\n\r\n')
+        lignes_entete = entete.decode('latin-1').split('\r\n')
+        statut = int(lignes_entete[0].split()[1])
+        return statut, lignes_entete[1:], contenu
+
+    async def authentifier(self, username, password):
+        """Récupère le cookie CSRF (et la session si un utilisateur est fourni)"""
+        cookies = {}
+
+        def lire_cookies(entetes):
+            for ligne in entetes:
+                if ligne.lower().startswith('set-cookie:'):
+                    cookie = SimpleCookie(ligne.split(':', 1)[1].strip())
+                    cookies.update({nom: morsel.value for nom, morsel in cookie.items()})
+
+        _, entetes, _ = await self.requete('GET', reverse('login'))
+        lire_cookies(entetes)
+        if username:
+            statut, entetes, _ = await self.requete(
+                'POST', reverse('login'),
+                urlencode({'username': username, 'password': password or ''}),
+                cookies,
+            )
+            if statut != 302:
+                raise CommandError(f'Connexion de {username} impossible (statut {statut})')
+            lire_cookies(entetes)
+        return cookies
+
+    async def charger(self, nb_clients, duree, cookies):
+        latences = []
+        erreurs = 0
+        fin = time.monotonic() + duree
+
+        async def client(index):
+            nonlocal erreurs
+            i = index
+            while time.monotonic() < fin:
+                methode, chemin, corps = self.endpoints[i % len(self.endpoints)]
+                i += 1
+                debut = time.perf_counter()
+                try:
+                    statut, _, _ = await self.requete(methode, chemin, corps, cookies)
+                except OSError:
+                    statut = None
+                if statut == 200:
+                    latences.append(time.perf_counter() - debut)
+                else:
+                    erreurs += 1
+
+        await asyncio.gather(*(client(i) for i in range(nb_clients)))
+        return sorted(latences), erreurs
+
+    def afficher(self, nom, resultats, duree):
+        latences, erreurs = resultats
+        if not latences:
+            self.stdout.write(self.style.ERROR(f'   {nom}: aucune réponse valide ({erreurs} erreurs)'))
+            return
+
+        def percentile(rang):
+            return latences[min(len(latences) - 1, int(rang / 100 * len(latences)))] * 1000
+
+        self.stdout.write(
+            f'   {nom:<5} {len(latences) / duree:>8.1f} req/s   '
+            f'p50 {percentile(50):>7.1f} ms   p99 {percentile(99):>7.1f} ms   '
+            f'erreurs {erreurs}'
+        )
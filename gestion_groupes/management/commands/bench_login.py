@@ -0,0 +1,109 @@
+# gestion_groupes/management/commands/bench_login.py
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import Client
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = 'Mesure le débit de connexion (POST /login/) sous charge concurrente'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Nombre total de connexions à effectuer (défaut: 50)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Nombre de connexions simultanées (défaut: 8)',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=8,
+            help="Nombre d'utilisateurs de benchmark à créer (défaut: 8)",
+        )
+        parser.add_argument(
+            '--password',
+            type=str,
+            default='bench-login-123',
+            help='Mot de passe des utilisateurs de benchmark',
+        )
+        parser.add_argument(
+            '--keep-users',
+            action='store_true',
+            help='Conserve les utilisateurs de benchmark à la fin',
+        )
+
+    def handle(self, *args, **options):
+        nb_requetes = options['requests']
+        concurrence = options['concurrency']
+        password = options['password']
+
+        self.stdout.write('⏱️  Benchmark de connexion\n')
+
+        usernames = [f'bench.login.{i}' for i in range(max(1, options['users']))]
+        self.creer_utilisateurs(usernames, password)
+        url = reverse('login')
+
+        def connexion(index):
+            client = Client(HTTP_HOST='localhost')
+            debut = time.perf_counter()
+            response = client.post(url, {
+                'username': usernames[index % len(usernames)],
+                'password': password,
+            })
+            duree = time.perf_counter() - debut
+            close_old_connections()
+            return duree, response.status_code == 302
+
+        try:
+            debut = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrence) as executor:
+                resultats = list(executor.map(connexion, range(nb_requetes)))
+            duree_totale = time.perf_counter() - debut
+        finally:
+            if not options['keep_users']:
+                User.objects.filter(username__in=usernames).delete()
+
+        durees = sorted(duree for duree, _ in resultats)
+        echecs = sum(1 for _, ok in resultats if not ok)
+
+        self.stdout.write(f'   Connexions:          {nb_requetes} ({concurrence} simultanées)')
+        self.stdout.write(f'   Échecs:              {echecs}')
+        self.stdout.write(f'   Débit:               {nb_requetes / duree_totale:.1f} connexions/s')
+        self.stdout.write(f'   Latence p50:         {self.percentile(durees, 50) * 1000:.1f} ms')
+        self.stdout.write(f'   Latence p95:         {self.percentile(durees, 95) * 1000:.1f} ms')
+        self.stdout.write(f'   Latence moyenne:     {statistics.mean(durees) * 1000:.1f} ms')
+
+        if echecs:
+            self.stdout.write(self.style.WARNING('\n⚠️  Certaines connexions ont échoué'))
+        else:
+            self.stdout.write(self.style.SUCCESS('\n✅ Benchmark terminé'))
+
+    def creer_utilisateurs(self, usernames, password):
+        """Crée (ou réinitialise) les utilisateurs de benchmark"""
+        for username in usernames:
+            user, _ = User.objects.get_or_create(
+                username=username,
+                defaults={'first_name': 'Bench', 'last_name': 'Login'}
+            )
+            user.set_password(password)
+            user.save()
+
+    @staticmethod
+    def percentile(valeurs_triees, rang):
+        """Percentile par rang le plus proche sur une liste déjà triée"""
+        if not valeurs_triees:
+            return 0.0
+        index = max(0, min(len(valeurs_triees) - 1, round(rang / 100 * len(valeurs_triees)) - 1))
+        return valeurs_triees[index]
@@ -0,0 +1,84 @@
+# gestion_groupes/management/commands/bench_sessions.py
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+MOTEURS = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'regroupe': 'gestion_groupes.sessions',
+}
+
+
+class Command(BaseCommand):
+    help = "Compare le volume d'écritures de session par moteur de session"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Nombre de requêtes par moteur (défaut: 200)',
+        )
+        parser.add_argument(
+            '--url',
+            type=str,
+            default='/api/dashboard-stats/',
+            help='URL appelée à chaque requête (défaut: /api/dashboard-stats/)',
+        )
+        parser.add_argument(
+            '--modify-every',
+            type=int,
+            default=0,
+            help='Modifie la session toutes les N requêtes (0 = jamais)',
+        )
+
+    def handle(self, *args, **options):
+        nb_requetes = options['requests']
+        url = options['url']
+        modifier_tous = options['modify_every']
+
+        self.stdout.write(f'⏱️  Écritures de session pour {nb_requetes} requêtes sur {url}\n')
+
+        user, _ = User.objects.get_or_create(
+            username='bench.sessions',
+            defaults={'first_name': 'Bench', 'last_name': 'Sessions'}
+        )
+        try:
+            for nom, moteur in MOTEURS.items():
+                with override_settings(SESSION_ENGINE=moteur):
+                    ecritures, duree = self.mesurer(user, url, nb_requetes, modifier_tous)
+                self.stdout.write(
+                    f'   {nom:<10} {ecritures:>6} écritures django_session   '
+                    f'{duree * 1000 / nb_requetes:>7.2f} ms/requête'
+                )
+        finally:
+            user.delete()
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark terminé'))
+
+    def mesurer(self, user, url, nb_requetes, modifier_tous):
+        """Retourne (nombre d'INSERT/UPDATE sur django_session, durée totale)"""
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+        ecritures = 0
+        debut = time.perf_counter()
+        for i in range(1, nb_requetes + 1):
+            if modifier_tous and i % modifier_tous == 0:
+                session = client.session
+                session['bench_compteur'] = i
+                session.save()
+            with CaptureQueriesContext(connection) as requetes:
+                client.get(url)
+            ecritures += sum(
+                1 for requete in requetes.captured_queries
+                if 'django_session' in requete['sql']
+                and requete['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE'))
+            )
+        duree = time.perf_counter() - debut
+        client.logout()
+        return ecritures, duree
@@ -0,0 +1,103 @@
+# gestion_groupes/management/commands/bench_sqlite_locks.py
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+ALIAS = 'bench_verrous'
+
+
+def _configurer_alias(chemin, options):
+    """Déclare une base SQLite temporaire sous l'alias de benchmark"""
+    connections.settings[ALIAS] = {
+        **connections.settings['default'],
+        'NAME': chemin,
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': options,
+    }
+
+
+def _transactions_lecture_ecriture(nb_transactions):
+    """
+    Transactions « lecture puis écriture » : le schéma qui provoque des
+    "database is locked" avec les transactions DEFERRED par défaut.
+    """
+    verrous = 0
+    for _ in range(nb_transactions):
+        try:
+            with transaction.atomic(using=ALIAS):
+                with connections[ALIAS].cursor() as cursor:
+                    cursor.execute('SELECT valeur FROM bench_compteur WHERE id = 1')
+                    valeur = cursor.fetchone()[0]
+                    cursor.execute('UPDATE bench_compteur SET valeur = %s WHERE id = 1', [valeur + 1])
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            verrous += 1
+    connections[ALIAS].close()
+    return verrous
+
+
+class Command(BaseCommand):
+    help = 'Compare les erreurs "database is locked" entre SQLite par défaut et les réglages du projet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=8,
+            help='Nombre de processus écrivains simultanés (défaut: 8)',
+        )
+        parser.add_argument(
+            '--transactions',
+            type=int,
+            default=200,
+            help='Nombre de transactions par processus (défaut: 200)',
+        )
+
+    def handle(self, *args, **options):
+        nb_processus = options['processes']
+        nb_transactions = options['transactions']
+
+        self.stdout.write(
+            f'⏱️  {nb_processus} processus × {nb_transactions} transactions lecture/écriture\n'
+        )
+
+        configurations = {
+            'défaut Django': {},
+            'réglages projet': settings.DATABASES['default'].get('OPTIONS', {}),
+        }
+        for nom, options_sqlite in configurations.items():
+            verrous, attendu, obtenu, duree = self.mesurer(options_sqlite, nb_processus, nb_transactions)
+            self.stdout.write(
+                f'   {nom:<16} {verrous:>6} erreurs "locked"   '
+                f'compteur {obtenu}/{attendu}   {duree:.2f} s'
+            )
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark terminé'))
+
+    def mesurer(self, options_sqlite, nb_processus, nb_transactions):
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin = os.path.join(dossier, 'bench.sqlite3')
+            _configurer_alias(chemin, options_sqlite)
+            with connections[ALIAS].cursor() as cursor:
+                cursor.execute('CREATE TABLE bench_compteur (id INTEGER PRIMARY KEY, valeur INTEGER)')
+                cursor.execute('INSERT INTO bench_compteur (id, valeur) VALUES (1, 0)')
+            connections[ALIAS].close()
+
+            debut = time.perf_counter()
+            contexte = multiprocessing.get_context('fork')
+            with contexte.Pool(nb_processus) as pool:
+                verrous = sum(pool.map(_transactions_lecture_ecriture, [nb_transactions] * nb_processus))
+            duree = time.perf_counter() - debut
+
+            with connections[ALIAS].cursor() as cursor:
+                cursor.execute('SELECT valeur FROM bench_compteur WHERE id = 1')
+                obtenu = cursor.fetchone()[0]
+            connections[ALIAS].close()
+            del connections[ALIAS]
+        return verrous, nb_processus * nb_transactions, obtenu, duree
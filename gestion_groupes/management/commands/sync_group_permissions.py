@@ -1,8 +1,19 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import Group, Permission
-from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from gestion_groupes.config import configuration_groupes
-from gestion_groupes.models import GroupeEtendu
+from gestion_groupes.models import GroupeEtendu, HistoriqueGroupes
+from gestion_groupes.signals import historiques_permissions
+
+# Table de liaison groupe ↔ permission : écritures en masse, sans m2m_changed
+GroupePermission = Group.permissions.through
+
+
+def decouper(perm_name):
+    """('app_label', 'codename') d'une permission 'app_label.codename', None si le format est invalide"""
+    app_label, point, codename = perm_name.partition('.')
+    return (app_label, codename) if point and app_label and codename else None
 
 
 class Command(BaseCommand):
@@ -19,18 +30,24 @@ class Command(BaseCommand):
             type=str,
             help='Synchroniser seulement un groupe spécifique',
         )
+        parser.add_argument(
+            '--all-apps',
+            action='store_true',
+            help='Synchronise tous les groupes configurés en une seule transaction '
+                 '(sinon une transaction par groupe)',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
         specific_group = options['group']
-        
+
         if dry_run:
             self.stdout.write(
                 self.style.WARNING('MODE DRY-RUN: Aucune modification ne sera appliquée\n')
             )
 
         # Récupérer tous les groupes à traiter
-        groups_to_process = configuration_groupes.keys()
+        groups_to_process = list(configuration_groupes.keys())
         if specific_group:
             if specific_group not in configuration_groupes:
                 self.stdout.write(
@@ -39,9 +56,16 @@ class Command(BaseCommand):
                 return
             groups_to_process = [specific_group]
 
-        # Traiter chaque groupe
-        for group_name in groups_to_process:
-            self.sync_group_permissions(group_name, dry_run)
+        # Toutes les permissions configurées, résolues en une requête
+        permissions = self.resolve_permissions(groups_to_process)
+
+        if options['all_apps'] and not specific_group:
+            with transaction.atomic():
+                self.sync_groups(groups_to_process, permissions, dry_run)
+        else:
+            for group_name in groups_to_process:
+                with transaction.atomic():
+                    self.sync_groups([group_name], permissions, dry_run)
 
         if not dry_run:
             self.stdout.write(
@@ -52,130 +76,164 @@ class Command(BaseCommand):
                 self.style.WARNING('\n💡 Pour appliquer les changements, exécutez sans --dry-run')
             )
 
-    def sync_group_permissions(self, group_name, dry_run=False):
-        """Synchronise les permissions d'un groupe selon la configuration"""
-        config = configuration_groupes[group_name]
-        
-        self.stdout.write(f'\n📋 Traitement du groupe: {group_name}')
-        self.stdout.write(f'   Description: {config.get("description", "N/A")}')
-        
-        # Récupérer ou créer le groupe Django
-        try:
-            group, created = Group.objects.get_or_create(name=group_name)
-            if created:
-                self.stdout.write(f'   ✨ Groupe Django créé: {group_name}')
-            else:
-                self.stdout.write(f'   📌 Groupe Django existant: {group_name}')
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f'   ❌ Erreur lors de la création du groupe: {e}')
-            )
+    def resolve_permissions(self, group_names):
+        """Permissions 'app_label.codename' configurées pour ces groupes, indexées par nom"""
+        couples = set()
+        for group_name in group_names:
+            for perm_name in configuration_groupes[group_name].get('django_permissions', []):
+                if decouper(perm_name):
+                    couples.add(decouper(perm_name))
+        if not couples:
+            return {}
+
+        # Filtre large (applications × codenames) puis tri exact en Python : une seule requête
+        candidates = Permission.objects.filter(
+            content_type__app_label__in={app_label for app_label, _ in couples},
+            codename__in={codename for _, codename in couples},
+        ).select_related('content_type')
+        return {
+            f'{permission.content_type.app_label}.{permission.codename}': permission
+            for permission in candidates
+            if (permission.content_type.app_label, permission.codename) in couples
+        }
+
+    def sync_groups(self, group_names, permissions, dry_run=False):
+        """Synchronise les permissions de ces groupes : lectures groupées, diff appliqué en masse"""
+        groups = self.get_groups(group_names, dry_run)
+
+        # Permissions actuelles de tous les groupes en une requête
+        current = {group_name: {} for group_name in group_names}
+        noms_par_id = {group.pk: group.name for group in groups.values() if group.pk}
+        for lien in GroupePermission.objects.filter(group_id__in=noms_par_id).select_related('permission__content_type'):
+            permission = lien.permission
+            current[noms_par_id[lien.group_id]][f'{permission.content_type.app_label}.{permission.codename}'] = lien
+
+        liens_a_creer, liens_a_supprimer, historiques = [], [], []
+        for group_name in group_names:
+            config = configuration_groupes[group_name]
+            group = groups[group_name]
+            if len(group_names) > 1:
+                self.stdout.write(f'\n🔐 Permissions du groupe: {group_name}')
+
+            # Traiter les permissions Django
+            django_permissions = config.get('django_permissions', [])
+            if not django_permissions:
+                self.stdout.write(f'   ⚠️  Aucune permission définie dans la configuration')
+                continue
+
+            # Convertir la configuration en permissions Django
+            target_permissions = set()
+            for perm_name in django_permissions:
+                if not decouper(perm_name):
+                    self.stdout.write(
+                        self.style.ERROR(f'   ❌ Format de permission invalide: {perm_name}')
+                    )
+                elif perm_name not in permissions:
+                    self.stdout.write(
+                        self.style.WARNING(f'   ⚠️  Permission introuvable: {perm_name}')
+                    )
+                else:
+                    target_permissions.add(perm_name)
+
+            # Calculer les changements
+            current_perm_names = set(current[group_name])
+            to_add = target_permissions - current_perm_names
+            to_remove = current_perm_names - target_permissions
+
+            # Afficher les changements
+            if to_add:
+                self.stdout.write(f'   ➕ Permissions à ajouter ({len(to_add)}):')
+                for perm in sorted(to_add):
+                    self.stdout.write(f'      • {perm}')
+
+            if to_remove:
+                self.stdout.write(f'   ➖ Permissions à supprimer ({len(to_remove)}):')
+                for perm in sorted(to_remove):
+                    self.stdout.write(f'      • {perm}')
+
+            if not to_add and not to_remove:
+                self.stdout.write(f'   ✅ Permissions déjà synchronisées')
+            self.stdout.write(f'   📊 Total des permissions configurées: {len(target_permissions)}')
+
+            liens_a_creer += [
+                GroupePermission(group=group, permission=permissions[perm]) for perm in sorted(to_add)
+            ]
+            liens_a_supprimer += [(group, current[group_name][perm]) for perm in sorted(to_remove)]
+
+        if dry_run or not (liens_a_creer or liens_a_supprimer):
             return
 
-        # Récupérer ou créer le GroupeEtendu
-        try:
-            groupe_etendu, created = GroupeEtendu.objects.get_or_create(
-                group=group,
-                defaults={
-                    'description': config.get('description', ''),
-                    'couleur': config.get('color', '#6c757d'),
-                    'niveau_acces': config.get('level', 1),
-                    'actif': True
-                }
+        # Appliquer le diff : une suppression, une insertion et un lot d'historique pour tous les groupes.
+        # Même transaction que la lecture : l'historique ne décrit que des changements faits,
+        # un lien ajouté ou retiré entre-temps fait échouer (et annuler) la synchronisation
+        if liens_a_supprimer:
+            supprimes, _ = GroupePermission.objects.filter(pk__in=[lien.pk for _, lien in liens_a_supprimer]).delete()
+            if supprimes != len(liens_a_supprimer):
+                raise CommandError('Permissions modifiées pendant la synchronisation, relancez la commande')
+            historiques += historiques_permissions(
+                'remove_permission', [(group, lien.permission) for group, lien in liens_a_supprimer]
             )
-            if created:
-                self.stdout.write(f'   ✨ GroupeEtendu créé')
+        if liens_a_creer:
+            try:
+                GroupePermission.objects.bulk_create(liens_a_creer)
+            except IntegrityError as exc:
+                raise CommandError('Permissions modifiées pendant la synchronisation, relancez la commande') from exc
+            historiques += historiques_permissions(
+                'add_permission', [(lien.group, lien.permission) for lien in liens_a_creer]
+            )
+        HistoriqueGroupes.objects.bulk_create(historiques)
+        self.stdout.write(f'\n   ✅ Permissions synchronisées avec succès ({len(historiques)} changement(s))')
+
+    def get_groups(self, group_names, dry_run=False):
+        """Groupes Django (créés au besoin) et GroupeEtendu mis à jour, indexés par nom"""
+        groups = {
+            group.name: group
+            for group in Group.objects.filter(name__in=group_names).select_related('groupe_etendu')
+        }
+        a_mettre_a_jour = []
+        for group_name in group_names:
+            config = configuration_groupes[group_name]
+            self.stdout.write(f'\n📋 Traitement du groupe: {group_name}')
+            self.stdout.write(f'   Description: {config.get("description", "N/A")}')
+
+            group = groups.get(group_name)
+            if group is None:
+                if dry_run:
+                    self.stdout.write(f'   ✨ Groupe Django à créer: {group_name}')
+                    groups[group_name] = Group(name=group_name)
+                    continue
+                # Le signal post_save crée le GroupeEtendu, mis à jour ci-dessous
+                group = groups[group_name] = Group.objects.create(name=group_name)
+                self.stdout.write(f'   ✨ Groupe Django créé: {group_name}')
             else:
-                # Mettre à jour les informations existantes
-                groupe_etendu.description = config.get('description', groupe_etendu.description)
-                groupe_etendu.couleur = config.get('color', groupe_etendu.couleur)
-                groupe_etendu.niveau_acces = config.get('level', groupe_etendu.niveau_acces)
+                self.stdout.write(f'   📌 Groupe Django existant: {group_name}')
+
+            try:
+                groupe_etendu = group.groupe_etendu
+            except GroupeEtendu.DoesNotExist:
+                groupe_etendu = GroupeEtendu(group=group, actif=True)
+            valeurs = {
+                'description': config.get('description', groupe_etendu.description),
+                'couleur': config.get('color', groupe_etendu.couleur),
+                'niveau_acces': config.get('level', groupe_etendu.niveau_acces),
+            }
+            if groupe_etendu.pk and all(getattr(groupe_etendu, champ) == valeur for champ, valeur in valeurs.items()):
+                continue
+            for champ, valeur in valeurs.items():
+                setattr(groupe_etendu, champ, valeur)
+            if not groupe_etendu.pk:
                 if not dry_run:
                     groupe_etendu.save()
+                self.stdout.write(f'   ✨ GroupeEtendu créé')
+            else:
+                a_mettre_a_jour.append(groupe_etendu)
                 self.stdout.write(f'   📝 GroupeEtendu mis à jour')
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f'   ❌ Erreur lors de la gestion du GroupeEtendu: {e}')
-            )
-
-        # Traiter les permissions Django
-        django_permissions = config.get('django_permissions', [])
-        
-        if not django_permissions:
-            self.stdout.write(f'   ⚠️  Aucune permission définie dans la configuration')
-            return
-
-        # Récupérer les permissions actuelles du groupe
-        current_permissions = set(group.permissions.values_list('codename', 'content_type__app_label'))
-        current_perm_names = {f"{app}.{codename}" for codename, app in current_permissions}
-
-        # Convertir la configuration en permissions Django
-        target_permissions = set()
-        permissions_to_add = []
-        
-        for perm_name in django_permissions:
-            try:
-                app_label, codename = perm_name.split('.', 1)
-                permission = Permission.objects.get(
-                    codename=codename,
-                    content_type__app_label=app_label
-                )
-                target_permissions.add(perm_name)
-                permissions_to_add.append(permission)
-            except Permission.DoesNotExist:
-                self.stdout.write(
-                    self.style.WARNING(f'   ⚠️  Permission introuvable: {perm_name}')
-                )
-            except ValueError:
-                self.stdout.write(
-                    self.style.ERROR(f'   ❌ Format de permission invalide: {perm_name}')
-                )
-
-        # Calculer les changements
-        to_add = target_permissions - current_perm_names
-        to_remove = current_perm_names - target_permissions
-
-        # Afficher les changements
-        if to_add:
-            self.stdout.write(f'   ➕ Permissions à ajouter ({len(to_add)}):')
-            for perm in sorted(to_add):
-                self.stdout.write(f'      • {perm}')
 
-        if to_remove:
-            self.stdout.write(f'   ➖ Permissions à supprimer ({len(to_remove)}):')
-            for perm in sorted(to_remove):
-                self.stdout.write(f'      • {perm}')
-
-        if not to_add and not to_remove:
-            self.stdout.write(f'   ✅ Permissions déjà synchronisées')
-            return
-
-        # Appliquer les changements si pas en dry-run
-        if not dry_run:
-            try:
-                # Supprimer les permissions obsolètes
-                if to_remove:
-                    perms_to_remove = Permission.objects.filter(
-                        codename__in=[perm.split('.', 1)[1] for perm in to_remove],
-                        content_type__app_label__in=[perm.split('.', 1)[0] for perm in to_remove]
-                    )
-                    group.permissions.remove(*perms_to_remove)
-
-                # Ajouter les nouvelles permissions
-                if to_add:
-                    perms_to_add = Permission.objects.filter(
-                        codename__in=[perm.split('.', 1)[1] for perm in to_add],
-                        content_type__app_label__in=[perm.split('.', 1)[0] for perm in to_add]
-                    )
-                    group.permissions.add(*perms_to_add)
-
-                self.stdout.write(f'   ✅ Permissions synchronisées avec succès')
-                
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'   ❌ Erreur lors de la synchronisation: {e}')
-                )
-        
-        # Afficher le résumé final
-        final_count = len(target_permissions)
-        self.stdout.write(f'   📊 Total des permissions configurées: {final_count}')
\ No newline at end of file
+        if a_mettre_a_jour and not dry_run:
+            maintenant = timezone.now()
+            for groupe_etendu in a_mettre_a_jour:
+                groupe_etendu.date_modification = maintenant
+            GroupeEtendu.objects.bulk_update(
+                a_mettre_a_jour, ['description', 'couleur', 'niveau_acces', 'date_modification']
+            )
+        return groups
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('gestion_groupes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historiquegroupes',
+            index=models.Index(fields=['utilisateur_cible', '-date_action'], name='historique_cible_date_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_groupes', '0003_index_historique_curseur'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoriqueGroupesArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('historique_id', models.PositiveBigIntegerField(unique=True, verbose_name="Id d'origine")),
+                ('group_id', models.PositiveIntegerField(null=True, verbose_name='Id du groupe')),
+                ('group_nom', models.CharField(max_length=150, verbose_name='Groupe')),
+                ('action', models.CharField(choices=[('create', 'Création'), ('update', 'Modification'), ('delete', 'Suppression'), ('add_user', 'Ajout utilisateur'), ('remove_user', 'Retrait utilisateur'), ('add_permission', 'Ajout permission'), ('remove_permission', 'Retrait permission')], max_length=20, verbose_name='Action')),
+                ('utilisateur_modifieur_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('utilisateur_modifieur_nom', models.CharField(blank=True, max_length=150, verbose_name='Modifié par')),
+                ('utilisateur_cible_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('utilisateur_cible_nom', models.CharField(blank=True, max_length=150, verbose_name='Utilisateur concerné')),
+                ('permission_cible', models.CharField(blank=True, max_length=255, verbose_name='Permission concernée')),
+                ('details', models.TextField(blank=True, verbose_name="Détails de l'action")),
+                ('date_action', models.DateTimeField(verbose_name="Date de l'action")),
+                ('date_archivage', models.DateTimeField(auto_now_add=True, verbose_name="Date d'archivage")),
+            ],
+            options={
+                'verbose_name': 'Historique archivé',
+                'verbose_name_plural': 'Historiques archivés',
+                'ordering': ['-date_action'],
+                'indexes': [models.Index(fields=['-date_action'], name='archive_date_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumeHistoriqueGroupes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(verbose_name='Mois')),
+                ('group_nom', models.CharField(max_length=150, verbose_name='Groupe')),
+                ('action', models.CharField(choices=[('create', 'Création'), ('update', 'Modification'), ('delete', 'Suppression'), ('add_user', 'Ajout utilisateur'), ('remove_user', 'Retrait utilisateur'), ('add_permission', 'Ajout permission'), ('remove_permission', 'Retrait permission')], max_length=20, verbose_name='Action')),
+                ('nombre', models.PositiveIntegerField(default=0, verbose_name="Nombre d'actions")),
+            ],
+            options={
+                'verbose_name': "Résumé de l'historique des groupes",
+                'verbose_name_plural': "Résumés de l'historique des groupes",
+                'ordering': ['-mois', 'group_nom', 'action'],
+                'constraints': [models.UniqueConstraint(fields=('mois', 'group_nom', 'action'), name='resume_historique_unique')],
+            },
+        ),
+    ]
@@ -150,6 +150,58 @@ class HistoriqueGroupes(models.Model):
         verbose_name = "Historique des groupes"
         verbose_name_plural = "Historiques des groupes"
         ordering = ['-date_action']
+        indexes = [
+            # Historique d'un utilisateur, le plus récent d'abord (page de profil)
+            models.Index(fields=['utilisateur_cible', '-date_action'], name='historique_cible_date_idx'),
+            # Pagination par curseur de l'historique complet
+            models.Index(fields=['-date_action', '-id'], name='historique_date_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.group.name} - {self.get_action_display()} - {self.date_action.strftime('%d/%m/%Y %H:%M')}"
+
+
+class HistoriqueGroupesArchive(models.Model):
+    """Entrée d'historique archivée par archive_group_history (copie figée, sans clé étrangère)"""
+    historique_id = models.PositiveBigIntegerField(unique=True, verbose_name="Id d'origine")
+    group_id = models.PositiveIntegerField(null=True, verbose_name="Id du groupe")
+    group_nom = models.CharField(max_length=150, verbose_name="Groupe")
+    action = models.CharField(max_length=20, choices=HistoriqueGroupes.ACTION_CHOICES, verbose_name="Action")
+    utilisateur_modifieur_id = models.PositiveIntegerField(null=True, blank=True)
+    utilisateur_modifieur_nom = models.CharField(max_length=150, blank=True, verbose_name="Modifié par")
+    utilisateur_cible_id = models.PositiveIntegerField(null=True, blank=True)
+    utilisateur_cible_nom = models.CharField(max_length=150, blank=True, verbose_name="Utilisateur concerné")
+    permission_cible = models.CharField(max_length=255, blank=True, verbose_name="Permission concernée")
+    details = models.TextField(blank=True, verbose_name="Détails de l'action")
+    date_action = models.DateTimeField(verbose_name="Date de l'action")
+    date_archivage = models.DateTimeField(auto_now_add=True, verbose_name="Date d'archivage")
+
+    class Meta:
+        verbose_name = "Historique archivé"
+        verbose_name_plural = "Historiques archivés"
+        ordering = ['-date_action']
+        indexes = [
+            models.Index(fields=['-date_action'], name='archive_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.group_nom} - {self.get_action_display()} - {self.date_action.strftime('%d/%m/%Y %H:%M')}"
+
+
+class ResumeHistoriqueGroupes(models.Model):
+    """Nombre d'actions archivées par mois, groupe et action : les comptes historiques restent consultables"""
+    mois = models.DateField(verbose_name="Mois")
+    group_nom = models.CharField(max_length=150, verbose_name="Groupe")
+    action = models.CharField(max_length=20, choices=HistoriqueGroupes.ACTION_CHOICES, verbose_name="Action")
+    nombre = models.PositiveIntegerField(default=0, verbose_name="Nombre d'actions")
+
+    class Meta:
+        verbose_name = "Résumé de l'historique des groupes"
+        verbose_name_plural = "Résumés de l'historique des groupes"
+        ordering = ['-mois', 'group_nom', 'action']
+        constraints = [
+            models.UniqueConstraint(fields=['mois', 'group_nom', 'action'], name='resume_historique_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.mois.strftime('%m/%Y')} - {self.group_nom} - {self.get_action_display()} : {self.nombre}"
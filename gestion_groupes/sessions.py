@@ -0,0 +1,47 @@
+# gestion_groupes/sessions.py
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+# Horodatage (epoch) de la dernière écriture réelle de la session
+CLE_DERNIERE_ECRITURE = '_session_ecrite_le'
+
+
+class SessionStore(CachedDBStore):
+    """
+    Sessions en cache avec persistance en base, à écritures regroupées.
+
+    Avec SESSION_SAVE_EVERY_REQUEST, le middleware appelle save() à chaque
+    requête pour faire glisser l'expiration. On n'écrit réellement que si les
+    données ont changé ou si la dernière écriture date de plus de
+    SESSION_SAVE_THRESHOLD secondes : l'expiration côté serveur glisse donc
+    par paliers, avec au plus ce retard (le cookie, lui, est renvoyé à
+    chaque requête par le middleware).
+    """
+
+    @staticmethod
+    def seuil_ecriture():
+        return getattr(settings, 'SESSION_SAVE_THRESHOLD', 300)
+
+    def _ecriture_necessaire(self, donnees, must_create):
+        if must_create or self.modified or self.session_key is None:
+            return True
+        ecrite_le = donnees.get(CLE_DERNIERE_ECRITURE)
+        if ecrite_le is None:
+            return True
+        return time.time() - ecrite_le >= self.seuil_ecriture()
+
+    def save(self, must_create=False):
+        donnees = self._get_session()
+        if not self._ecriture_necessaire(donnees, must_create):
+            return
+        donnees[CLE_DERNIERE_ECRITURE] = int(time.time())
+        super().save(must_create)
+
+    async def asave(self, must_create=False):
+        donnees = await self._aget_session()
+        if not self._ecriture_necessaire(donnees, must_create):
+            return
+        donnees[CLE_DERNIERE_ECRITURE] = int(time.time())
+        await super().asave(must_create)
@@ -1,47 +1,76 @@
 # gestion_groupes/signals.py
+from functools import partial
+
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import Group, User
 
 
+# Service 'Non défini' (créé par la migration 0009 de suivi_conducteurs) : son id est
+# gardé en cache par le processus, oublié dès que le service est modifié ou supprimé
+NOM_SERVICE_NON_DEFINI = 'Non défini'
+_service_non_defini_id = None
+
+
+def get_service_non_defini_id():
+    """Retourne l'id du service 'Non défini' (recréé s'il a été supprimé)"""
+    global _service_non_defini_id
+    if _service_non_defini_id is None:
+        from suivi_conducteurs.models import Service
+        service_none, _ = Service.objects.get_or_create(
+            nom=NOM_SERVICE_NON_DEFINI,
+            defaults={'abreviation': 'ND'}
+        )
+        _service_non_defini_id = service_none.pk
+    return _service_non_defini_id
+
+
+@receiver([post_save, post_delete], sender='suivi_conducteurs.Service')
+def invalider_service_non_defini(sender, instance, **kwargs):
+    """Le service 'Non défini' renommé ou supprimé : l'id sera relu par son nom"""
+    global _service_non_defini_id
+    if instance.pk == _service_non_defini_id or instance.nom == NOM_SERVICE_NON_DEFINI:
+        _service_non_defini_id = None
+
+
 @receiver(post_save, sender='auth.User')
-def create_or_update_user_profile(sender, instance, created, **kwargs):
+def create_or_update_user_profile(sender, instance, created, update_fields=None, **kwargs):
     """Créer automatiquement un profil utilisateur lors de la création d'un user"""
     from .models import ProfilUtilisateur
     
     if created:
-        from suivi_conducteurs.models import Service
-        service_none, _ = Service.objects.get_or_create(
-            nom='Non défini',
-            defaults={'abreviation': 'ND'}
-        )
         ProfilUtilisateur.objects.get_or_create(
             user=instance,
             defaults={
                 'actif': instance.is_active,
-                'service': service_none,
+                'service_id': get_service_non_defini_id(),
                 'poste': 'Non défini',
             }
         )
-    else:
-        # Mettre à jour le profil si il existe
-        try:
-            profil = instance.profil
-            profil.actif = instance.is_active
-            profil.save()
-        except ProfilUtilisateur.DoesNotExist:
-            # Créer le profil s'il n'existe pas
-            from suivi_conducteurs.models import Service
-            service_none, _ = Service.objects.get_or_create(
-                nom='Non défini',
-                defaults={'abreviation': 'ND'}
-            )
-            ProfilUtilisateur.objects.create(
-                user=instance,
-                actif=instance.is_active,
-                service=service_none,
-                poste='Non défini',
-            )
+        return
+
+    # Sauvegarde partielle sans is_active (ex. mise à jour de last_login
+    # à chaque connexion) : rien ne concerne le profil
+    if update_fields is not None and 'is_active' not in update_fields:
+        return
+
+    try:
+        profil = instance.profil
+    except ProfilUtilisateur.DoesNotExist:
+        # Créer le profil s'il n'existe pas
+        ProfilUtilisateur.objects.create(
+            user=instance,
+            actif=instance.is_active,
+            service_id=get_service_non_defini_id(),
+            poste='Non défini',
+        )
+        return
+
+    # Mettre à jour le profil seulement si le statut actif a réellement changé
+    if profil.actif != instance.is_active:
+        profil.actif = instance.is_active
+        profil.save(update_fields=['actif', 'date_modification'])
 
 
 @receiver(post_save, sender='auth.Group')
@@ -62,43 +91,59 @@ def create_or_update_group_extended(sender, instance, created, **kwargs):
 
 
 @receiver(m2m_changed, sender=Group.user_set.through)
-def track_user_group_changes(sender, instance, action, pk_set, **kwargs):
+def track_user_group_changes(sender, instance, action, reverse, model, pk_set, **kwargs):
     """Suivre les changements d'affectation des utilisateurs aux groupes"""
     from .models import HistoriqueGroupes
-    
+
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+
+    # Une seule requête pour toutes les cibles, quel que soit le nombre de pk
+    cibles = model.objects.in_bulk(pk_set)
+    if reverse:
+        # group.user_set.add(...) : instance est le groupe, les cibles sont des utilisateurs
+        paires = [(instance, user) for user in cibles.values()]
+    else:
+        # user.groups.add(...) : instance est l'utilisateur, les cibles sont des groupes
+        paires = [(group, instance) for group in cibles.values()]
+
     if action == "post_add":
-        for user_pk in pk_set:
-            try:
-                user = User.objects.get(pk=user_pk)
-                HistoriqueGroupes.objects.create(
-                    group=instance,
-                    action='add_user',
-                    utilisateur_cible=user,
-                    details=f'Ajout de {user.username} au groupe {instance.name}'
-                )
-                
-                # NOUVEAU : Créer automatiquement un évaluateur si ajouté à RH ou Exploitation
-                create_evaluateur_if_needed(user)
-                
-            except User.DoesNotExist:
-                pass
-    
-    elif action == "post_remove":
-        for user_pk in pk_set:
-            try:
-                user = User.objects.get(pk=user_pk)
-                HistoriqueGroupes.objects.create(
-                    group=instance,
-                    action='remove_user',
-                    utilisateur_cible=user,
-                    details=f'Retrait de {user.username} du groupe {instance.name}'
-                )
-                
-                # NOUVEAU : Vérifier s'il faut supprimer l'évaluateur
-                update_evaluateur_status(user)
-                
-            except User.DoesNotExist:
-                pass
+        historiques = [
+            HistoriqueGroupes(
+                group=group,
+                action='add_user',
+                utilisateur_cible=user,
+                details=f'Ajout de {user.username} au groupe {group.name}'
+            )
+            for group, user in paires
+        ]
+        # Créer automatiquement un évaluateur si ajouté à RH ou Exploitation
+        suivi_evaluateur = create_evaluateur_if_needed
+    else:
+        historiques = [
+            HistoriqueGroupes(
+                group=group,
+                action='remove_user',
+                utilisateur_cible=user,
+                details=f'Retrait de {user.username} du groupe {group.name}'
+            )
+            for group, user in paires
+        ]
+        # Vérifier s'il faut mettre à jour l'évaluateur
+        suivi_evaluateur = update_evaluateur_status
+
+    HistoriqueGroupes.objects.bulk_create(historiques)
+
+    # Le suivi des évaluateurs lit les groupes de chaque utilisateur :
+    # on l'exécute une fois la transaction validée, une fois par utilisateur
+    utilisateurs = list({user.pk: user for _, user in paires}.values())
+    transaction.on_commit(partial(_suivre_evaluateurs, suivi_evaluateur, utilisateurs))
+
+
+def _suivre_evaluateurs(suivi_evaluateur, utilisateurs):
+    """Applique la fonction de suivi des évaluateurs à chaque utilisateur"""
+    for user in utilisateurs:
+        suivi_evaluateur(user)
 
 
 def create_evaluateur_if_needed(user):
@@ -119,8 +164,7 @@ def create_evaluateur_if_needed(user):
             # Mettre à jour le service si nécessaire
             nouveau_service = determine_service_from_groups(list(user_groups))
             if nouveau_service and evaluateur.service != nouveau_service:
-                evaluateur.service = nouveau_service
-                evaluateur.save()
+                affecter_service_evaluateur(evaluateur, nouveau_service)
                 print(f"Service de l'évaluateur {user.username} mis à jour : {nouveau_service.nom}")
         
         except Evaluateur.DoesNotExist:
@@ -133,14 +177,30 @@ def create_evaluateur_if_needed(user):
                 evaluateur = Evaluateur.objects.create(
                     user=user,
                     nom=nom,
-                    prenom=prenom,
-                    service=service
+                    prenom=prenom
                 )
+                affecter_service_evaluateur(evaluateur, service)
                 print(f"✅ Évaluateur créé automatiquement pour {user.username} dans le service {service.nom}")
             else:
                 print(f"⚠️ Impossible de créer l'évaluateur pour {user.username} : données insuffisantes ou service manquant")
 
 
+def affecter_service_evaluateur(evaluateur, service):
+    """
+    Le service d'un évaluateur est porté par le profil de son utilisateur
+    (Evaluateur.service est une propriété en lecture seule)
+    """
+    from .models import ProfilUtilisateur
+
+    try:
+        profil = evaluateur.user.profil
+    except ProfilUtilisateur.DoesNotExist:
+        return
+    if profil.service_id != service.pk:
+        profil.service = service
+        profil.save(update_fields=['service', 'date_modification'])
+
+
 def update_evaluateur_status(user):
     """
     Met à jour le statut de l'évaluateur quand l'utilisateur change de groupes
@@ -170,8 +230,7 @@ def update_evaluateur_status(user):
             # Mettre à jour le service selon les nouveaux groupes
             nouveau_service = determine_service_from_groups(list(user_groups))
             if nouveau_service and evaluateur.service != nouveau_service:
-                evaluateur.service = nouveau_service
-                evaluateur.save()
+                affecter_service_evaluateur(evaluateur, nouveau_service)
                 print(f"Service de l'évaluateur {user.username} mis à jour : {nouveau_service.nom}")
     
     except Evaluateur.DoesNotExist:
@@ -280,36 +339,44 @@ def get_user_full_name(user):
 
 
 @receiver(m2m_changed, sender=Group.permissions.through)
-def track_group_permission_changes(sender, instance, action, pk_set, **kwargs):
+def track_group_permission_changes(sender, instance, action, reverse, model, pk_set, **kwargs):
     """Suivre les changements de permissions des groupes"""
-    from django.contrib.auth.models import Permission
     from .models import HistoriqueGroupes
-    
-    if action == "post_add":
-        for perm_pk in pk_set:
-            try:
-                permission = Permission.objects.get(pk=perm_pk)
-                HistoriqueGroupes.objects.create(
-                    group=instance,
-                    action='add_permission',
-                    permission_cible=permission,
-                    details=f'Ajout de la permission {permission.name} au groupe {instance.name}'
-                )
-            except Permission.DoesNotExist:
-                pass
-    
-    elif action == "post_remove":
-        for perm_pk in pk_set:
-            try:
-                permission = Permission.objects.get(pk=perm_pk)
-                HistoriqueGroupes.objects.create(
-                    group=instance,
-                    action='remove_permission',
-                    permission_cible=permission,
-                    details=f'Retrait de la permission {permission.name} du groupe {instance.name}'
-                )
-            except Permission.DoesNotExist:
-                pass
+
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+
+    cibles = model.objects.in_bulk(pk_set)
+    if reverse:
+        # permission.group_set.add(...) : instance est la permission, les cibles sont des groupes
+        paires = [(group, instance) for group in cibles.values()]
+    else:
+        # group.permissions.add(...) : instance est le groupe, les cibles sont des permissions
+        paires = [(instance, permission) for permission in cibles.values()]
+
+    HistoriqueGroupes.objects.bulk_create(
+        historiques_permissions('add_permission' if action == "post_add" else 'remove_permission', paires)
+    )
+
+
+def historiques_permissions(action, paires):
+    """Entrées d'historique (non enregistrées) d'ajout ou de retrait de permissions,
+    une par couple (groupe, permission)"""
+    from .models import HistoriqueGroupes
+
+    if action == 'add_permission':
+        modele = 'Ajout de la permission {permission} au groupe {groupe}'
+    else:
+        modele = 'Retrait de la permission {permission} du groupe {groupe}'
+    return [
+        HistoriqueGroupes(
+            group=group,
+            action=action,
+            permission_cible=permission,
+            details=modele.format(permission=permission.name, groupe=group.name)
+        )
+        for group, permission in paires
+    ]
 
 
 @receiver(post_delete, sender='auth.Group')
@@ -1,3 +1,299 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, identify_hasher
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from suivi_conducteurs.models import Service
+from suivi_conducteurs.tests import CACHES_TESTS, NombreRequetesConstantMixin, changelists
+
+from .config import configuration_groupes
+from .hashers import PBKDF2IterationsConfigurablesHasher
+from .models import HistoriqueGroupes, HistoriqueGroupesArchive, ResumeHistoriqueGroupes
+from .sessions import SessionStore
+from .signals import get_service_non_defini_id
+
+
+@override_settings(CACHES=CACHES_TESTS)
+class RequetesGestionGroupesTests(NombreRequetesConstantMixin, TestCase):
+    """Nombre de requêtes des API, du profil et des listes d'administration des utilisateurs et groupes"""
+
+    # Les pages HTML de gestion_groupes (gabarits absents) ne sont pas mesurées
+    REQUETES = {
+        'gestion_groupes:api_stats': 1,
+        'gestion_groupes:autocomplete_utilisateurs': 2,
+        'dashboard_stats': 9,
+        'user_profile': 5,
+        'admin:user': 8,
+        'admin:group': 6,
+        'admin:profilutilisateur': 5,
+        'admin:groupeetendu': 5,
+        'admin:historiquegroupes': 7,
+        'admin:historiquegroupesarchive': 6,
+        'admin:resumehistoriquegroupes': 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.permissions = list(Permission.objects.order_by('pk')[:20])
+        cls.numero = 0
+
+    def peupler(self, nombre):
+        """Ajoute nombre groupes avec nombre permissions, et nombre utilisateurs membres de chaque groupe"""
+        for _ in range(nombre):
+            self.__class__.numero += 1
+            n = self.numero
+            groupe = Group.objects.create(name=f'Groupe {n}')
+            groupe.permissions.add(*self.permissions[:nombre])
+            for i in range(nombre):
+                user = User.objects.create_user(f'utilisateur{n}-{i}', first_name='Uti', last_name=f'Lisateur {n}')
+                groupe.user_set.add(user)
+            self.admin.groups.add(groupe)
+            HistoriqueGroupes.objects.create(
+                group=groupe, action='update', utilisateur_modifieur=self.admin, details=f'Groupe {n}',
+            )
+            HistoriqueGroupesArchive.objects.create(
+                historique_id=n, group_id=groupe.pk, group_nom=groupe.name, action='update',
+                details=f'Groupe {n}', date_action=timezone.now(),
+            )
+            ResumeHistoriqueGroupes.objects.create(
+                mois=date(2024, 1, 1), group_nom=groupe.name, action='update', nombre=n,
+            )
+        return {}
+
+    def routes(self, objets):
+        return [
+            ('gestion_groupes:api_stats', reverse('gestion_groupes:api_stats')),
+            ('gestion_groupes:autocomplete_utilisateurs', reverse('gestion_groupes:autocomplete_utilisateurs') + '?q=uti'),
+            ('dashboard_stats', reverse('dashboard_stats')),
+            ('user_profile', reverse('user_profile')),
+        ] + changelists('auth') + changelists('gestion_groupes')
+
+
+class ArchiveHistoriqueTests(TestCase):
+    """Déplacement de l'historique ancien vers l'archive et le résumé mensuel"""
+
+    def test_archive_les_entrees_anciennes_par_lots(self):
+        groupe = Group.objects.create(name='Exploitation')
+        ancien = timezone.now() - timedelta(days=800)
+        for i in range(5):
+            HistoriqueGroupes.objects.create(group=groupe, action='add_user', date_action=ancien + timedelta(hours=i))
+        recent = HistoriqueGroupes.objects.create(group=groupe, action='update')
+
+        call_command('archive_group_history', months=12, batch_size=2, pause=0, stdout=StringIO())
+
+        self.assertEqual(list(HistoriqueGroupes.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertEqual(HistoriqueGroupesArchive.objects.filter(group_nom='Exploitation').count(), 5)
+        resume = ResumeHistoriqueGroupes.objects.get()
+        self.assertEqual((resume.group_nom, resume.action, resume.nombre), ('Exploitation', 'add_user', 5))
+
+
+class HistoriqueSignauxTests(TestCase):
+    """Historique des affectations et permissions : un lot d'entrées par changement, des deux côtés de la relation"""
+
+    def setUp(self):
+        self.groupes = [Group.objects.create(name=nom) for nom in ('Alpha', 'Beta')]
+        self.utilisateurs = [User.objects.create_user(nom) for nom in ('anne', 'bruno')]
+        self.permissions = list(Permission.objects.filter(content_type__app_label='auth').order_by('pk')[:2])
+        HistoriqueGroupes.objects.all().delete()
+
+    def insertions(self, modification):
+        """Exécute modification() et renvoie le nombre d'INSERT dans l'historique"""
+        with CaptureQueriesContext(connection) as requetes, self.captureOnCommitCallbacks():
+            modification()
+        table = HistoriqueGroupes._meta.db_table
+        return sum(requete['sql'].startswith(f'INSERT INTO "{table}"') for requete in requetes)
+
+    def entrees(self, action, cible):
+        return set(HistoriqueGroupes.objects.filter(action=action).values_list('group__name', cible))
+
+    def test_affectations(self):
+        alpha, beta = self.groupes
+        anne, bruno = self.utilisateurs
+        self.assertEqual(self.insertions(lambda: alpha.user_set.add(anne, bruno)), 1)
+        self.assertEqual(self.insertions(lambda: anne.groups.add(beta)), 1)
+        self.assertEqual(
+            self.entrees('add_user', 'utilisateur_cible__username'),
+            {('Alpha', 'anne'), ('Alpha', 'bruno'), ('Beta', 'anne')},
+        )
+
+        self.assertEqual(self.insertions(lambda: anne.groups.remove(alpha, beta)), 1)
+        self.assertEqual(
+            self.entrees('remove_user', 'utilisateur_cible__username'), {('Alpha', 'anne'), ('Beta', 'anne')},
+        )
+
+    def test_permissions(self):
+        alpha, beta = self.groupes
+        premiere, seconde = self.permissions
+        self.assertEqual(self.insertions(lambda: alpha.permissions.add(premiere, seconde)), 1)
+        self.assertEqual(self.insertions(lambda: premiere.group_set.add(beta)), 1)
+        self.assertEqual(self.entrees('add_permission', 'permission_cible'), {
+            ('Alpha', premiere.pk), ('Alpha', seconde.pk), ('Beta', premiere.pk),
+        })
+
+        self.assertEqual(self.insertions(lambda: premiere.group_set.remove(alpha, beta)), 1)
+        self.assertEqual(self.entrees('remove_permission', 'permission_cible'), {
+            ('Alpha', premiere.pk), ('Beta', premiere.pk),
+        })
+
+
+class SyncGroupPermissionsTests(TestCase):
+    """Synchronisation des permissions : diff appliqué, historique des seuls changements faits"""
+
+    def test_diff_historique_et_relance(self):
+        groupe = Group.objects.create(name='RH')
+        en_trop = Permission.objects.get(content_type__app_label='auth', codename='delete_group')
+        deja = Permission.objects.get(content_type__app_label='suivi_conducteurs', codename='view_conducteur')
+        groupe.permissions.add(en_trop, deja)
+        HistoriqueGroupes.objects.all().delete()
+
+        call_command('sync_group_permissions', group='RH', stdout=StringIO())
+
+        configurees = set(configuration_groupes['RH']['django_permissions'])
+        self.assertNotIn('auth.delete_group', configurees)
+        permissions = {
+            f'{permission.content_type.app_label}.{permission.codename}': permission.pk
+            for permission in groupe.permissions.select_related('content_type')
+        }
+        self.assertEqual(set(permissions), configurees)
+        historique = HistoriqueGroupes.objects.filter(group=groupe)
+        self.assertEqual(
+            list(historique.filter(action='remove_permission').values_list('permission_cible', flat=True)), [en_trop.pk],
+        )
+        self.assertEqual(
+            set(historique.filter(action='add_permission').values_list('permission_cible', flat=True)),
+            set(permissions.values()) - {deja.pk},
+        )
+
+        # Relance sans changement : lectures seulement, aucun historique
+        with self.assertNumQueries(5):
+            call_command('sync_group_permissions', group='RH', stdout=StringIO())
+        self.assertEqual(historique.count(), len(configurees))
+
+
+class ServiceNonDefiniTests(TestCase):
+    """Id du service 'Non défini' : lu une fois, oublié si le service change"""
+
+    def setUp(self):
+        # Cache du processus remis en l'état à la fin du test (le service créé ici est annulé)
+        patcher = mock.patch('gestion_groupes.signals._service_non_defini_id', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cache_et_invalidation(self):
+        with self.assertNumQueries(1):
+            existant = get_service_non_defini_id()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_service_non_defini_id(), existant)
+
+        # Supprimé : le service est recréé à la lecture suivante
+        Service.objects.filter(pk=existant).delete()
+        cree = get_service_non_defini_id()
+        self.assertNotEqual(cree, existant)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_service_non_defini_id(), cree)
+
+        # Renommé : l'id est relu par le nom, le service est recréé
+        Service.objects.filter(pk=cree).update(nom='Renommé')
+        Service.objects.get(pk=cree).save()
+        self.assertNotIn(get_service_non_defini_id(), (existant, cree))
+
+
+@override_settings(CACHES=CACHES_TESTS)
+class ConnexionTests(TestCase):
+    """Connexion : un seul calcul du hash du mot de passe par tentative"""
+
+    def setUp(self):
+        User.objects.create_user('anne', password='motdepasse')
+
+    def connecter(self, mot_de_passe):
+        with mock.patch.object(
+            PBKDF2IterationsConfigurablesHasher, 'verify', autospec=True, side_effect=PBKDF2PasswordHasher.verify,
+        ) as verify:
+            response = self.client.post(reverse('login'), {'username': 'anne', 'password': mot_de_passe})
+        return response, verify.call_count
+
+    def test_un_calcul_du_hash(self):
+        response, calculs = self.connecter('motdepasse')
+        self.assertRedirects(response, '/dashboard/', fetch_redirect_response=False)
+        self.assertEqual(calculs, 1)
+
+        self.client.logout()
+        response, calculs = self.connecter('faux')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(calculs, 1)
+
+    def test_hash_identifie_par_le_hasher_configurable(self):
+        encode = User.objects.get(username='anne').password
+        self.assertIsInstance(identify_hasher(encode), PBKDF2IterationsConfigurablesHasher)
+
+
+@override_settings(CACHES=CACHES_TESTS, SESSION_SAVE_THRESHOLD=300)
+class SessionsTests(TestCase):
+    """Sessions à écritures regroupées : réécrites si modifiées ou après SESSION_SAVE_THRESHOLD secondes"""
+
+    DEBUT = 1_000_000
+
+    def setUp(self):
+        with mock.patch('gestion_groupes.sessions.time.time', return_value=self.DEBUT):
+            session = SessionStore()
+            session['panier'] = 1
+            session.save()
+        self.cle = session.session_key
+
+    def ecritures(self, secondes, modification=None):
+        """Écritures réelles d'une requête arrivant secondes après la création de la session"""
+        session = SessionStore(self.cle)
+        if modification:
+            modification(session)
+        with mock.patch('gestion_groupes.sessions.time.time', return_value=self.DEBUT + secondes), \
+                mock.patch.object(CachedDBStore, 'save', autospec=True) as save:
+            session.save()
+        return save.call_count
+
+    def test_ecritures_regroupees(self):
+        self.assertEqual(self.ecritures(10), 0)
+        self.assertEqual(self.ecritures(299), 0)
+        self.assertEqual(self.ecritures(300), 1)
+
+    def test_session_modifiee_reecrite(self):
+        self.assertEqual(self.ecritures(10, lambda session: session.update({'panier': 2})), 1)
+
+
+@override_settings(CACHES=CACHES_TESTS)
+class StatistiquesAsynchronesTests(TestCase):
+    """API asynchrone dashboard_stats : chaque section est réservée à sa permission"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create_user('anne')
+        lecteurs = Group.objects.create(name='Lecteurs')
+        lecteurs.permissions.add(
+            Permission.objects.get(content_type__app_label='suivi_conducteurs', codename='view_conducteur'),
+            Permission.objects.get(content_type__app_label='suivi_conducteurs', codename='view_site'),
+        )
+        cls.utilisateur.groups.add(lecteurs)
+
+    async def statistiques(self):
+        response = await self.async_client.get(reverse('dashboard_stats'))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    async def test_anonyme(self):
+        self.assertEqual(await self.statistiques(), {'user': {'groupes': [], 'permissions_count': 0}})
+
+    async def test_sections_selon_les_permissions(self):
+        await self.async_client.aforce_login(self.utilisateur)
+        stats = await self.statistiques()
+        # view_conducteur sans view_evaluation : pas de section évaluations
+        self.assertNotIn('evaluations', stats)
+        self.assertEqual(stats['conducteurs'], {'total': 0, 'actifs': 0})
+        self.assertEqual(stats['user'], {'groupes': ['Lecteurs'], 'permissions_count': 2})
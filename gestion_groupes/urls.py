@@ -11,6 +11,7 @@ urlpatterns = [
     # Utilisateurs
     path('utilisateurs/', views.liste_utilisateurs, name='liste_utilisateurs'),
     path('utilisateurs/<int:user_id>/', views.detail_utilisateur, name='detail_utilisateur'),
+    path('utilisateurs/autocomplete/', views.autocomplete_utilisateurs, name='autocomplete_utilisateurs'),
     
     # Groupes
     path('groupes/', views.liste_groupes, name='liste_groupes'),
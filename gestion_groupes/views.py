@@ -4,10 +4,12 @@ from django.contrib.auth.decorators import permission_required
 from django.contrib.auth.models import User, Group
 from django.contrib import messages
 from django.db.models import Count, Q
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseForbidden
 from django.core.paginator import Paginator
 from django.utils import timezone
-from datetime import timedelta
+from django.views.decorators.http import require_http_methods
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
 
 from .models import ProfilUtilisateur, GroupeEtendu, HistoriqueGroupes
 
@@ -219,9 +221,30 @@ def detail_groupe(request, group_id):
     return render(request, 'gestion_groupes/detail_groupe.html', context)
 
 
+HISTORIQUE_PAR_PAGE = 30
+
+# Nombre maximal de suggestions renvoyées par l'autocomplétion des utilisateurs
+AUTOCOMPLETE_LIMITE = 10
+AUTOCOMPLETE_LONGUEUR_MINI = 2
+
+
+def encoder_curseur(entree):
+    """Curseur opaque désignant la position (date_action, id) d'une entrée de l'historique"""
+    return urlsafe_b64encode(f'{entree.date_action.isoformat()}|{entree.pk}'.encode()).decode()
+
+
+def decoder_curseur(curseur):
+    """(date_action, id) du curseur, ou None s'il est invalide"""
+    try:
+        date_action, pk = urlsafe_b64decode(curseur.encode()).decode().split('|')
+        return datetime.fromisoformat(date_action), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
 @permission_required('auth.view_group', raise_exception=True)
 def historique_complet(request):
-    """Historique complet des modifications des groupes"""
+    """Historique complet des modifications des groupes, paginé par curseur (date_action, id)"""
     
     # Filtres
     group_filter = request.GET.get('group', '')
@@ -238,29 +261,43 @@ def historique_complet(request):
     if action_filter:
         historique = historique.filter(action=action_filter)
     
+    utilisateur_filtre = None
     if user_filter:
         historique = historique.filter(
             Q(utilisateur_modifieur__id=user_filter) |
             Q(utilisateur_cible__id=user_filter)
         )
+        utilisateur_filtre = User.objects.filter(pk=user_filter).first()
     
-    historique = historique.order_by('-date_action')
+    # Pagination par curseur : pas de COUNT ni d'OFFSET sur une table qui ne fait que grandir
+    curseur = decoder_curseur(request.GET.get('apres', ''))
+    if curseur:
+        date_action, pk = curseur
+        historique = historique.filter(
+            Q(date_action__lt=date_action) | Q(date_action=date_action, id__lt=pk)
+        )
+    entrees = list(historique.order_by('-date_action', '-id')[:HISTORIQUE_PAR_PAGE + 1])
+    curseur_suivant = None
+    if len(entrees) > HISTORIQUE_PAR_PAGE:
+        entrees = entrees[:HISTORIQUE_PAR_PAGE]
+        curseur_suivant = encoder_curseur(entrees[-1])
     
-    # Pagination
-    paginator = Paginator(historique, 30)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Filtres à conserver dans le lien vers la page suivante
+    parametres_filtres = request.GET.copy()
+    parametres_filtres.pop('apres', None)
     
-    # Données pour les filtres
+    # Données pour les filtres (utilisateur : autocomplétion HTMX)
     groupes = Group.objects.all().order_by('name')
     actions = HistoriqueGroupes.ACTION_CHOICES
-    utilisateurs = User.objects.filter(is_active=True).order_by('last_name', 'first_name')
     
     context = {
-        'page_obj': page_obj,
+        'historique': entrees,
+        'curseur_suivant': curseur_suivant,
+        'premiere_page': curseur is None,
+        'parametres_filtres': parametres_filtres.urlencode(),
         'groupes': groupes,
         'actions': actions,
-        'utilisateurs': utilisateurs,
+        'utilisateur_filtre': utilisateur_filtre,
         'group_filter': group_filter,
         'action_filter': action_filter,
         'user_filter': user_filter,
@@ -268,18 +305,52 @@ def historique_complet(request):
     return render(request, 'gestion_groupes/historique.html', context)
 
 
+@require_http_methods(["GET"])
+async def autocomplete_utilisateurs(request):
+    """Suggestions d'utilisateurs actifs dont le nom commence par q, via HTMX (vue asynchrone)"""
+    user = await request.auser()
+    if not await user.ahas_perm('auth.view_group'):
+        return HttpResponseForbidden()
+    
+    recherche = request.GET.get('q', '').strip()
+    utilisateurs = []
+    if len(recherche) >= AUTOCOMPLETE_LONGUEUR_MINI:
+        utilisateurs = [
+            utilisateur async for utilisateur in User.objects.filter(
+                Q(username__istartswith=recherche) |
+                Q(last_name__istartswith=recherche) |
+                Q(first_name__istartswith=recherche),
+                is_active=True
+            ).only('username', 'first_name', 'last_name').order_by('last_name', 'first_name', 'username')[:AUTOCOMPLETE_LIMITE]
+        ]
+    
+    context = {
+        'utilisateurs': utilisateurs,
+        'recherche': recherche,
+        'longueur_mini': AUTOCOMPLETE_LONGUEUR_MINI,
+        'limite_atteinte': len(utilisateurs) == AUTOCOMPLETE_LIMITE,
+    }
+    return render(request, 'gestion_groupes/partials/autocomplete_utilisateurs.html', context)
+
+
 # Pas de décorateur nécessaire pour une API simple
-def api_stats_groupes(request):
-    """API pour les statistiques des groupes (pour graphiques)"""
+async def api_stats_groupes(request):
+    """API pour les statistiques des groupes (pour graphiques), vue asynchrone"""
+    
+    # Une seule requête : compteurs annotés et groupe étendu joint
+    groupes = Group.objects.select_related('groupe_etendu').annotate(
+        users_count=Count('user', distinct=True),
+        permissions_count=Count('permissions', distinct=True)
+    ).order_by('name')
     
     stats = []
-    for group in Group.objects.all():
+    async for group in groupes:
         try:
             groupe_etendu = group.groupe_etendu
             stats.append({
                 'name': group.name,
-                'users': group.user_set.count(),
-                'permissions': group.permissions.count(),
+                'users': group.users_count,
+                'permissions': group.permissions_count,
                 'niveau': groupe_etendu.niveau_acces,
                 'couleur': groupe_etendu.couleur,
                 'actif': groupe_etendu.actif,
@@ -287,8 +358,8 @@ def api_stats_groupes(request):
         except GroupeEtendu.DoesNotExist:
             stats.append({
                 'name': group.name,
-                'users': group.user_set.count(),
-                'permissions': group.permissions.count(),
+                'users': group.users_count,
+                'permissions': group.permissions_count,
                 'niveau': 1,
                 'couleur': '#6c757d',
                 'actif': True,
@@ -57,14 +57,36 @@ class DashboardManager {
     }
     
     setupRecentActivities() {
-        const activities = document.querySelectorAll('.activity-item');
+        // Mises à jour poussées par le serveur (Server-Sent Events) :
+        // plus de rafraîchissement périodique, le serveur n'envoie que les changements
+        const live = document.getElementById('dashboard-live');
+        if (!live || !live.dataset.streamUrl || !window.EventSource) return;
         
-        // Auto-refresh des activités récentes
-        if (activities.length > 0) {
-            setInterval(() => {
-                this.refreshRecentActivities();
-            }, 30000); // Toutes les 30 secondes
-        }
+        this.activitiesUrl = live.dataset.activitiesUrl;
+        this.eventSource = new EventSource(live.dataset.streamUrl);
+        this.eventSource.addEventListener('dashboard', (event) => {
+            try {
+                this.applyDelta(JSON.parse(event.data));
+            } catch (error) {
+                console.error('Erreur flux dashboard:', error);
+            }
+        });
+        
+        window.addEventListener('beforeunload', () => this.eventSource.close());
+    }
+    
+    applyDelta(delta) {
+        // Seules les clefs modifiées sont présentes dans le message
+        Object.entries(delta).forEach(([key, value]) => {
+            if (key === 'activites') {
+                this.renderRecentActivities(value);
+                return;
+            }
+            const statElement = document.querySelector(`[data-stat="${key}"]`);
+            if (statElement && Number.isFinite(value)) {
+                this.animateNumber(statElement, value);
+            }
+        });
     }
     
     async loadDashboardData() {
@@ -113,27 +135,57 @@ class DashboardManager {
     }
     
     async refreshRecentActivities() {
-        const activitiesContainer = document.querySelector('.recent-activities tbody');
-        if (!activitiesContainer) return;
-        
         try {
-            const response = await fetch('/api/recent-activities/');
-            const activities = await response.json();
-            
-            // Mettre à jour le contenu
-            activitiesContainer.innerHTML = activities.map(activity => `
-                <tr>
-                    <td>${AppUtils.formatDate(activity.date)}</td>
-                    <td>${activity.description}</td>
-                    <td><span class="badge bg-${activity.type}">${activity.status}</span></td>
-                </tr>
-            `).join('');
-            
+            const response = await fetch(this.activitiesUrl || '/api/recent-activities/');
+            this.renderRecentActivities(await response.json());
         } catch (error) {
             console.error('Erreur refresh activités:', error);
         }
     }
     
+    renderRecentActivities(activities) {
+        const activitiesContainer = document.querySelector('.recent-activities tbody');
+        if (!activitiesContainer) return;
+        
+        const escape = (value) => {
+            const div = document.createElement('div');
+            div.textContent = value ?? '';
+            return div.innerHTML;
+        };
+        const typeBadge = (abreviation) => {
+            if (abreviation === 'rh1') return 'bg-info';
+            if (abreviation === 'ex1') return 'bg-success';
+            return 'bg-warning text-dark';
+        };
+        const scoreBadge = (score) => {
+            if (score === null || score === undefined) return '<span class="badge bg-secondary">-</span>';
+            let classe = 'bg-danger';
+            if (score >= 80) classe = 'bg-success';
+            else if (score >= 65) classe = 'bg-info';
+            else if (score >= 50) classe = 'bg-warning text-dark';
+            return `<span class="badge ${classe}">${score}%</span>`;
+        };
+        
+        // Mêmes colonnes que le tableau rendu par le template
+        activitiesContainer.innerHTML = activities.map(activity => `
+            <tr>
+                <td>${AppUtils.formatDate(activity.date)}</td>
+                <td>
+                    <strong>${escape(activity.conducteur)}</strong>
+                    <br>${escape(activity.site)}
+                </td>
+                <td><span class="badge ${typeBadge(activity.type_abreviation)}">${escape(activity.type)}</span></td>
+                <td>${scoreBadge(activity.score)}</td>
+                <td>${escape(activity.evaluateur)}</td>
+                <td>
+                    <a href="${escape(activity.url)}" class="btn btn-sm btn-outline-primary">
+                        <i class="fas fa-eye"></i> Voir
+                    </a>
+                </td>
+            </tr>
+        `).join('');
+    }
+    
     trackAction(actionName) {
         // Envoyer les analytics si nécessaire
         console.log('Action dashboard:', actionName);
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.db import models
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery, Sum
 from django.forms import TextInput, Textarea
 from .models import (
     Site, Societe, Service, Conducteur, Evaluateur, 
@@ -87,45 +88,58 @@ class ConducteurAdmin(admin.ModelAdmin):
     )
 
     def get_queryset(self, request):
+        # Dernière évaluation de chaque conducteur de la page, préchargée avec
+        # les comptes et sommes de notes utilisés par score_derniere_evaluation
+        notes_valides = Q(
+            notes__valeur__isnull=False,
+            notes__critere__actif=True,
+            notes__critere__type_evaluation=F('type_evaluation'),
+        )
+        plus_recente = Evaluation.objects.filter(
+            conducteur=OuterRef('conducteur')
+        ).order_by('-date_evaluation', '-id').values('pk')[:1]
+        nb_criteres_actifs = CritereEvaluation.objects.filter(
+            type_evaluation=OuterRef('type_evaluation'), actif=True
+        ).order_by().values('type_evaluation').annotate(nombre=Count('pk')).values('nombre')
+        dernieres_evaluations = Evaluation.objects.select_related(None).filter(
+            pk=Subquery(plus_recente)
+        ).annotate(
+            nb_notes=Count('notes', filter=notes_valides),
+            somme_notes=Sum('notes__valeur', filter=notes_valides),
+            somme_maxi=Sum('notes__critere__valeur_maxi', filter=notes_valides),
+            nb_criteres_actifs=Subquery(nb_criteres_actifs),
+        )
         return super().get_queryset(request).select_related(
             'salsocid', 'site'
-        ).prefetch_related('evaluation_set__notes__critere')
+        ).annotate(
+            nb_evaluations=Count('evaluation')
+        ).prefetch_related(
+            Prefetch('evaluation_set', queryset=dernieres_evaluations, to_attr='derniere_evaluation')
+        )
 
     def nom_complet(self, obj):
         return obj.nom_complet
     nom_complet.short_description = 'Nom complet'
 
     def nombre_evaluations(self, obj):
-        """Compte le nombre d'évaluations pour ce conducteur"""
-        return obj.evaluation_set.count()
+        """Nombre d'évaluations pour ce conducteur (annoté par get_queryset)"""
+        return obj.nb_evaluations
     nombre_evaluations.short_description = 'Nb évaluations'
-    nombre_evaluations.admin_order_field = 'evaluation_count'
+    nombre_evaluations.admin_order_field = 'nb_evaluations'
 
     def score_derniere_evaluation(self, obj):
         """Calcule le score de la dernière évaluation"""
-        derniere_eval = obj.evaluation_set.order_by('-date_evaluation').first()
-        
-        if not derniere_eval:
+        if not obj.derniere_evaluation:
             return "Aucune évaluation"
+        derniere_eval = obj.derniere_evaluation[0]
         
-        # Récupérer tous les critères actifs pour ce type d'évaluation
-        criteres_actifs = CritereEvaluation.objects.filter(
-            type_evaluation=derniere_eval.type_evaluation,
-            actif=True
-        )
-        
-        if not criteres_actifs:
+        # Nombre de critères actifs pour ce type d'évaluation
+        nb_criteres_actifs = derniere_eval.nb_criteres_actifs or 0
+        if not nb_criteres_actifs:
             return "Aucun critère actif"
         
         # Vérifier qu'il y a autant de notes que de critères actifs
-        notes_avec_valeur = derniere_eval.notes.filter(
-            valeur__isnull=False,
-            critere__actif=True,
-            critere__type_evaluation=derniere_eval.type_evaluation
-        )
-        
-        nb_criteres_actifs = criteres_actifs.count()
-        nb_notes = notes_avec_valeur.count()
+        nb_notes = derniere_eval.nb_notes
         
         if nb_notes == 0:
             return "Pas de notes"
@@ -134,17 +148,10 @@ class ConducteurAdmin(admin.ModelAdmin):
             return f"Incomplet ({nb_notes}/{nb_criteres_actifs})"
         
         # Calcul du score : 100 * (somme notes / somme valeurs maxi)
-        somme_notes = 0
-        somme_maxi = 0
-        
-        for note in notes_avec_valeur:
-            somme_notes += note.valeur
-            somme_maxi += note.critere.valeur_maxi
-        
-        if somme_maxi == 0:
+        if derniere_eval.somme_maxi == 0:
             return "Division par zéro"
         
-        score = 100.0 * (somme_notes / somme_maxi)
+        score = 100.0 * (derniere_eval.somme_notes / derniere_eval.somme_maxi)
         return f"{score:.1f}%"
     
     score_derniere_evaluation.short_description = 'Score dernière éval.'
@@ -167,7 +174,7 @@ class EvaluateurAdmin(admin.ModelAdmin):
 
 @admin.register(TypologieEvaluation)
 class TypologieEvaluationAdmin(admin.ModelAdmin):
-    list_display = ['nom', 'abreviation']
+    list_display = ['nom', 'abreviation', 'frequence_jours']
     search_fields = ['nom', 'abreviation']
     ordering = ['nom']
     
@@ -274,9 +281,10 @@ class EvaluationAdmin(admin.ModelAdmin):
 
     def nombre_notes(self, obj):
         if obj.pk:
-            return obj.notes.count()
+            return obj.nb_notes
         return 0
     nombre_notes.short_description = 'Nombre de notes'
+    nombre_notes.admin_order_field = 'nb_notes'
 
     def completude(self, obj):
         """Vérifie si toutes les notes sont présentes pour les critères actifs"""
@@ -305,7 +313,7 @@ class EvaluationAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related(
             'conducteur', 'evaluateur', 'type_evaluation', 'evaluateur__user__profil__service'
-        )
+        ).annotate(nb_notes=Count('notes'))
 
 
 @admin.register(Note)
@@ -353,7 +361,7 @@ class NoteAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related(
             'evaluation__conducteur', 
-            'evaluation__evaluateur', 
+            'evaluation__evaluateur__user__profil__service',
             'evaluation__type_evaluation',
             'critere'
         )
@@ -0,0 +1,110 @@
+# suivi_conducteurs/alertes.py
+"""
+Alertes de score : une évaluation est signalée quand son score passe sous
+ALERTES_SCORE_SEUIL, ou baisse de plus de ALERTES_SCORE_BAISSE points sur
+l'évaluation précédente du conducteur pour le même type. Vérifiée à
+l'enregistrement (signals.py, au commit : les notes sont écrites après
+l'évaluation), sans balayage de l'historique : l'évaluation précédente est
+trouvée par l'index evaluation_cond_type_date_idx et son score recalculé
+depuis ses seules notes.
+"""
+from django.conf import settings
+from django.db.models import Q, Subquery
+
+from .models import AlerteScore, Evaluation
+from .tableau_de_bord import cache_partage
+
+# Nombre d'alertes ouvertes (badge du tableau de bord), effacé à chaque écriture d'alerte
+CLE_NOMBRE_OUVERTES = 'alertes:ouvertes'
+
+
+def precedentes(conducteur_id, type_evaluation_id, date_evaluation, evaluation_id):
+    """Évaluations du couple antérieures à celle-ci, la plus récente d'abord"""
+    return Evaluation.objects.filter(
+        Q(date_evaluation__lt=date_evaluation) | Q(date_evaluation=date_evaluation, pk__lt=evaluation_id),
+        conducteur_id=conducteur_id, type_evaluation_id=type_evaluation_id,
+    ).order_by('-date_evaluation', '-id')
+
+
+def suivantes(conducteur_id, type_evaluation_id, date_evaluation, evaluation_id):
+    """Évaluations du couple postérieures à celle-ci, la plus ancienne d'abord"""
+    return Evaluation.objects.filter(
+        Q(date_evaluation__gt=date_evaluation) | Q(date_evaluation=date_evaluation, pk__gt=evaluation_id),
+        conducteur_id=conducteur_id, type_evaluation_id=type_evaluation_id,
+    ).order_by('date_evaluation', 'id')
+
+
+def premiere_avec_score(evaluations):
+    """
+    Première évaluation du queryset (une recherche d'index), son score, calculé comme
+    Evaluation.calculate_score, et son alerte : ((conducteur, type, date, id), score, alerte_id) ou None
+    """
+    ligne = Evaluation.objects.filter(pk=Subquery(evaluations.values('pk')[:1])).avec_score().values_list(
+        'conducteur_id', 'type_evaluation_id', 'date_evaluation', 'id', 'somme_notes', 'somme_maxi', 'alerte__id',
+    ).first()
+    if ligne is None:
+        return None
+    *cle, somme_notes, somme_maxi, alerte_id = ligne
+    return tuple(cle), round(somme_notes / somme_maxi * 100, 1) if somme_maxi else None, alerte_id
+
+
+def verifier(evaluations):
+    """Crée, met à jour ou retire l'alerte de la première évaluation du queryset ; renvoie sa clé"""
+    courante = premiere_avec_score(evaluations)
+    if courante is None:
+        return None
+    cle, score, alerte_id = courante
+
+    precedente = premiere_avec_score(precedentes(*cle)) if score is not None else None
+    evaluation_precedente, score_precedent = (precedente[0][3], precedente[1]) if precedente else (None, None)
+    sous_seuil = score is not None and score < settings.ALERTES_SCORE_SEUIL
+    en_baisse = score_precedent is not None and score_precedent - score > settings.ALERTES_SCORE_BAISSE
+
+    if sous_seuil or en_baisse:
+        valeurs = {
+            'evaluation_precedente_id': evaluation_precedente,
+            'date_evaluation': cle[2],
+            'score': score,
+            'score_precedent': score_precedent,
+            'sous_seuil': sous_seuil,
+            'en_baisse': en_baisse,
+        }
+        # Mise à jour sans signal : le nombre d'alertes ouvertes ne change pas
+        if not (alerte_id and AlerteScore.objects.filter(pk=alerte_id).update(**valeurs)):
+            AlerteScore.objects.create(evaluation_id=cle[3], **valeurs)
+    elif alerte_id:
+        AlerteScore.objects.filter(pk=alerte_id).delete()
+    return cle
+
+
+# ---------------------------------------------------------------------------
+# Mise à jour incrémentale (appelée par signals.py après le commit)
+# ---------------------------------------------------------------------------
+
+def evaluation_enregistree(evaluation_id):
+    """L'évaluation, puis la suivante du couple, dont elle est la nouvelle référence"""
+    cle = verifier(Evaluation.objects.filter(pk=evaluation_id))
+    if cle:
+        verifier(suivantes(*cle))
+
+
+def evaluation_supprimee(conducteur_id, type_evaluation_id, date_evaluation, evaluation_id):
+    """La suivante du couple se compare désormais à l'évaluation d'avant"""
+    verifier(suivantes(conducteur_id, type_evaluation_id, date_evaluation, evaluation_id))
+
+
+# ---------------------------------------------------------------------------
+# Badge du tableau de bord
+# ---------------------------------------------------------------------------
+
+def nombre_ouvertes():
+    """Alertes non traitées, lues dans le cache partagé (compté par index après une écriture)"""
+    nombre = cache_partage().get(CLE_NOMBRE_OUVERTES)
+    if nombre is None:
+        nombre = AlerteScore.objects.filter(traitee=False).count()
+        cache_partage().set(CLE_NOMBRE_OUVERTES, nombre, timeout=None)
+    return nombre
+
+
+def invalider_nombre():
+    cache_partage().delete(CLE_NOMBRE_OUVERTES)
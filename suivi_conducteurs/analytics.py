@@ -0,0 +1,301 @@
+# suivi_conducteurs/analytics.py
+"""
+Statistiques vectorisées des notes : les notes sont chargées une fois en
+colonnes NumPy, puis les scores et agrégats par groupe sont calculés par
+np.unique / np.bincount au lieu d'une boucle Python par évaluation.
+"""
+from contextlib import contextmanager
+
+import numpy as np
+
+from django.db import connections
+
+# Notes complètes (valeur renseignée, critère actif), comme les notes retenues par
+# calculate_score, encodées par dictionnaire : chaque note porte le code (position)
+# de son évaluation et de son critère dans ces deux tables, une ligne par évaluation
+# ou critère
+EVALUATIONS = {
+    'evaluation_id': np.int64,
+    'type_evaluation_id': np.int64,
+    'site_id': np.int64,
+    'societe_id': np.int64,
+    'date_evaluation': 'datetime64[D]',
+}
+CRITERES = {
+    'critere_id': np.int64,
+    'valeur_maxi': np.int32,
+}
+
+# Durée de vie des statistiques en cache : la clé change déjà à chaque modification
+# des données, l'expiration ne sert qu'à libérer les anciennes versions
+DUREE_CACHE = 3600
+
+CENTILES = {'p25': 25, 'mediane': 50, 'p75': 75}
+
+# Distribution des scores (0-100 %) en classes de 10 points, 100 % compris dans la dernière
+NB_CLASSES = 10
+
+
+def lire_colonnes(queryset, dtypes, taille_lot=50000):
+    """
+    Colonnes NumPy d'un queryset values_list, lues par curseur brut et par lots :
+    pas de conversion ORM ligne à ligne (les dates SQLite arrivent en texte ISO,
+    que datetime64 sait lire)
+    """
+    sql, params = queryset.query.sql_with_params()
+    morceaux = [[] for _ in dtypes]
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while lot := cursor.fetchmany(taille_lot):
+            for morceau, colonne, dtype in zip(morceaux, zip(*lot), dtypes):
+                morceau.append(np.array(colonne, dtype=dtype))
+    return [
+        np.concatenate(morceau) if morceau else np.empty(0, dtype=dtype)
+        for morceau, dtype in zip(morceaux, dtypes)
+    ]
+
+
+@contextmanager
+def lecture_coherente(alias):
+    """
+    Lectures dans une même transaction de lecture (un seul instantané WAL). BEGIN DEFERRED
+    explicite : atomic() ouvrirait un BEGIN IMMEDIATE (transaction_mode), qui prendrait le
+    verrou d'écriture pendant toute la lecture. Dans un bloc atomic, la transaction en cours suffit.
+    """
+    connection = connections[alias]
+    if connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('BEGIN DEFERRED' if connection.vendor == 'sqlite' else 'BEGIN')
+        try:
+            yield
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('COMMIT')
+
+
+def indices(ids_tries, ids):
+    """Position de chaque valeur de ids dans le tableau trié ids_tries (valeurs supposées présentes)"""
+    return np.minimum(np.searchsorted(ids_tries, ids), max(len(ids_tries) - 1, 0))
+
+
+def reunir(table, ajout, cle):
+    """
+    Table complétée par les lignes de ajout dont la clé est absente, ajoutées à la fin
+    (les positions existantes ne changent pas). Renvoie aussi la position de chaque ligne de ajout.
+    """
+    cles = table[cle]
+    ordre = None if np.all(cles[:-1] <= cles[1:]) else np.argsort(cles, kind='stable')
+    triees = cles if ordre is None else cles[ordre]
+    rang = indices(triees, ajout[cle])
+    presentes = triees[rang] == ajout[cle] if len(triees) else np.zeros(len(ajout[cle]), dtype=bool)
+    position = np.empty(len(ajout[cle]), dtype=np.int64)
+    position[presentes] = rang[presentes] if ordre is None else ordre[rang[presentes]]
+    nouvelles = ~presentes
+    position[nouvelles] = len(cles) + np.arange(np.count_nonzero(nouvelles))
+    return {nom: np.concatenate([table[nom], ajout[nom][nouvelles]]) for nom in table}, position
+
+
+class ColonnesNotes:
+    """
+    Notes complètes en colonnes NumPy : par note, code_evaluation, code_critere et valeur ;
+    les tables evaluations et criteres (colonnes EVALUATIONS et CRITERES) donnent les
+    attributs. Les regroupements se font sur les codes, les tables ne sont lues qu'ensuite.
+    """
+
+    def __init__(self, code_evaluation, code_critere, valeur, evaluations, criteres):
+        # Codes et valeurs gardés tels quels : vues sans copie d'un instantané projeté en mémoire
+        self.code_evaluation = np.asarray(code_evaluation)
+        self.code_critere = np.asarray(code_critere)
+        self.valeur = np.asarray(valeur)
+        self.evaluations = {nom: np.asarray(evaluations[nom], dtype=dtype) for nom, dtype in EVALUATIONS.items()}
+        self.criteres = {nom: np.asarray(criteres[nom], dtype=dtype) for nom, dtype in CRITERES.items()}
+
+    def __len__(self):
+        return len(self.valeur)
+
+    @classmethod
+    def charger(cls, notes=None, taille_lot=50000):
+        """
+        Charge les notes (queryset de Note, toutes par défaut). Trois lectures sans
+        jointure côté notes, dans une même transaction : notes (évaluation, critère,
+        valeur), critères et évaluations ; chaque note est ensuite codée par searchsorted
+        dans les deux tables.
+        """
+        from .models import CritereEvaluation, Evaluation, Note
+
+        evaluations = Evaluation.objects.select_related(None)
+        if notes is None:
+            notes = Note.objects.all()
+        else:
+            # Seules les évaluations des notes demandées (delta d'un instantané...)
+            evaluations = evaluations.filter(pk__in=notes.values('evaluation_id'))
+        # Une transaction de lecture : les trois lectures voient le même état de la base
+        with lecture_coherente(notes.db):
+            evaluation_id, critere_id, valeur = lire_colonnes(
+                notes.filter(valeur__isnull=False).order_by().values_list('evaluation_id', 'critere_id', 'valeur'),
+                (np.int64, np.int64, np.int32), taille_lot,
+            )
+            criteres = lire_colonnes(
+                CritereEvaluation.objects.order_by('pk').values_list('pk', 'valeur_maxi', 'actif'),
+                (np.int64, np.int32, bool),
+            )
+            evaluations = lire_colonnes(
+                evaluations.order_by('pk').values_list(
+                    'pk', 'type_evaluation_id', 'conducteur__site_id', 'conducteur__salsocid_id', 'date_evaluation',
+                ),
+                tuple(EVALUATIONS.values()), taille_lot,
+            )
+
+        # Notes des critères actifs uniquement, comme calculate_score
+        code_critere = indices(criteres[0], critere_id)
+        gardees = criteres[2][code_critere] if len(criteres[0]) else np.zeros(len(critere_id), dtype=bool)
+        return cls(
+            code_evaluation=indices(evaluations[0], evaluation_id[gardees]),
+            code_critere=code_critere[gardees],
+            valeur=valeur[gardees],
+            evaluations=dict(zip(EVALUATIONS, evaluations)),
+            criteres=dict(zip(CRITERES, criteres)),
+        )
+
+    @classmethod
+    def concatener(cls, premiere, *suivantes):
+        """
+        Réunit plusieurs jeux de colonnes (instantané et notes ajoutées depuis). Les codes
+        de la première partie restent valables ; ceux des suivantes sont traduits par leurs tables.
+        """
+        suivantes = [partie for partie in suivantes if len(partie)]
+        if not suivantes:
+            return premiere
+        evaluations, criteres = premiere.evaluations, premiere.criteres
+        codes_evaluation, codes_critere = [premiere.code_evaluation], [premiere.code_critere]
+        for partie in suivantes:
+            evaluations, position = reunir(evaluations, partie.evaluations, 'evaluation_id')
+            codes_evaluation.append(position[partie.code_evaluation])
+            criteres, position = reunir(criteres, partie.criteres, 'critere_id')
+            codes_critere.append(position[partie.code_critere])
+        return cls(
+            np.concatenate(codes_evaluation),
+            np.concatenate(codes_critere),
+            np.concatenate([premiere.valeur, *(partie.valeur for partie in suivantes)]),
+            evaluations,
+            criteres,
+        )
+
+    def valeurs_maxi(self):
+        """Maximum du critère de chaque note"""
+        return self.criteres['valeur_maxi'][self.code_critere]
+
+    def scores_evaluations(self):
+        """
+        Score de chaque évaluation notée, identique à calculate_score :
+        somme des notes / somme des maxima × 100, arrondi à 0,1.
+        Renvoie un dict de colonnes alignées (une ligne par évaluation).
+        """
+        nb_evaluations = len(self.evaluations['evaluation_id'])
+        somme_notes = np.bincount(self.code_evaluation, weights=self.valeur, minlength=nb_evaluations)
+        somme_maxi = np.bincount(self.code_evaluation, weights=self.valeurs_maxi(), minlength=nb_evaluations)
+        notees = somme_maxi > 0
+        scores = {nom: colonne[notees] for nom, colonne in self.evaluations.items()}
+        scores['score'] = np.round(somme_notes[notees] / somme_maxi[notees] * 100, 1)
+        return scores
+
+    def pourcentages_notes(self):
+        """Chaque note rapportée au maximum de son critère, en %"""
+        maxi = self.valeurs_maxi()
+        return self.valeur / np.where(maxi > 0, maxi, 1) * 100
+
+
+def statistiques_groupees(cles, valeurs):
+    """
+    Effectif, moyenne, écart-type, centiles (interpolation linéaire, comme
+    np.percentile) et distribution en NB_CLASSES classes de valeurs 0-100,
+    pour chaque clé distincte. Renvoie {clé: statistiques}.
+    """
+    groupes, inverse = np.unique(cles, return_inverse=True)
+    return statistiques_codees(groupes, inverse, valeurs)
+
+
+def codes_presents(codes, taille):
+    """
+    Codes d'une table de taille lignes présents dans codes (masque) et codes renumérotés
+    0..k-1 dans le même ordre, en O(n) sans tri
+    """
+    presents = np.bincount(codes, minlength=taille) > 0
+    return presents, (np.cumsum(presents) - 1)[codes]
+
+
+def statistiques_codees(groupes, inverse, valeurs):
+    """statistiques_groupees sur des clés déjà encodées : groupes[inverse], chaque groupe présent"""
+    valeurs = np.asarray(valeurs, dtype=np.float64)
+    nb_groupes = len(groupes)
+    if not nb_groupes:
+        return {}
+
+    effectifs = np.bincount(inverse, minlength=nb_groupes)
+    moyennes = np.bincount(inverse, weights=valeurs, minlength=nb_groupes) / effectifs
+    carres = np.bincount(inverse, weights=valeurs * valeurs, minlength=nb_groupes) / effectifs
+    ecarts_types = np.sqrt(np.maximum(carres - moyennes * moyennes, 0))
+
+    # Valeurs triées par groupe puis par valeur : chaque groupe est un segment contigu
+    triees = valeurs[np.lexsort((valeurs, inverse))]
+    debuts = np.concatenate(([0], np.cumsum(effectifs)[:-1]))
+    centiles = {}
+    for nom, rang in CENTILES.items():
+        position = debuts + (effectifs - 1) * rang / 100
+        bas = np.floor(position).astype(np.int64)
+        haut = np.ceil(position).astype(np.int64)
+        centiles[nom] = triees[bas] + (triees[haut] - triees[bas]) * (position - bas)
+
+    classes = np.clip((valeurs // (100 / NB_CLASSES)).astype(np.int64), 0, NB_CLASSES - 1)
+    distributions = np.bincount(
+        inverse * NB_CLASSES + classes, minlength=nb_groupes * NB_CLASSES
+    ).reshape(nb_groupes, NB_CLASSES)
+
+    return {
+        groupe.item(): {
+            'count': int(effectifs[i]),
+            'moyenne': round(float(moyennes[i]), 1),
+            'ecart_type': round(float(ecarts_types[i]), 1),
+            **{nom: round(float(valeurs_centile[i]), 1) for nom, valeurs_centile in centiles.items()},
+            'distribution': distributions[i].tolist(),
+        }
+        for i, groupe in enumerate(groupes)
+    }
+
+
+def statistiques_par_type(colonnes):
+    """Statistiques des scores d'évaluation par type d'évaluation"""
+    scores = colonnes.scores_evaluations()
+    return statistiques_groupees(scores['type_evaluation_id'], scores['score'])
+
+
+def statistiques_par_critere(colonnes):
+    """Statistiques des notes par critère, en % du maximum du critère, avec la note moyenne brute"""
+    presents, inverse = codes_presents(colonnes.code_critere, len(colonnes.criteres['critere_id']))
+    criteres = colonnes.criteres['critere_id'][presents]
+    stats = statistiques_codees(criteres, inverse, colonnes.pourcentages_notes())
+    notes_moyennes = np.bincount(inverse, weights=colonnes.valeur) / np.bincount(inverse)
+    for critere_id, note_moyenne in zip(criteres.tolist(), notes_moyennes.tolist()):
+        stats[critere_id]['note_moyenne'] = round(note_moyenne, 2)
+    return stats
+
+
+def statistiques_notes():
+    """
+    Statistiques par type d'évaluation et par critère ({'par_type', 'par_critere'}),
+    calculées une fois par version des données et partagées entre processus
+    """
+    from . import instantane, tableau_de_bord
+
+    def calculer():
+        colonnes = instantane.colonnes_notes()
+        return {
+            'par_type': statistiques_par_type(colonnes),
+            'par_critere': statistiques_par_critere(colonnes),
+        }
+
+    cle = f'analytics:statistiques:{tableau_de_bord.get_version()}'
+    return tableau_de_bord.cache_partage().get_or_set(cle, calculer, timeout=DUREE_CACHE)
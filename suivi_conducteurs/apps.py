@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SuiviConducteursConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'suivi_conducteurs'
+
+    def ready(self):
+        """Méthode appelée quand l'application est prête"""
+        import suivi_conducteurs.signals
@@ -0,0 +1,68 @@
+# suivi_conducteurs/au_commit.py
+"""
+Rappels au commit dédoublonnés : un rappel par clé (genre, valeur) et par
+transaction, quel que soit le nombre d'écritures qui le demandent.
+
+Chaque connexion garde le lot de la transaction en cours : un dictionnaire
+clé -> rappel, vidé par un seul transaction.on_commit. Un rollback (complet ou
+jusqu'à un savepoint) remplace la liste connection.run_on_commit : le lot qui
+n'y figure plus est abandonné, sans parcourir les rappels à chaque écriture.
+"""
+from django.db import transaction
+
+
+class Lot:
+    """Rappels en attente d'une transaction, exécutés une fois dans l'ordre d'enregistrement"""
+
+    def __init__(self, connexion):
+        self.rappels = {}
+        self.liste = connexion.run_on_commit
+        self.execute = False
+
+    def __call__(self):
+        self.execute = True
+        for fonction, args in list(self.rappels.values()):
+            fonction(*args)
+
+
+def lot_courant(connexion, creer=False):
+    """Lot de la transaction en cours sur cette connexion, None s'il n'y en a pas (et creer est faux)"""
+    lot = getattr(connexion, 'lot_au_commit', None)
+    if lot is not None and not lot.execute:
+        if lot.liste is connexion.run_on_commit:
+            return lot
+        # Rollback depuis l'enregistrement : le lot ne survit que s'il précède le savepoint annulé
+        if any(rappel is lot for _, rappel, _ in connexion.run_on_commit):
+            lot.liste = connexion.run_on_commit
+            return lot
+    if not creer:
+        connexion.lot_au_commit = None
+        return None
+    lot = connexion.lot_au_commit = Lot(connexion)
+    transaction.on_commit(lot)
+    return lot
+
+
+def une_fois(cle, fonction, *args):
+    """fonction(*args) au commit si aucun rappel n'est déjà en attente sous cette clé"""
+    connexion = transaction.get_connection()
+    if not connexion.in_atomic_block:
+        fonction(*args)
+        return
+    lot_courant(connexion, creer=True).rappels.setdefault(cle, (fonction, args))
+
+
+def en_attente(cle):
+    """Un rappel de la transaction courante est-il en attente sous cette clé ?"""
+    connexion = transaction.get_connection()
+    if not connexion.in_atomic_block:
+        return False
+    lot = lot_courant(connexion)
+    return lot is not None and cle in lot.rappels
+
+
+def cles_en_attente(genre):
+    """Valeurs des clés de ce genre en attente dans la transaction courante"""
+    connexion = transaction.get_connection()
+    lot = lot_courant(connexion) if connexion.in_atomic_block else None
+    return [valeur for g, valeur in lot.rappels if g == genre] if lot else []
@@ -0,0 +1,416 @@
+# suivi_conducteurs/cumuls.py
+"""
+Cumuls mensuels des évaluations et des notes, tenus à jour au commit de chaque
+évaluation écrite (signals.py) et reconstruits par rebuild_monthly_rollups. Les pages de synthèse
+lisent ces cumuls, une ligne par mois et par clé, au lieu des évaluations.
+
+Une évaluation est rattachée au mois de sa date, à son évaluateur, à son type
+et au site et à la société actuels de son conducteur : un changement de l'un
+d'eux (évaluation modifiée, conducteur changé de site ou de société) déplace
+ses contributions d'une clé à l'autre.
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import (
+    CritereEvaluation, CumulEvaluateur, CumulEvaluateurCritere, CumulSite, CumulSiteCritere,
+    Evaluateur, Evaluation, Note,
+)
+
+# Champs de la clé de chaque cumul, pris dans la clé complète d'une évaluation (cle_evaluation)
+CLES = {
+    CumulEvaluateur: ('mois', 'evaluateur_id', 'site_id'),
+    CumulEvaluateurCritere: ('mois', 'evaluateur_id', 'site_id', 'critere_id'),
+    CumulSite: ('mois', 'site_id', 'societe_id', 'type_evaluation_id'),
+    CumulSiteCritere: ('mois', 'site_id', 'societe_id', 'type_evaluation_id', 'critere_id'),
+}
+CUMULS_EVALUATIONS = (CumulEvaluateur, CumulSite)
+CUMULS_NOTES = (CumulEvaluateurCritere, CumulSiteCritere)
+MODELES = CUMULS_EVALUATIONS + CUMULS_NOTES
+
+# Chemin de chaque champ de la clé depuis une évaluation
+CHEMINS = {
+    'mois': 'date_evaluation',
+    'evaluateur_id': 'evaluateur',
+    'site_id': 'conducteur__site',
+    'societe_id': 'conducteur__salsocid',
+    'type_evaluation_id': 'type_evaluation',
+}
+
+# Notes minimales d'un évaluateur sur un critère pour afficher son écart à la moyenne du site
+NOTES_MINIMUM = 5
+
+# Écart à la moyenne du site (en points de %) à partir duquel un évaluateur est signalé
+SEUIL_ECART = 10
+
+# Mois affichés par les courbes de tendance des sites, sociétés et conducteurs
+MOIS_TENDANCE = 12
+
+
+def premier_jour(jour):
+    return jour.replace(day=1)
+
+
+def mois_suivant(mois):
+    return date(mois.year + mois.month // 12, mois.month % 12 + 1, 1)
+
+
+def debut_periode(nombre_mois, aujourd_hui=None):
+    """Premier jour du mois situé nombre_mois mois avant le mois courant"""
+    mois_courant = premier_jour(aujourd_hui or date.today())
+    annee, index = divmod(mois_courant.year * 12 + mois_courant.month - 1 - nombre_mois, 12)
+    return date(annee, index + 1, 1)
+
+
+def restreindre(modele, cle):
+    """Clé du cumul extraite de la clé complète (les champs manquants valent None)"""
+    return {champ: cle.get(champ) for champ in CLES[modele]}
+
+
+class Mouvements:
+    """
+    Incréments des cumuls additionnés par modèle et par clé, écrits en une instruction
+    par modèle (IncrementsQuerySet.incrementer) ; seules les clés qui reçoivent un
+    ajout sont créées au besoin
+    """
+
+    def __init__(self):
+        self.lignes = {modele: defaultdict(lambda: defaultdict(int)) for modele in MODELES}
+        self.creer = {modele: set() for modele in MODELES}
+
+    def ajouter(self, modele, cle, signe=1, **increments):
+        valeurs = tuple(restreindre(modele, cle).values())
+        for champ, increment in increments.items():
+            self.lignes[modele][valeurs][champ] += signe * increment
+        if signe > 0:
+            self.creer[modele].add(valeurs)
+
+    def ecrire(self):
+        for modele in MODELES:
+            modele.objects.incrementer(self.lignes[modele], self.creer[modele])
+
+
+# ---------------------------------------------------------------------------
+# Clés et contributions
+# ---------------------------------------------------------------------------
+
+def cle_evaluation(evaluation):
+    """
+    Clé complète des cumuls d'une évaluation (instance ou id), None si elle n'existe pas.
+    Sans requête quand le conducteur de l'instance est déjà chargé.
+    """
+    if isinstance(evaluation, Evaluation):
+        if Evaluation.conducteur.is_cached(evaluation):
+            return {
+                'mois': premier_jour(evaluation.date_evaluation),
+                'evaluateur_id': evaluation.evaluateur_id,
+                'site_id': evaluation.conducteur.site_id,
+                'societe_id': evaluation.conducteur.salsocid_id,
+                'type_evaluation_id': evaluation.type_evaluation_id,
+            }
+        evaluation = evaluation.pk
+    ligne = Evaluation.objects.filter(pk=evaluation).values_list(*CHEMINS.values()).first()
+    if ligne is None:
+        return None
+    return {**dict(zip(CHEMINS, ligne)), 'mois': premier_jour(ligne[0])}
+
+
+def regrouper(queryset, prefixe='', **autres):
+    """Regroupement d'un queryset par clé complète (chemins préfixés depuis le modèle interrogé)"""
+    return queryset.order_by().values(
+        **{
+            f'cle_{champ}': TruncMonth(prefixe + chemin) if champ == 'mois' else F(prefixe + chemin)
+            for champ, chemin in CHEMINS.items()
+        },
+        **{f'cle_{champ}': F(chemin) for champ, chemin in autres.items()},
+    )
+
+
+def lignes_evaluations(evaluations):
+    """Cumuls d'un queryset d'évaluations, recalculés en base : (modèle, clé, incréments)"""
+    totaux = {modele: defaultdict(lambda: defaultdict(int)) for modele in MODELES}
+
+    def ajouter(modeles, ligne, **increments):
+        cle = {champ[4:]: valeur for champ, valeur in ligne.items() if champ.startswith('cle_')}
+        for modele in modeles:
+            cumul = totaux[modele][tuple(restreindre(modele, cle).values())]
+            for champ, increment in increments.items():
+                cumul[champ] += increment
+
+    for ligne in regrouper(evaluations).annotate(nombre=Count('pk')):
+        ajouter(CUMULS_EVALUATIONS, ligne, nombre_evaluations=ligne['nombre'])
+
+    notes = Note.objects.filter(evaluation__in=evaluations.values('pk'), valeur__isnull=False)
+    for ligne in regrouper(notes, 'evaluation__', critere_id='critere').annotate(nombre=Count('pk'), somme=Sum('valeur')):
+        ajouter(CUMULS_NOTES, ligne, nombre_notes=ligne['nombre'], somme_notes=ligne['somme'])
+
+    for modele, cumuls in totaux.items():
+        for valeurs, increments in cumuls.items():
+            yield modele, dict(zip(CLES[modele], valeurs)), dict(increments)
+
+
+def deplacer(evaluations, **ancienne_cle):
+    """
+    Déplace les cumuls des évaluations (déjà enregistrées avec leur nouvelle clé)
+    depuis l'ancienne clé : ancienne_cle remplace les champs qui ont changé
+    """
+    mouvements = Mouvements()
+    for modele, cle, increments in lignes_evaluations(evaluations):
+        ancienne = restreindre(modele, {**cle, **ancienne_cle})
+        if ancienne == cle:
+            # Le changement ne porte pas sur la clé de ce cumul
+            continue
+        mouvements.ajouter(modele, ancienne, -1, **increments)
+        mouvements.ajouter(modele, cle, **increments)
+    mouvements.ecrire()
+
+
+# ---------------------------------------------------------------------------
+# Mise à jour incrémentale (appelée par signals.py)
+# ---------------------------------------------------------------------------
+
+def evaluation_modifiee(avant, apres):
+    """
+    Évaluation passée de l'état avant à l'état apres, (clé complète ou None, notes
+    renseignées {critère: valeur}) : contributions de l'ancien état retirées et du
+    nouveau ajoutées, en une instruction par cumul quel que soit le nombre de notes
+    """
+    mouvements = Mouvements()
+    for (cle, notes), signe in ((avant, -1), (apres, 1)):
+        if cle is None:
+            continue
+        for modele in CUMULS_EVALUATIONS:
+            mouvements.ajouter(modele, cle, signe, nombre_evaluations=1)
+        for critere_id, valeur in notes.items():
+            for modele in CUMULS_NOTES:
+                mouvements.ajouter(modele, {**cle, 'critere_id': critere_id}, signe, nombre_notes=1, somme_notes=valeur)
+    mouvements.ecrire()
+
+
+def conducteur_enregistre(conducteur, affectation_precedente, exclues=()):
+    """
+    affectation_precedente : (site, société) enregistrés avant la modification, None pour une
+    création. exclues : évaluations déjà suivies dans la transaction, déplacées à leur commit
+    """
+    if affectation_precedente is None:
+        return
+    site_id, societe_id = affectation_precedente
+    if (site_id, societe_id) != (conducteur.site_id, conducteur.salsocid_id):
+        deplacer(
+            Evaluation.objects.filter(conducteur=conducteur).exclude(pk__in=exclues),
+            site_id=site_id, societe_id=societe_id,
+        )
+
+
+# ---------------------------------------------------------------------------
+# Reconstruction
+# ---------------------------------------------------------------------------
+
+def mois_a_reconstruire():
+    """Mois ayant des évaluations ou des cumuls (ceux-ci peuvent être devenus vides)"""
+    mois = set(Evaluation.objects.order_by().dates('date_evaluation', 'month'))
+    for modele in MODELES:
+        mois.update(modele.objects.order_by().values_list('mois', flat=True).distinct())
+    return sorted(mois)
+
+
+def calculer_mois(mois):
+    """
+    Cumuls d'un mois recalculés depuis les évaluations et les notes, sans écriture :
+    rebuild_monthly_rollups les calcule dans des processus séparés
+    """
+    evaluations = Evaluation.objects.filter(date_evaluation__gte=mois, date_evaluation__lt=mois_suivant(mois))
+    return list(lignes_evaluations(evaluations))
+
+
+def enregistrer_mois(mois, lignes):
+    """Remplace les cumuls du mois par les lignes calculées. Renvoie le nombre de lignes"""
+    objets = defaultdict(list)
+    for modele, cle, increments in lignes:
+        objets[modele].append(modele(**cle, **increments))
+    with transaction.atomic():
+        for modele in MODELES:
+            modele.objects.filter(mois=mois).delete()
+            modele.objects.bulk_create(objets[modele], batch_size=1000)
+    return len(lignes)
+
+
+def reconstruire_mois(mois):
+    """Recalcule les cumuls d'un mois. Renvoie le nombre de lignes"""
+    with transaction.atomic():
+        return enregistrer_mois(mois, calculer_mois(mois))
+
+
+# ---------------------------------------------------------------------------
+# Calibrage des évaluateurs
+# ---------------------------------------------------------------------------
+
+def pourcentage(somme, nombre, maxi):
+    return round(somme / (nombre * maxi) * 100, 1) if nombre and maxi else None
+
+
+def calibrage(depuis=None):
+    """
+    Volume, score moyen normalisé (somme des notes / somme des maxima) et écart
+    à la moyenne du site par critère, pour chaque évaluateur, depuis le mois donné.
+    L'écart est en points de % : moyenne de l'évaluateur sur un site moins moyenne
+    de tous les évaluateurs de ce site, pondérée par ses notes sur chaque site.
+    """
+    criteres = {
+        critere.pk: critere
+        for critere in CritereEvaluation.objects.filter(actif=True).select_related('type_evaluation').order_by(
+            'type_evaluation__nom', 'numero_ordre',
+        )
+    }
+    notes = [
+        ligne for ligne in CumulEvaluateurCritere.objects.statistiques_par_evaluateur(depuis)
+        if ligne['critere'] in criteres and ligne['nombre']
+    ]
+    volumes = defaultdict(int)
+    for ligne in CumulEvaluateur.objects.evaluations_par_evaluateur(depuis):
+        volumes[ligne['evaluateur']] += ligne['nombre']
+
+    par_site = defaultdict(lambda: [0, 0])
+    for ligne in notes:
+        cumul = par_site[(ligne['site'], ligne['critere'])]
+        cumul[0] += ligne['nombre']
+        cumul[1] += ligne['somme']
+
+    # Par évaluateur : notes, somme des notes, somme des maxima, somme des écarts pondérés ;
+    # et par évaluateur et critère : notes, somme des écarts pondérés
+    totaux = defaultdict(lambda: [0, 0, 0, 0.0])
+    ecarts = defaultdict(lambda: [0, 0.0])
+    for ligne in notes:
+        critere = criteres[ligne['critere']]
+        nombre_site, somme_site = par_site[(ligne['site'], ligne['critere'])]
+        ecart = (pourcentage(ligne['somme'], ligne['nombre'], critere.valeur_maxi) or 0) - (
+            pourcentage(somme_site, nombre_site, critere.valeur_maxi) or 0
+        )
+        total = totaux[ligne['evaluateur']]
+        total[0] += ligne['nombre']
+        total[1] += ligne['somme']
+        total[2] += ligne['nombre'] * critere.valeur_maxi
+        total[3] += ligne['nombre'] * ecart
+        cumul = ecarts[(ligne['evaluateur'], ligne['critere'])]
+        cumul[0] += ligne['nombre']
+        cumul[1] += ligne['nombre'] * ecart
+
+    evaluateurs = Evaluateur.objects.select_related(None).prefetch_related(None).filter(
+        pk__in=volumes.keys() | totaux.keys(),
+    ).order_by('nom', 'prenom')
+    lignes = []
+    for evaluateur in evaluateurs:
+        nombre_notes, somme_notes, somme_maxi, somme_ecarts = totaux[evaluateur.pk]
+        ecart = round(somme_ecarts / nombre_notes, 1) if nombre_notes else None
+        lignes.append({
+            'evaluateur': evaluateur,
+            'nombre_evaluations': volumes[evaluateur.pk],
+            'nombre_notes': nombre_notes,
+            'score': round(somme_notes / somme_maxi * 100, 1) if somme_maxi else None,
+            'ecart': ecart,
+            'signale': ecart is not None and abs(ecart) >= SEUIL_ECART,
+        })
+
+    # Grille par type d'évaluation : un écart par évaluateur et critère
+    par_type = defaultdict(list)
+    for critere in criteres.values():
+        par_type[critere.type_evaluation].append(critere)
+    grilles = []
+    for type_evaluation, criteres_type in par_type.items():
+        lignes_type = []
+        for ligne in lignes:
+            cellules = []
+            for critere in criteres_type:
+                nombre, somme_ecarts = ecarts.get((ligne['evaluateur'].pk, critere.pk), (0, 0.0))
+                ecart = round(somme_ecarts / nombre, 1) if nombre >= NOTES_MINIMUM else None
+                cellules.append({
+                    'ecart': ecart,
+                    'nombre': nombre,
+                    'signale': ecart is not None and abs(ecart) >= SEUIL_ECART,
+                })
+            if any(cellule['nombre'] for cellule in cellules):
+                lignes_type.append({'evaluateur': ligne['evaluateur'], 'cellules': cellules})
+        if lignes_type:
+            grilles.append({'type': type_evaluation, 'criteres': criteres_type, 'lignes': lignes_type})
+
+    return {'evaluateurs': lignes, 'grilles': grilles}
+
+
+# ---------------------------------------------------------------------------
+# Tendances des sites, sociétés et conducteurs
+# ---------------------------------------------------------------------------
+
+def liste_mois(depuis, aujourd_hui=None):
+    mois_courant = premier_jour(aujourd_hui or date.today())
+    mois = [depuis]
+    while mois[-1] < mois_courant:
+        mois.append(mois_suivant(mois[-1]))
+    return mois
+
+
+def serie(valeurs, mois):
+    """
+    Points d'une courbe de tendance, un par mois (vide sans évaluation) :
+    valeurs associe à un mois (évaluations, somme des notes, somme des maxima)
+    """
+    points = []
+    for premier in mois:
+        nombre, somme, maxi = valeurs.get(premier, (0, 0, 0))
+        score = round(somme / maxi * 100, 1) if maxi else None
+        points.append({
+            'mois': premier,
+            'evaluations': nombre,
+            'score': score,
+            # Hauteur de la barre en % : score, ou trait minimal pour un mois sans note
+            'hauteur': max(round(score), 3) if score is not None else 3,
+        })
+    return points
+
+
+def tendances(filtre=Q(), nombre_mois=MOIS_TENDANCE):
+    """
+    Évaluations et score moyen normalisé (somme des notes / somme des maxima des
+    critères actifs) par mois, pour chaque site et chaque société : deux requêtes
+    sur les cumuls, quel que soit le nombre d'évaluations.
+    Renvoie {'site': {id: série}, 'societe': {socid: série}} ; une clé absente
+    donne une série vide.
+    """
+    depuis = debut_periode(nombre_mois - 1)
+    valeurs = {champ: defaultdict(lambda: defaultdict(lambda: [0, 0, 0])) for champ in ('site', 'societe')}
+    for ligne in CumulSite.objects.filter(filtre).evaluations_par_mois(depuis):
+        for champ, par_cle in valeurs.items():
+            par_cle[ligne[champ]][ligne['mois']][0] += ligne['nombre']
+    for ligne in CumulSiteCritere.objects.filter(filtre).scores_par_mois(depuis):
+        for champ, par_cle in valeurs.items():
+            cumul = par_cle[ligne[champ]][ligne['mois']]
+            cumul[1] += ligne['somme']
+            cumul[2] += ligne['maxi']
+
+    mois = liste_mois(depuis)
+    resultat = {}
+    for champ, par_cle in valeurs.items():
+        series = defaultdict(lambda: serie({}, mois))
+        series.update({cle: serie(par_mois, mois) for cle, par_mois in par_cle.items()})
+        resultat[champ] = series
+    return resultat
+
+
+def tendance_evaluations(evaluations_with_scores, nombre_mois=MOIS_TENDANCE):
+    """Série d'un conducteur calculée sur ses évaluations déjà chargées avec leur score"""
+    depuis = debut_periode(nombre_mois - 1)
+    valeurs = defaultdict(lambda: [0, 0, 0])
+    for item in evaluations_with_scores:
+        mois = premier_jour(item['evaluation'].date_evaluation)
+        if mois < depuis:
+            continue
+        cumul = valeurs[mois]
+        cumul[0] += 1
+        if item['score'] is not None:
+            # Moyenne des scores du mois : chaque évaluation compte pour 100
+            cumul[1] += item['score']
+            cumul[2] += 100
+    return serie(valeurs, liste_mois(depuis))
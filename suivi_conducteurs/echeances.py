@@ -0,0 +1,144 @@
+# suivi_conducteurs/echeances.py
+"""
+Échéances des évaluations : pour chaque conducteur actif et chaque type
+d'évaluation à fréquence définie, date de la prochaine évaluation due
+(dernière évaluation + fréquence, ou entrée du conducteur s'il n'a jamais été
+évalué pour ce type). Tenues à jour à chaque écriture (signals.py), recalculées
+en bloc par recompute_evaluation_schedule après un changement de fréquence.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Conducteur, EcheanceEvaluation, Evaluation, TypologieEvaluation
+
+# Horizons proposés pour les évaluations bientôt dues, en jours (le premier par défaut)
+HORIZONS = (14, 7, 30, 60)
+
+
+def date_entree(conducteur):
+    """Date d'entrée du conducteur, échéance de sa première évaluation"""
+    date_creation = conducteur.date_creation
+    if timezone.is_aware(date_creation):
+        date_creation = timezone.localtime(date_creation)
+    return date_creation.date()
+
+
+def calculer_echeance(conducteur, type_evaluation, derniere):
+    """Ligne d'échéance du couple ; derniere : (date, évaluateur) de la dernière évaluation, ou None"""
+    date_derniere, evaluateur_id = derniere or (None, None)
+    debut = date_derniere or date_entree(conducteur)
+    return EcheanceEvaluation(
+        conducteur_id=conducteur.pk,
+        type_evaluation_id=type_evaluation.pk,
+        site_id=conducteur.site_id,
+        evaluateur_id=evaluateur_id,
+        derniere_evaluation=date_derniere,
+        date_echeance=debut + timedelta(days=type_evaluation.frequence_jours) if date_derniere else debut,
+    )
+
+
+def derniere_evaluation(conducteur_id, type_evaluation_id):
+    """(date, évaluateur) de la dernière évaluation du couple : index evaluation_cond_type_date_idx"""
+    return Evaluation.objects.filter(
+        conducteur_id=conducteur_id, type_evaluation_id=type_evaluation_id,
+    ).order_by('-date_evaluation', '-id').values_list('date_evaluation', 'evaluateur_id').first()
+
+
+# ---------------------------------------------------------------------------
+# Mise à jour incrémentale (appelée par signals.py)
+# ---------------------------------------------------------------------------
+
+def recalculer(conducteur, type_evaluation):
+    """Échéance d'un couple (instances) après une écriture de ses évaluations"""
+    couple = EcheanceEvaluation.objects.filter(conducteur_id=conducteur.pk, type_evaluation_id=type_evaluation.pk)
+    if not conducteur.salactif or not type_evaluation.frequence_jours:
+        couple.delete()
+        return
+    echeance = calculer_echeance(conducteur, type_evaluation, derniere_evaluation(conducteur.pk, type_evaluation.pk))
+    champs = ('site_id', 'evaluateur_id', 'derniere_evaluation', 'date_echeance')
+    if not couple.update(**{champ: getattr(echeance, champ) for champ in champs}):
+        echeance.save()
+
+
+def evaluation_enregistree(evaluation, couple_precedent=None):
+    """couple_precedent : (conducteur, type) de l'évaluation avant sa modification"""
+    recalculer(evaluation.conducteur, evaluation.type_evaluation)
+    if couple_precedent and couple_precedent != (evaluation.conducteur_id, evaluation.type_evaluation_id):
+        conducteur_id, type_evaluation_id = couple_precedent
+        conducteur = Conducteur.objects.filter(pk=conducteur_id).first()
+        type_evaluation = TypologieEvaluation.objects.filter(pk=type_evaluation_id).first()
+        if conducteur and type_evaluation:
+            recalculer(conducteur, type_evaluation)
+
+
+def conducteur_enregistre(conducteur, created, actif_precedent, site_precedent):
+    """Conducteur créé, (dés)activé ou changé de site"""
+    if not conducteur.salactif:
+        if actif_precedent:
+            conducteur.echeances.all().delete()
+    elif created or not actif_precedent:
+        for type_evaluation in TypologieEvaluation.objects.filter(frequence_jours__isnull=False):
+            recalculer(conducteur, type_evaluation)
+    elif site_precedent != conducteur.site_id:
+        conducteur.echeances.update(site_id=conducteur.site_id)
+
+
+# ---------------------------------------------------------------------------
+# Recalcul en bloc
+# ---------------------------------------------------------------------------
+
+def recalculer_type(type_evaluation):
+    """
+    Remplace les échéances d'un type : une requête pour tous les conducteurs actifs
+    (dernière évaluation en sous-requête indexée). Renvoie le nombre d'échéances
+    """
+    with transaction.atomic():
+        EcheanceEvaluation.objects.filter(type_evaluation=type_evaluation).delete()
+        if not type_evaluation.frequence_jours:
+            return 0
+        dernieres = Evaluation.objects.filter(
+            conducteur=OuterRef('pk'), type_evaluation=type_evaluation,
+        ).order_by('-date_evaluation', '-id')
+        conducteurs = Conducteur.objects.filter(salactif=True).select_related(None).annotate(
+            date_derniere=Subquery(dernieres.values('date_evaluation')[:1]),
+            evaluateur_dernier=Subquery(dernieres.values('evaluateur')[:1]),
+        ).only('pk', 'site_id', 'date_creation', 'salactif')
+        echeances = [
+            calculer_echeance(
+                conducteur, type_evaluation,
+                (conducteur.date_derniere, conducteur.evaluateur_dernier) if conducteur.date_derniere else None,
+            )
+            for conducteur in conducteurs.iterator(chunk_size=2000)
+        ]
+        EcheanceEvaluation.objects.bulk_create(echeances, batch_size=1000)
+    return len(echeances)
+
+
+# ---------------------------------------------------------------------------
+# Listes
+# ---------------------------------------------------------------------------
+
+def a_faire(horizon, site=None, evaluateur=None, type_evaluation=None, aujourd_hui=None):
+    """
+    Échéances en retard ou dues dans les horizon prochains jours, la plus ancienne
+    d'abord, avec le nombre d'échéances en retard et à venir. Filtre et tri
+    servis par les index (site | évaluateur, date_echeance)
+    """
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    echeances = EcheanceEvaluation.objects.filter(date_echeance__lte=aujourd_hui + timedelta(days=horizon))
+    if site:
+        echeances = echeances.filter(site=site)
+    if evaluateur:
+        echeances = echeances.filter(evaluateur=evaluateur)
+    if type_evaluation:
+        echeances = echeances.filter(type_evaluation=type_evaluation)
+    compteurs = echeances.aggregate(
+        en_retard=Count('pk', filter=Q(date_echeance__lt=aujourd_hui)),
+        a_venir=Count('pk', filter=Q(date_echeance__gte=aujourd_hui)),
+    )
+    return echeances.select_related(
+        'conducteur__salsocid', 'type_evaluation', 'site', 'evaluateur',
+    ).order_by('date_echeance', 'pk'), compteurs
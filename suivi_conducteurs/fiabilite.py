@@ -0,0 +1,225 @@
+# suivi_conducteurs/fiabilite.py
+"""
+Fiabilité des grilles de critères : corrélations entre critères et alpha de
+Cronbach par type d'évaluation. Ils sont calculés à partir de statistiques
+suffisantes (effectif, sommes, sommes des carrés et des produits par couple de
+critères, StatistiquesPaireCriteres) tenues à jour au commit de chaque évaluation
+écrite (signals.py) : le rapport lit O(critères²) lignes, jamais les notes.
+
+Les covariances sont calculées par couple (évaluations notées sur les deux
+critères) ; l'alpha est donc un alpha « par paires », identique à l'alpha
+classique quand toutes les évaluations sont complètes.
+"""
+from collections import defaultdict
+from math import sqrt
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import CritereEvaluation, Note, StatistiquesPaireCriteres, TypologieEvaluation
+
+# Corrélation (en valeur absolue) à partir de laquelle deux critères sont jugés redondants
+SEUIL_REDONDANCE = 0.9
+
+# Corrélation critère-reste en dessous de laquelle un critère est jugé peu fiable
+SEUIL_FIABILITE = 0.3
+
+CHAMPS = ('nombre', 'somme_a', 'somme_b', 'somme_carres_a', 'somme_carres_b', 'somme_produits')
+
+
+# ---------------------------------------------------------------------------
+# Mise à jour incrémentale
+# ---------------------------------------------------------------------------
+
+def notes_evaluation(evaluation_id):
+    """Notes renseignées d'une évaluation : {critère: valeur}"""
+    return dict(Note.objects.filter(
+        evaluation_id=evaluation_id, valeur__isnull=False,
+    ).order_by().values_list('critere_id', 'valeur'))
+
+
+def couples(notes):
+    """Contributions des notes {critère: valeur} d'une évaluation, une par couple critere_a <= critere_b"""
+    notes = sorted(notes.items())
+    for i, (critere_a, valeur_a) in enumerate(notes):
+        for critere_b, valeur_b in notes[i:]:
+            yield (critere_a, critere_b), (
+                1, valeur_a, valeur_b, valeur_a * valeur_a, valeur_b * valeur_b, valeur_a * valeur_b,
+            )
+
+
+def evaluation_modifiee(avant, apres):
+    """
+    Notes d'une évaluation passées de avant à apres ({critère: valeur}, vides pour une
+    création ou une suppression) : contributions des nouveaux couples moins celles des
+    anciens, écrites en une instruction quel que soit le nombre de notes modifiées
+    """
+    increments = defaultdict(lambda: [0] * len(CHAMPS))
+    for notes, signe in ((avant, -1), (apres, 1)):
+        for couple, contribution in couples(notes):
+            increments[couple] = [cumul + signe * valeur for cumul, valeur in zip(increments[couple], contribution)]
+    StatistiquesPaireCriteres.objects.incrementer(
+        {couple: dict(zip(CHAMPS, valeurs)) for couple, valeurs in increments.items()},
+        creer={couple for couple, _ in couples(apres)},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Reconstruction
+# ---------------------------------------------------------------------------
+
+def reconstruire():
+    """
+    Recalcule toutes les statistiques depuis les notes (remplissage initial, notes
+    écrites sans signaux : bulk_create, queryset.update). Renvoie le nombre de couples.
+    """
+    # Auto-jointure des notes d'une même évaluation : une ligne par couple critere_a <= critere_b
+    couples = Note.objects.filter(
+        valeur__isnull=False,
+        evaluation__notes__valeur__isnull=False,
+        evaluation__notes__critere_id__gte=F('critere_id'),
+    ).order_by().values('critere_id', 'evaluation__notes__critere_id').annotate(
+        nombre=Count('pk'),
+        somme_a=Sum('valeur'),
+        somme_b=Sum('evaluation__notes__valeur'),
+        somme_carres_a=Sum(F('valeur') * F('valeur')),
+        somme_carres_b=Sum(F('evaluation__notes__valeur') * F('evaluation__notes__valeur')),
+        somme_produits=Sum(F('valeur') * F('evaluation__notes__valeur')),
+    )
+    with transaction.atomic():
+        StatistiquesPaireCriteres.objects.all().delete()
+        lignes = StatistiquesPaireCriteres.objects.bulk_create([
+            StatistiquesPaireCriteres(
+                critere_a_id=couple['critere_id'],
+                critere_b_id=couple['evaluation__notes__critere_id'],
+                **{champ: couple[champ] for champ in CHAMPS},
+            )
+            for couple in couples
+        ], batch_size=1000)
+    return len(lignes)
+
+
+# ---------------------------------------------------------------------------
+# Rapport
+# ---------------------------------------------------------------------------
+
+def variance(n, somme, somme_carres):
+    """Variance (estimateur non biaisé) à partir des sommes entières, None sous 2 valeurs"""
+    return (n * somme_carres - somme * somme) / (n * (n - 1)) if n > 1 else None
+
+
+def covariance(ligne):
+    n = ligne.nombre
+    return (n * ligne.somme_produits - ligne.somme_a * ligne.somme_b) / (n * (n - 1)) if n > 1 else None
+
+
+def correlation(ligne):
+    """Coefficient de Pearson d'un couple de critères, None si indéfini"""
+    n = ligne.nombre
+    denominateur = (n * ligne.somme_carres_a - ligne.somme_a ** 2) * (n * ligne.somme_carres_b - ligne.somme_b ** 2)
+    if n < 2 or denominateur <= 0:
+        return None
+    return (n * ligne.somme_produits - ligne.somme_a * ligne.somme_b) / sqrt(denominateur)
+
+
+def alpha_cronbach(k, somme_variances, variance_totale):
+    if k < 2 or variance_totale <= 0:
+        return None
+    return k / (k - 1) * (1 - somme_variances / variance_totale)
+
+
+def arrondi(valeur, chiffres=2):
+    return None if valeur is None else round(valeur, chiffres)
+
+
+def rapport_type(type_evaluation, criteres, lignes):
+    """Rapport d'un type : criteres actifs ordonnés, lignes {(critere_a, critere_b): StatistiquesPaireCriteres}"""
+    ids = [critere.pk for critere in criteres]
+
+    def ligne(a, b):
+        return lignes.get((min(a, b), max(a, b)))
+
+    variances = {}
+    for critere in ids:
+        diagonale = ligne(critere, critere)
+        variances[critere] = diagonale and variance(diagonale.nombre, diagonale.somme_a, diagonale.somme_carres_a)
+    covariances = {
+        (a, b): ligne(a, b) and covariance(ligne(a, b))
+        for a in ids for b in ids if a < b
+    }
+
+    # Alpha sur les critères de variance définie et covariances toutes connues
+    mesures = [critere for critere in ids if variances[critere]]
+    complet = len(mesures) >= 2 and all(
+        covariances[(a, b)] is not None for a in mesures for b in mesures if a < b
+    )
+    alpha, alphas_sans, correlations_reste = None, {}, {}
+    if complet:
+        somme_variances = sum(variances[critere] for critere in mesures)
+        sommes_covariances = {
+            critere: sum(covariances[(min(critere, autre), max(critere, autre))] for autre in mesures if autre != critere)
+            for critere in mesures
+        }
+        variance_totale = somme_variances + sum(sommes_covariances.values())
+        alpha = alpha_cronbach(len(mesures), somme_variances, variance_totale)
+        for critere in mesures:
+            # Score total sans le critère, et sa covariance avec le critère
+            variance_reste = variance_totale - variances[critere] - 2 * sommes_covariances[critere]
+            alphas_sans[critere] = alpha_cronbach(
+                len(mesures) - 1, somme_variances - variances[critere], variance_reste,
+            )
+            if variance_reste > 0:
+                correlations_reste[critere] = sommes_covariances[critere] / sqrt(variances[critere] * variance_reste)
+
+    matrice = []
+    redondances = []
+    for i, critere in enumerate(criteres):
+        cellules = []
+        for j, autre in enumerate(criteres):
+            couple = ligne(critere.pk, autre.pk)
+            r = 1.0 if i == j else (couple and correlation(couple))
+            cellules.append({
+                'r': arrondi(r),
+                'force': arrondi(None if r is None else abs(r)),
+                'nombre': couple.nombre if couple else 0,
+            })
+            if j > i and r is not None and abs(r) >= SEUIL_REDONDANCE:
+                redondances.append({'critere_a': critere, 'critere_b': autre, 'r': arrondi(r)})
+        matrice.append({'critere': critere, 'cellules': cellules})
+
+    lignes_criteres = []
+    for critere in criteres:
+        diagonale = ligne(critere.pk, critere.pk)
+        correlation_reste = correlations_reste.get(critere.pk)
+        lignes_criteres.append({
+            'critere': critere,
+            'nombre': diagonale.nombre if diagonale else 0,
+            'moyenne': arrondi(diagonale.somme_a / diagonale.nombre) if diagonale and diagonale.nombre else None,
+            'ecart_type': arrondi(sqrt(max(variances[critere.pk], 0))) if variances[critere.pk] is not None else None,
+            'correlation_reste': arrondi(correlation_reste),
+            'alpha_sans': arrondi(alphas_sans.get(critere.pk)),
+            'peu_fiable': correlation_reste is not None and correlation_reste < SEUIL_FIABILITE,
+        })
+
+    return {
+        'type': type_evaluation,
+        'alpha': arrondi(alpha),
+        'criteres': lignes_criteres,
+        'matrice': matrice,
+        'redondances': redondances,
+    }
+
+
+def rapports():
+    """Rapports de fiabilité de tous les types ayant des critères actifs (trois requêtes)"""
+    criteres_par_type = {}
+    for critere in CritereEvaluation.objects.filter(actif=True).order_by('numero_ordre'):
+        criteres_par_type.setdefault(critere.type_evaluation_id, []).append(critere)
+    lignes = {
+        (ligne.critere_a_id, ligne.critere_b_id): ligne
+        for ligne in StatistiquesPaireCriteres.objects.filter(critere_a__actif=True, critere_b__actif=True)
+    }
+    return [
+        rapport_type(type_evaluation, criteres_par_type[type_evaluation.pk], lignes)
+        for type_evaluation in TypologieEvaluation.objects.filter(pk__in=criteres_par_type).order_by('nom')
+    ]
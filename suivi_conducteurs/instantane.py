@@ -0,0 +1,225 @@
+# suivi_conducteurs/instantane.py
+"""
+Instantané binaire des notes, partagé par tous les workers : un fichier de
+tableaux à largeur fixe (identifiants encodés par dictionnaire) projeté en
+mémoire en lecture seule. Les pages du fichier restent dans le cache du système,
+une seule fois pour tous les processus ; np.frombuffer lit sans copie.
+
+Format : MAGIE, longueur de l'en-tête (uint64), en-tête JSON, puis les tableaux
+alignés sur ALIGNEMENT octets (positions relatives au début des données).
+
+Les notes créées après l'instantané (id > max_note_id) sont lues en base et
+fusionnées à chaque calcul. Toute autre modification (note, évaluation, critère
+ou conducteur modifié ou supprimé) change le jeton de modifications : l'instantané
+est alors ignoré jusqu'à sa reconstruction (build_notes_snapshot). Les calculs
+travaillent directement sur les codes projetés ; les dictionnaires ne sont
+appliqués qu'aux groupes obtenus.
+"""
+import json
+import mmap
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from django.conf import settings
+from django.utils import timezone
+
+from .analytics import ColonnesNotes
+
+MAGIE = b'SCNOTES1'
+ALIGNEMENT = 64
+
+# Jeton partagé, changé à chaque modification que le delta par id ne sait pas suivre
+CLE_JETON = 'analytics:instantane:jeton'
+
+# Instantané projeté par ce processus, rouvert quand le fichier est remplacé
+_courant = None
+
+
+def cache_partage():
+    from .tableau_de_bord import cache_partage
+    return cache_partage()
+
+
+def signaler_modification():
+    """Marque l'instantané comme inexact (modification ou suppression de données déjà capturées)"""
+    cache_partage().set(CLE_JETON, time.time_ns(), timeout=None)
+
+
+def jeton_modifications():
+    return cache_partage().get(CLE_JETON)
+
+
+def encoder(valeurs):
+    """Dictionnaire des valeurs distinctes et codes (type entier le plus petit possible)"""
+    dictionnaire, codes = np.unique(valeurs, return_inverse=True)
+    return dictionnaire, codes.astype(np.min_scalar_type(max(len(dictionnaire) - 1, 0)))
+
+
+def compacter(tableau):
+    """Tableau d'entiers positifs dans le plus petit type qui contient son maximum"""
+    return tableau.astype(np.min_scalar_type(int(tableau.max()) if len(tableau) else 0))
+
+
+def construire(chemin=None):
+    """Écrit l'instantané des notes actuelles ; remplacement atomique du fichier. Renvoie l'en-tête"""
+    from .models import Note
+
+    chemin = chemin or settings.NOTES_SNAPSHOT_PATH
+    # Jeton lu avant les données : une modification pendant la lecture rendra l'instantané inexact
+    jeton = jeton_modifications()
+    max_note_id = Note.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    colonnes = ColonnesNotes.charger(Note.objects.filter(pk__lte=max_note_id))
+
+    evaluations, criteres = colonnes.evaluations, colonnes.criteres
+    types, code_type = encoder(evaluations['type_evaluation_id'])
+    sites, code_site = encoder(evaluations['site_id'])
+    societes, code_societe = encoder(evaluations['societe_id'])
+
+    tableaux = {
+        # Une ligne par note
+        'note_evaluation': compacter(colonnes.code_evaluation),
+        'note_critere': compacter(colonnes.code_critere),
+        'note_valeur': compacter(colonnes.valeur),
+        # Une ligne par évaluation
+        'evaluation_id': compacter(evaluations['evaluation_id']),
+        'evaluation_type': code_type,
+        'evaluation_site': code_site,
+        'evaluation_societe': code_societe,
+        'evaluation_jour': evaluations['date_evaluation'].astype(np.int32),
+        # Une ligne par critère
+        'critere_id': compacter(criteres['critere_id']),
+        'critere_maxi': compacter(criteres['valeur_maxi']),
+        # Dictionnaires
+        'type_id': compacter(types),
+        'site_id': compacter(sites),
+        'societe_id': compacter(societes),
+    }
+
+    positions, position = {}, 0
+    for nom, tableau in tableaux.items():
+        positions[nom] = [tableau.dtype.str, position, len(tableau)]
+        position += -(-tableau.nbytes // ALIGNEMENT) * ALIGNEMENT
+    entete = {
+        'version': 1,
+        'date': timezone.now().isoformat(),
+        'jeton': jeton,
+        'max_note_id': int(max_note_id),
+        'nb_notes': len(colonnes),
+        'tableaux': positions,
+    }
+    entete_json = json.dumps(entete).encode()
+    debut_donnees = -(-(len(MAGIE) + 8 + len(entete_json)) // ALIGNEMENT) * ALIGNEMENT
+
+    dossier = os.path.dirname(os.path.abspath(chemin))
+    os.makedirs(dossier, exist_ok=True)
+    descripteur, temporaire = tempfile.mkstemp(dir=dossier, prefix='.instantane-')
+    try:
+        with os.fdopen(descripteur, 'wb') as fichier:
+            fichier.write(MAGIE + np.uint64(len(entete_json)).tobytes() + entete_json)
+            for nom, tableau in tableaux.items():
+                fichier.seek(debut_donnees + positions[nom][1])
+                fichier.write(tableau.tobytes())
+            fichier.truncate(debut_donnees + position)
+            fichier.flush()
+            os.fsync(fichier.fileno())
+        os.chmod(temporaire, 0o644)
+        # Les lecteurs voient l'ancien ou le nouveau fichier, jamais un fichier partiel
+        os.replace(temporaire, chemin)
+    except BaseException:
+        os.unlink(temporaire)
+        raise
+    return entete
+
+
+class Instantane:
+    """Instantané projeté en mémoire ; les tableaux sont des vues sans copie, en lecture seule"""
+
+    def __init__(self, chemin):
+        with open(chemin, 'rb') as fichier:
+            self.stat = os.fstat(fichier.fileno())
+            self.mmap = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mmap[:len(MAGIE)] != MAGIE:
+            raise ValueError(f"{chemin} n'est pas un instantané de notes")
+        longueur = int(np.frombuffer(self.mmap, dtype=np.uint64, count=1, offset=len(MAGIE))[0])
+        self.entete = json.loads(self.mmap[len(MAGIE) + 8:len(MAGIE) + 8 + longueur])
+        debut_donnees = -(-(len(MAGIE) + 8 + longueur) // ALIGNEMENT) * ALIGNEMENT
+        self.tableaux = {
+            nom: np.frombuffer(self.mmap, dtype=np.dtype(dtype), count=nombre, offset=debut_donnees + position)
+            for nom, (dtype, position, nombre) in self.entete['tableaux'].items()
+        }
+
+    def colonnes(self):
+        """
+        Colonnes des notes sur les codes du fichier, sans copie ; seuls les attributs
+        des évaluations (une ligne par évaluation) passent par leurs dictionnaires
+        """
+        t = self.tableaux
+        return ColonnesNotes(
+            code_evaluation=t['note_evaluation'],
+            code_critere=t['note_critere'],
+            valeur=t['note_valeur'],
+            evaluations={
+                'evaluation_id': t['evaluation_id'],
+                'type_evaluation_id': t['type_id'][t['evaluation_type']],
+                'site_id': t['site_id'][t['evaluation_site']],
+                'societe_id': t['societe_id'][t['evaluation_societe']],
+                'date_evaluation': t['evaluation_jour'].astype('datetime64[D]'),
+            },
+            criteres={'critere_id': t['critere_id'], 'valeur_maxi': t['critere_maxi']},
+        )
+
+
+def instantane_courant(chemin=None):
+    """Instantané du processus, rouvert si le fichier a été remplacé ; None s'il n'existe pas"""
+    global _courant
+    chemin = chemin or settings.NOTES_SNAPSHOT_PATH
+    try:
+        stat = os.stat(chemin)
+    except FileNotFoundError:
+        _courant = None
+        return None
+    if _courant is None or (_courant.stat.st_ino, _courant.stat.st_mtime_ns) != (stat.st_ino, stat.st_mtime_ns):
+        _courant = Instantane(chemin)
+    return _courant
+
+
+def est_exact(instantane):
+    """
+    L'instantané reflète-t-il toujours les notes d'id <= max_note_id ? Le jeton suffit :
+    les écritures sans signal (queryset.update, suppression en SQL brut, chargement en
+    masse) doivent appeler signaler_modification
+    """
+    return instantane.entete['jeton'] == jeton_modifications()
+
+
+def notes_depuis(instantane):
+    from .models import Note
+    return Note.objects.filter(pk__gt=instantane.entete['max_note_id'])
+
+
+def colonnes_notes(chemin=None):
+    """
+    Colonnes de toutes les notes : instantané + notes créées depuis, ou lecture
+    complète en base si l'instantané est absent ou inexact
+    """
+    instantane = instantane_courant(chemin)
+    if instantane is None or not est_exact(instantane):
+        return ColonnesNotes.charger()
+    return ColonnesNotes.concatener(instantane.colonnes(), ColonnesNotes.charger(notes_depuis(instantane)))
+
+
+def raison_reconstruction(chemin=None, seuil=None):
+    """Pourquoi reconstruire l'instantané (texte), None s'il est à jour"""
+    seuil = settings.NOTES_SNAPSHOT_THRESHOLD if seuil is None else seuil
+    instantane = instantane_courant(chemin)
+    if instantane is None:
+        return 'instantané absent'
+    if not est_exact(instantane):
+        return 'données modifiées depuis l\'instantané'
+    nouvelles = notes_depuis(instantane).count()
+    if nouvelles >= seuil:
+        return f'{nouvelles} notes créées depuis l\'instantané (seuil {seuil})'
+    return None
@@ -0,0 +1,277 @@
+# suivi_conducteurs/management/commands/bench.py
+import json
+import logging
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from functools import partial
+
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from gestion_groupes import urls as gestion_groupes_urls
+from suivi_conducteurs import urls as suivi_conducteurs_urls
+from suivi_conducteurs.models import Conducteur, CritereEvaluation, Evaluation
+
+PROFILS = ['RH', 'Exploitation', 'Direction']
+
+# Routes d'authentification et API hors des deux applications
+# (logout est exclu : il fermerait la session du benchmark)
+ROUTES_AUTH = ['login', 'user_profile', 'change_password', 'dashboard_stats', 'recent_activities', 'dashboard_stream']
+
+# Vues qui écrivent en base : exclues pour que deux exécutions mesurent les mêmes données
+ROUTES_EXCLUES = {'suivi_conducteurs:submit_evaluation', 'suivi_conducteurs:traiter_alerte'}
+
+
+def compter_requete(requetes, execute, sql, params, many, context):
+    requetes.append(sql)
+    return execute(sql, params, many, context)
+
+
+def percentile(valeurs_triees, rang):
+    return valeurs_triees[min(len(valeurs_triees) - 1, int(rang / 100 * len(valeurs_triees)))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mesure latence p50/p95/p99, requêtes SQL, pic mémoire et taille de réponse de chaque vue '
+        'de suivi_conducteurs, gestion_groupes et des routes d\'authentification, par profil utilisateur'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Requêtes mesurées par vue et par profil (défaut: 20)',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=2,
+            help='Requêtes de chauffe non mesurées (défaut: 2)',
+        )
+        parser.add_argument(
+            '--profile',
+            choices=PROFILS,
+            action='append',
+            help='Profil(s) à mesurer (défaut: RH, Exploitation et Direction)',
+        )
+        parser.add_argument(
+            '--url',
+            type=str,
+            action='append',
+            help='Ne mesure que les routes dont le nom contient ce texte',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Fichier JSON de résultats (défaut: bench-AAAAMMJJ-HHMMSS.json)',
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            help='Fichier JSON de référence : signale les régressions et échoue s\'il y en a',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=20,
+            help='Régression tolérée sur p95 et le pic mémoire, en %% (défaut: 20)',
+        )
+
+    def handle(self, *args, **options):
+        routes = [
+            route for route in self.routes()
+            if not options['url'] or any(filtre in route[0] for filtre in options['url'])
+        ]
+        utilisateurs = self.utilisateurs(options['profile'] or PROFILS)
+        if not utilisateurs:
+            raise CommandError(
+                'Aucun utilisateur RH, Exploitation ou Direction : lancez create_test_users_permissions'
+            )
+
+        self.stdout.write(
+            f"⏱️  {len(routes)} routes × {len(utilisateurs)} profils, {options['iterations']} itérations\n"
+        )
+        # Avertissements de budget et traces des 403/500 : ils noieraient la sortie
+        logging.getLogger('performance').setLevel(logging.ERROR)
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        resultats = {}
+        for profil, user in utilisateurs.items():
+            client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+            client.force_login(user)
+            self.stdout.write(f'👤 {profil} ({user.username})')
+            for nom, methode, url, donnees in routes:
+                mesure = self.mesurer(client, methode, url, donnees, options['iterations'], options['warmup'])
+                resultats[f'{nom}|{profil}'] = mesure
+                self.afficher(nom, mesure)
+
+        rapport = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'commit': self.commit_courant(),
+            'iterations': options['iterations'],
+            'volumes': {
+                'conducteurs': Conducteur.objects.count(),
+                'evaluations': Evaluation.objects.count(),
+            },
+            'resultats': resultats,
+        }
+        sortie = options['output'] or f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(sortie, 'w', encoding='utf-8') as fichier:
+            json.dump(rapport, fichier, ensure_ascii=False, indent=2, sort_keys=True)
+        self.stdout.write(f'\n💾 Résultats écrits dans {sortie}')
+
+        if options['compare']:
+            self.comparer(options['compare'], resultats, options['threshold'])
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark terminé'))
+
+    def routes(self):
+        """(nom, méthode, url, données) de chaque route à mesurer"""
+        premier_conducteur = lambda: Conducteur.objects.order_by('pk').values_list('pk', flat=True).first()
+        arguments = {
+            'suivi_conducteurs:evaluation_detail': lambda: Evaluation.objects.order_by('pk').values_list('pk', flat=True).first(),
+            'suivi_conducteurs:conducteur_detail': premier_conducteur,
+            'suivi_conducteurs:conducteur_scores': premier_conducteur,
+            'gestion_groupes:detail_utilisateur': lambda: User.objects.order_by('pk').values_list('pk', flat=True).first(),
+            'gestion_groupes:detail_groupe': lambda: Group.objects.order_by('pk').values_list('pk', flat=True).first(),
+        }
+        critere = CritereEvaluation.objects.filter(actif=True).order_by('pk').first()
+        nom_conducteur = Conducteur.objects.actifs().order_by('pk').values_list('salnom', flat=True).first()
+
+        noms = [
+            f'{module.app_name}:{pattern.name}'
+            for module in (suivi_conducteurs_urls, gestion_groupes_urls)
+            for pattern in module.urlpatterns
+        ] + ROUTES_AUTH
+
+        routes = []
+        for nom in noms:
+            if nom in ROUTES_EXCLUES:
+                continue
+            if nom in arguments:
+                pk = arguments[nom]()
+                if pk is None:
+                    self.stdout.write(f'   ⚠️  {nom} ignorée : aucune donnée')
+                    continue
+                url = reverse(nom, args=[pk])
+            else:
+                url = reverse(nom)
+
+            if nom == 'suivi_conducteurs:load_criteres_htmx' and critere:
+                routes.append((nom, 'get', url, {'type_evaluation': critere.type_evaluation_id}))
+            elif nom == 'suivi_conducteurs:rechercher_conducteurs_htmx' and nom_conducteur:
+                routes.append((nom, 'get', url, {'q': nom_conducteur[:3]}))
+            elif nom == 'suivi_conducteurs:validate_field_htmx' and critere:
+                routes.append((nom, 'post', url, {
+                    'field_name': 'note', 'field_value': critere.valeur_mini, 'critere_id': critere.pk,
+                }))
+            else:
+                routes.append((nom, 'get', url, None))
+        return routes
+
+    def utilisateurs(self, profils):
+        """Premier utilisateur actif de chaque groupe demandé"""
+        utilisateurs = {}
+        for profil in profils:
+            user = User.objects.filter(groups__name=profil, is_active=True).order_by('pk').first()
+            if user is None:
+                self.stdout.write(f'   ⚠️  Aucun utilisateur actif dans le groupe {profil}')
+            else:
+                utilisateurs[profil] = user
+        return utilisateurs
+
+    def mesurer(self, client, methode, url, donnees, iterations, warmup):
+        requeter = getattr(client, methode)
+        for _ in range(warmup):
+            self.lire(requeter(url, donnees))
+
+        latences = []
+        for _ in range(iterations):
+            requetes = []
+            with connection.execute_wrapper(partial(compter_requete, requetes)):
+                debut = time.perf_counter()
+                response = requeter(url, donnees)
+                taille = self.lire(response)
+                latences.append(time.perf_counter() - debut)
+
+        # Passe séparée : tracemalloc ralentit fortement l'exécution
+        tracemalloc.start()
+        self.lire(requeter(url, donnees))
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        latences.sort()
+        return {
+            'statut': response.status_code,
+            'p50_ms': round(percentile(latences, 50) * 1000, 2),
+            'p95_ms': round(percentile(latences, 95) * 1000, 2),
+            'p99_ms': round(percentile(latences, 99) * 1000, 2),
+            'requetes': len(requetes),
+            'memoire_pic_ko': round(pic / 1024, 1),
+            'octets': taille,
+        }
+
+    @staticmethod
+    def lire(response):
+        """Taille du corps de la réponse (consomme les réponses en flux, y compris asynchrones)"""
+        if not response.streaming:
+            return len(response.content)
+        if response.is_async:
+            async def consommer():
+                return sum([len(morceau) async for morceau in response.streaming_content])
+            return async_to_sync(consommer)()
+        return sum(len(morceau) for morceau in response.streaming_content)
+
+    def afficher(self, nom, mesure):
+        ligne = (
+            f"   {nom:<45} {mesure['statut']}  p50 {mesure['p50_ms']:>8.1f} ms  "
+            f"p95 {mesure['p95_ms']:>8.1f} ms  p99 {mesure['p99_ms']:>8.1f} ms  "
+            f"{mesure['requetes']:>4} req  {mesure['memoire_pic_ko']:>8.0f} Ko  {mesure['octets']:>8} o"
+        )
+        self.stdout.write(self.style.ERROR(ligne) if mesure['statut'] >= 500 else ligne)
+
+    @staticmethod
+    def commit_courant():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def comparer(self, chemin, resultats, seuil):
+        """Compare à une exécution de référence : p95 et mémoire au-delà du seuil, toute requête SQL en plus"""
+        with open(chemin, encoding='utf-8') as fichier:
+            reference = json.load(fichier)['resultats']
+
+        facteur = 1 + seuil / 100
+        regressions = []
+        for cle, mesure in sorted(resultats.items()):
+            avant = reference.get(cle)
+            if avant is None:
+                continue
+            if mesure['requetes'] > avant['requetes']:
+                regressions.append(f"{cle} : requêtes {avant['requetes']} → {mesure['requetes']}")
+            for champ, unite in (('p95_ms', 'ms'), ('memoire_pic_ko', 'Ko')):
+                if mesure[champ] > avant[champ] * facteur:
+                    regressions.append(f'{cle} : {champ} {avant[champ]} → {mesure[champ]} {unite}')
+            if mesure['statut'] != avant['statut']:
+                regressions.append(f"{cle} : statut {avant['statut']} → {mesure['statut']}")
+
+        self.stdout.write(f'\n🔍 Comparaison avec {chemin} (seuil {seuil:.0f} %)')
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('   ✅ Aucune régression'))
+            return
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(f'   ❌ {regression}'))
+        raise CommandError(f'{len(regressions)} régression(s) détectée(s)')
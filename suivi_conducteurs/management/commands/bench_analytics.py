@@ -0,0 +1,87 @@
+# suivi_conducteurs/management/commands/bench_analytics.py
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from suivi_conducteurs import analytics, instantane
+from suivi_conducteurs.models import Evaluation
+
+
+def moyennes_boucle():
+    """Moyenne des scores par type, boucle Python sur calculate_score (ancienne statistiques_view)"""
+    scores_par_type = defaultdict(list)
+    evaluations = Evaluation.objects.avec_score().select_related(None).only('type_evaluation')
+    for evaluation in evaluations.iterator(chunk_size=2000):
+        score = evaluation.calculate_score()
+        if score is not None:
+            scores_par_type[evaluation.type_evaluation_id].append(score)
+    return {type_id: (len(scores), sum(scores) / len(scores)) for type_id, scores in scores_par_type.items()}
+
+
+def moyennes(stats):
+    return {type_id: (valeurs['count'], valeurs['moyenne']) for type_id, valeurs in stats.items()}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare le calcul des scores moyens par type : boucle Python sur calculate_score '
+        'et moteur vectorisé suivi_conducteurs.analytics'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=5,
+            help='Exécutions mesurées par méthode, la meilleure est retenue (défaut: 5)',
+        )
+
+    def handle(self, *args, **options):
+        nb_evaluations = Evaluation.objects.count()
+        if not nb_evaluations:
+            raise CommandError('Aucune évaluation : lancez generate_load_data')
+        self.stdout.write(f"⏱️  {nb_evaluations} évaluations, {options['iterations']} itérations\n")
+
+        colonnes = analytics.ColonnesNotes.charger()
+        analytics.statistiques_notes()
+        mesures = {
+            'boucle calculate_score': moyennes_boucle,
+            'analytics : chargement': analytics.ColonnesNotes.charger,
+            'analytics : calcul': lambda: moyennes(analytics.statistiques_par_type(colonnes)),
+            'analytics : en cache': lambda: moyennes(analytics.statistiques_notes()['par_type']),
+        }
+        if instantane.instantane_courant() is not None:
+            mesures['analytics : instantané'] = instantane.colonnes_notes
+        else:
+            self.stdout.write('   (pas d\'instantané : lancez build_notes_snapshot pour le mesurer)')
+        resultats, meilleurs = {}, {}
+        for nom, fonction in mesures.items():
+            durees = []
+            for _ in range(options['iterations']):
+                debut = time.perf_counter()
+                resultats[nom] = fonction()
+                durees.append(time.perf_counter() - debut)
+            meilleurs[nom] = min(durees) * 1000
+            self.stdout.write(
+                f'   {nom:<24} meilleur {meilleurs[nom]:>9.1f} ms   '
+                f'médian {sorted(durees)[len(durees) // 2] * 1000:>9.1f} ms'
+            )
+
+        reference = meilleurs['boucle calculate_score']
+        complet = meilleurs['analytics : chargement'] + meilleurs['analytics : calcul']
+        self.stdout.write(f'\n🚀 Chargement + calcul : × {reference / complet:.1f}   '
+                          f"calcul seul : × {reference / meilleurs['analytics : calcul']:.1f}   "
+                          f"en cache : × {reference / meilleurs['analytics : en cache']:.0f}")
+
+        # Les méthodes doivent donner les mêmes effectifs et moyennes (à l'arrondi près)
+        boucle, vectorise = resultats['boucle calculate_score'], resultats['analytics : calcul']
+        ecarts = [
+            type_id for type_id in boucle.keys() | vectorise.keys()
+            if type_id not in boucle or type_id not in vectorise
+            or boucle[type_id][0] != vectorise[type_id][0]
+            or abs(boucle[type_id][1] - vectorise[type_id][1]) > 0.05
+        ]
+        if ecarts:
+            raise CommandError(f'Résultats différents pour les types {sorted(ecarts)}')
+        self.stdout.write(self.style.SUCCESS('\n✅ Résultats identiques, benchmark terminé'))
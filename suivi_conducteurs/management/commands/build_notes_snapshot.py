@@ -0,0 +1,47 @@
+# suivi_conducteurs/management/commands/build_notes_snapshot.py
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from suivi_conducteurs import instantane
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruit l\'instantané binaire des notes projeté en mémoire par les workers '
+        '(à planifier, par exemple toutes les 10 minutes avec --if-needed)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=settings.NOTES_SNAPSHOT_PATH,
+            help=f'Fichier de l\'instantané (défaut: NOTES_SNAPSHOT_PATH = {settings.NOTES_SNAPSHOT_PATH})',
+        )
+        parser.add_argument(
+            '--if-needed',
+            action='store_true',
+            help='Ne reconstruit que si l\'instantané est absent, inexact ou si les notes créées '
+                 'depuis atteignent NOTES_SNAPSHOT_THRESHOLD',
+        )
+
+    def handle(self, *args, **options):
+        chemin = options['output']
+        if options['if_needed']:
+            raison = instantane.raison_reconstruction(chemin)
+            if raison is None:
+                self.stdout.write(self.style.SUCCESS('✅ Instantané à jour, rien à faire'))
+                return
+            self.stdout.write(f'🔄 Reconstruction : {raison}')
+
+        debut = time.perf_counter()
+        entete = instantane.construire(chemin)
+        duree = time.perf_counter() - debut
+        self.stdout.write(
+            f"📸 {entete['nb_notes']} notes (jusqu'à l'id {entete['max_note_id']}) en {duree:.2f} s, "
+            f'{os.path.getsize(chemin) / 1024:.0f} Ko'
+        )
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Instantané écrit dans {chemin}'))
@@ -0,0 +1,168 @@
+# suivi_conducteurs/management/commands/explain_hot_queries.py
+import logging
+import re
+from datetime import date
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from configurations.performance import forme_sql
+from gestion_groupes.models import HistoriqueGroupes
+from suivi_conducteurs.models import Conducteur, CritereEvaluation, Evaluateur, Evaluation, Note
+
+from .bench import Command as Bench
+
+# Requêtes des managers et filtres fréquents (les valeurs des paramètres
+# n'influent pas sur le plan choisi)
+REQUETES_MANAGERS = {
+    'Conducteur.objects.actifs()': lambda: Conducteur.objects.actifs().order_by('salnom', 'salnom2'),
+    'Conducteur.objects.avec_statistiques_evaluations()': lambda: Conducteur.objects.avec_statistiques_evaluations(),
+    'Conducteur par site': lambda: Conducteur.objects.filter(site=1, salactif=True),
+    'Evaluation.objects.avec_score()': lambda: Evaluation.objects.avec_score(),
+    'Evaluation.objects.par_periode()': lambda: Evaluation.objects.par_periode(date(2025, 1, 1), date(2025, 1, 31)),
+    'Évaluations d\'un conducteur': lambda: Evaluation.objects.filter(conducteur=1).order_by('-date_evaluation'),
+    'Evaluateur.objects.pouvant_evaluer()': lambda: Evaluateur.objects.pouvant_evaluer(),
+    'Critères actifs d\'un type': lambda: CritereEvaluation.objects.filter(type_evaluation=1, actif=True),
+    'Note.objects.completes()': lambda: Note.objects.completes(),
+    'Historique d\'un utilisateur': lambda: HistoriqueGroupes.objects.filter(utilisateur_cible=1).order_by('-date_action'),
+}
+
+
+# Alias de table posés par l'ORM dans les sous-requêtes : "table" U0
+_ALIAS = re.compile(r'"(\w+)" (?:AS )?"?([A-Z]\d+)"?')
+
+
+def capturer_select(requetes, execute, sql, params, many, context):
+    if sql.lstrip().upper().startswith('SELECT'):
+        requetes.append((sql, params))
+    return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Exécute EXPLAIN (QUERY PLAN) sur les requêtes des managers et de chaque vue '
+        'et signale les parcours complets de table'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            type=str,
+            action='append',
+            help='Ne mesure que les routes dont le nom contient ce texte',
+        )
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=1000,
+            help='Ignore les parcours de tables de moins de N lignes (défaut: 1000)',
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Affiche le plan complet de chaque requête, pas seulement les alertes',
+        )
+        parser.add_argument(
+            '--fail-on-scan',
+            action='store_true',
+            help='Échoue si un parcours complet de table est détecté (intégration continue)',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Base {connection.vendor} non prise en charge (sqlite ou postgresql)')
+
+        requetes = {nom: fabrique().query.sql_with_params() for nom, fabrique in REQUETES_MANAGERS.items()}
+        requetes.update(self.requetes_vues(options['url']))
+        self.stdout.write(f'🔎 {len(requetes)} requêtes distinctes\n')
+
+        self.nb_lignes = {}
+        alertes = 0
+        for nom, (sql, params) in requetes.items():
+            plan = self.plan(sql, params)
+            parcours = [
+                ligne for ligne in plan
+                if (table := self.table_parcourue(ligne, sql)) and self.compter_lignes(table) >= options['min_rows']
+            ]
+            alertes += len(parcours)
+            if parcours:
+                self.stdout.write(self.style.WARNING(f'⚠️  {nom}'))
+                self.stdout.write(f'   {forme_sql(sql)[:300]}')
+                for ligne in plan if options['verbose_plans'] else parcours:
+                    self.stdout.write(f'      {ligne}')
+            elif options['verbose_plans']:
+                self.stdout.write(f'✅ {nom}')
+                for ligne in plan:
+                    self.stdout.write(f'      {ligne}')
+
+        if alertes:
+            message = f'{alertes} parcours complet(s) de table'
+            if options['fail_on_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(f'\n⚠️  {message}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('\n✅ Aucun parcours complet de table'))
+
+    def requetes_vues(self, filtres):
+        """Requêtes SELECT distinctes exécutées par chaque vue (mesurée avec un superutilisateur)"""
+        user = User.objects.filter(is_superuser=True, is_active=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('Aucun superutilisateur actif : créez-en un (createsuperuser)')
+
+        logging.getLogger('performance').setLevel(logging.ERROR)
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+        client.force_login(user)
+
+        requetes = {}
+        for nom, methode, url, donnees in Bench(stdout=self.stdout).routes():
+            if filtres and not any(filtre in nom for filtre in filtres):
+                continue
+            capturees = []
+            with connection.execute_wrapper(partial(capturer_select, capturees)):
+                Bench.lire(getattr(client, methode)(url, donnees))
+            formes = set()
+            for sql, params in capturees:
+                forme = forme_sql(sql)
+                if forme not in formes:
+                    formes.add(forme)
+                    requetes[f'{nom} #{len(formes)}'] = (sql, params)
+        return requetes
+
+    def plan(self, sql, params):
+        """Lignes du plan d'exécution"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                return [ligne[-1] for ligne in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN {sql}', params)
+            return [ligne[0].strip() for ligne in cursor.fetchall()]
+
+    @staticmethod
+    def table_parcourue(ligne, sql):
+        """Table parcourue entièrement par cette ligne du plan, sinon None
+        (SQLite : 'SCAN table' sans index ; PostgreSQL : 'Seq Scan on table')"""
+        if connection.vendor == 'sqlite':
+            trouve = re.match(r'SCAN (\w+)', ligne)
+            if not trouve or 'INDEX' in ligne:
+                return None
+        else:
+            trouve = re.search(r'Seq Scan on (\w+)', ligne)
+            if not trouve:
+                return None
+        nom = trouve.group(1)
+        return {alias: table for table, alias in _ALIAS.findall(sql)}.get(nom, nom)
+
+    def compter_lignes(self, table):
+        """Nombre de lignes de la table (sous-requêtes et vues : 0, donc ignorées)"""
+        if table not in self.nb_lignes:
+            if table in connection.introspection.table_names():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+                    self.nb_lignes[table] = cursor.fetchone()[0]
+            else:
+                self.nb_lignes[table] = 0
+        return self.nb_lignes[table]
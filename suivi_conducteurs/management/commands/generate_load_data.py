@@ -0,0 +1,432 @@
+# suivi_conducteurs/management/commands/generate_load_data.py
+import math
+import multiprocessing
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+
+from gestion_groupes.models import ProfilUtilisateur
+from gestion_groupes.signals import get_service_non_defini_id
+from suivi_conducteurs import instantane, scores, tableau_de_bord
+from suivi_conducteurs.models import (
+    Conducteur, CritereEvaluation, Evaluateur, Evaluation, Note, Service, Site, Societe,
+    TypologieEvaluation,
+)
+
+# Fin de période fixe : même graine, mêmes données, quel que soit le jour de génération
+FIN_PAR_DEFAUT = date(2025, 1, 1)
+
+COMMUNES = [
+    ('Bordeaux', '33000'), ('Mérignac', '33700'), ('Pessac', '33600'), ('Talence', '33400'),
+    ('Bègles', '33130'), ('Villenave-d\'Ornon', '33140'), ('Libourne', '33500'),
+    ('Arcachon', '33120'), ('Blanquefort', '33290'), ('Cenon', '33150'), ('Lormont', '33310'),
+    ('Saint-Médard-en-Jalles', '33160'), ('Gradignan', '33170'), ('Le Bouscat', '33110'),
+    ('Eysines', '33320'), ('Langon', '33210'), ('Lesparre-Médoc', '33340'), ('Blaye', '33390'),
+    ('Andernos-les-Bains', '33510'), ('Biganos', '33380'),
+]
+NOMS = [
+    'Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Richard', 'Petit', 'Durand', 'Leroy',
+    'Moreau', 'Simon', 'Laurent', 'Lefebvre', 'Michel', 'Garcia', 'David', 'Bertrand', 'Roux',
+    'Vincent', 'Fournier', 'Morel', 'Girard', 'André', 'Lefèvre', 'Mercier', 'Dupont', 'Lambert',
+    'Bonnet', 'François', 'Martinez', 'Legrand', 'Garnier', 'Faure', 'Rousseau', 'Blanc',
+    'Guerin', 'Muller', 'Henry', 'Roussel', 'Nicolas', 'Perrin', 'Morin', 'Mathieu', 'Clement',
+]
+PRENOMS = [
+    'Jean', 'Pierre', 'Michel', 'Philippe', 'Alain', 'Nicolas', 'Christophe', 'Patrick',
+    'Laurent', 'Stéphane', 'David', 'Éric', 'Frédéric', 'Julien', 'Sébastien', 'Thomas',
+    'Marie', 'Nathalie', 'Isabelle', 'Sylvie', 'Catherine', 'Sandrine', 'Céline', 'Julie',
+    'Karim', 'Mohamed', 'Antoine', 'Kevin', 'Mathieu', 'Olivier', 'Sophie', 'Aurélie',
+]
+PREFIXES_SOCIETES = ['Transports', 'Logistique', 'Messageries', 'Express', 'Fret', 'Cars']
+
+# Catalogue créé s'il n'existe aucun critère actif : (nom, abréviation, part des
+# évaluations, bornes des notes, critères). Complété jusqu'à --criteria-per-type
+CATALOGUE = [
+    ('Avant recrutement', 'REC', 0.15, (0, 10), [
+        'Présentation', 'Connaissance du code de la route', 'Manœuvres', 'Attelage',
+        'Lecture de carte', 'Documents de bord',
+    ]),
+    ('Évaluation de la conduite', 'CON', 0.55, (1, 5), [
+        'Respect des limitations', 'Anticipation', 'Distances de sécurité', 'Éco-conduite',
+        'Manœuvres', 'Arrimage', 'Ponctualité', 'Utilisation du chronotachygraphe',
+    ]),
+    ('Évaluation du comportement', 'COMP', 0.30, (1, 5), [
+        'Relation client', 'Tenue', 'Respect des consignes', 'Communication',
+        'Esprit d\'équipe', 'Gestion du stress',
+    ]),
+]
+
+SIGNAUX = [pre_save, post_save, pre_delete, post_delete, m2m_changed]
+
+# Tables dérivées tenues à jour par les signaux, reconstruites après le chargement
+RECONSTRUCTIONS = [
+    'rebuild_criteria_statistics',
+    'rebuild_monthly_rollups',
+    'recompute_evaluation_schedule',
+    'build_notes_snapshot',
+]
+
+# Paramètres partagés avec les processus de génération (hérités par fork)
+_contexte = {}
+
+
+@contextmanager
+def signaux_desactives():
+    """Déconnecte temporairement tous les receivers des signaux de modèle"""
+    sauvegarde = {signal: signal.receivers for signal in SIGNAUX}
+    for signal in SIGNAUX:
+        signal.receivers = []
+        signal.sender_receivers_cache.clear()
+    try:
+        yield
+    finally:
+        for signal, receivers in sauvegarde.items():
+            signal.receivers = receivers
+            signal.sender_receivers_cache.clear()
+
+
+def _poids_zipf(nombre, exposant=0.8):
+    """Poids cumulés décroissants : quelques grosses entités, beaucoup de petites"""
+    return list(accumulate(1 / (rang + 1) ** exposant for rang in range(nombre)))
+
+
+def _generer_lot(numero):
+    """
+    Génère et insère le lot d'évaluations (et leurs notes) n° numero.
+    Le générateur aléatoire est propre au lot : le résultat ne dépend pas du nombre de processus.
+    """
+    c = _contexte
+    rng = random.Random(f"{c['seed']}:evaluations:{numero}")
+    debut = numero * c['taille_lot']
+    fin = min(debut + c['taille_lot'], c['nb_evaluations'])
+    nb_conducteurs = len(c['conducteurs'])
+
+    evaluations = []
+    notes = []
+    for index in range(debut, fin):
+        # Chaque conducteur a ses évaluations dans des créneaux de dates distincts :
+        # la contrainte d'unicité (conducteur, date, évaluateur, type) est toujours respectée
+        conducteur_index = index % nb_conducteurs
+        creneau = index // nb_conducteurs
+        jour = creneau * c['duree_creneau'] + rng.randrange(c['duree_creneau'])
+        type_id = rng.choices(c['types'], cum_weights=c['poids_types'])[0]
+        evaluateur_index = rng.randrange(len(c['evaluateurs']))
+        evaluation_id = c['premier_id_evaluation'] + index
+
+        evaluations.append(Evaluation(
+            id=evaluation_id,
+            date_evaluation=c['date_debut'] + timedelta(days=jour),
+            evaluateur_id=c['evaluateurs'][evaluateur_index],
+            conducteur_id=c['conducteurs'][conducteur_index],
+            type_evaluation_id=type_id,
+        ))
+
+        # Note = niveau du conducteur + difficulté du critère + sévérité de l'évaluateur + bruit
+        niveau = c['niveaux'][conducteur_index] + c['severites'][evaluateur_index]
+        for critere_id, mini, maxi, difficulte in c['criteres'][type_id]:
+            if rng.random() < c['taux_non_note']:
+                valeur = None
+            else:
+                x = min(1.0, max(0.0, niveau + difficulte + rng.gauss(0, 0.12)))
+                valeur = mini + round(x * (maxi - mini))
+            notes.append(Note(evaluation_id=evaluation_id, critere_id=critere_id, valeur=valeur))
+
+    # SQLite n'accepte qu'un écrivain : les processus génèrent en parallèle mais écrivent chacun leur tour
+    with c['verrou_ecriture'], transaction.atomic():
+        Evaluation.objects.bulk_create(evaluations, batch_size=c['batch_size'])
+        Note.objects.bulk_create(notes, batch_size=c['batch_size'])
+    return len(evaluations), len(notes)
+
+
+class Command(BaseCommand):
+    help = (
+        'Génère un jeu de données volumineux et reproductible (sites, sociétés, conducteurs, '
+        'évaluateurs, évaluations et notes) pour les tests de charge'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sites', type=int, default=50, help='Nombre de sites (défaut: 50)')
+        parser.add_argument('--companies', type=int, default=200, help='Nombre de sociétés (défaut: 200)')
+        parser.add_argument('--drivers', type=int, default=100_000, help='Nombre de conducteurs (défaut: 100000)')
+        parser.add_argument('--evaluators', type=int, default=40, help="Nombre d'évaluateurs (défaut: 40)")
+        parser.add_argument(
+            '--evaluations',
+            type=int,
+            default=1_000_000,
+            help="Nombre d'évaluations (défaut: 1000000) ; une note par critère actif du type",
+        )
+        parser.add_argument(
+            '--criteria-per-type',
+            type=int,
+            default=20,
+            help='Critères par type si le catalogue est créé (défaut: 20, soit ~20 notes par évaluation)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=3 * 365,
+            help='Période couverte par les évaluations, en jours (défaut: 1095)',
+        )
+        parser.add_argument(
+            '--end-date',
+            type=date.fromisoformat,
+            default=FIN_PAR_DEFAUT,
+            help=f'Dernier jour de la période, AAAA-MM-JJ (défaut: {FIN_PAR_DEFAUT})',
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Graine aléatoire (défaut: 42)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Évaluations par lot et par transaction (défaut: 2000)',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='Processus de génération des évaluations (défaut: 1)',
+        )
+
+    def handle(self, *args, **options):
+        if options['drivers'] < 1 or options['evaluators'] < 1:
+            raise CommandError('Il faut au moins un conducteur et un évaluateur')
+        par_conducteur = math.ceil(options['evaluations'] / options['drivers'])
+        if par_conducteur > options['days']:
+            raise CommandError(
+                f'{par_conducteur} évaluations par conducteur sur {options["days"]} jours : '
+                'augmentez --drivers ou --days'
+            )
+
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        debut = time.perf_counter()
+        self.stdout.write(f"🏗️  Génération des données de charge (graine {self.seed})\n")
+
+        with signaux_desactives():
+            criteres = self.preparer_catalogue(options['criteria_per_type'])
+            sites = self.creer_sites(options['sites'])
+            societes = self.creer_societes(options['companies'])
+            conducteurs = self.creer_conducteurs(options['drivers'], sites, societes)
+            evaluateurs = self.creer_evaluateurs(options['evaluators'])
+            self.creer_evaluations(options, criteres, conducteurs, evaluateurs, par_conducteur)
+
+        self.reconstruire_derives()
+        # Un seul signal pour les tableaux de bord ouverts, plutôt qu'un par ligne
+        tableau_de_bord.signaler_changement()
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ Données générées en {time.perf_counter() - debut:.0f} s'
+        ))
+
+    def reconstruire_derives(self):
+        """Les signaux étaient coupés : caches invalidés, tables dérivées recalculées depuis les données"""
+        scores.invalider_tous()
+        instantane.signaler_modification()
+        self.stdout.write('\n🔁 Reconstruction des données dérivées')
+        for commande in RECONSTRUCTIONS:
+            self.stdout.write(f'\n   ▶️  {commande}')
+            try:
+                call_command(commande, stdout=self.stdout, stderr=self.stderr)
+            except Exception as exc:
+                raise CommandError(
+                    f'{commande} a échoué ({exc}) : données chargées mais tables dérivées '
+                    f'incomplètes, relancez {", ".join(RECONSTRUCTIONS[RECONSTRUCTIONS.index(commande):])}'
+                ) from exc
+
+    def rng(self, etape):
+        return random.Random(f'{self.seed}:{etape}')
+
+    def preparer_catalogue(self, criteres_par_type):
+        """Types et critères actifs : ceux existants, sinon le CATALOGUE ; {type_id: (poids, [critères])}"""
+        rng = self.rng('catalogue')
+        if not CritereEvaluation.objects.filter(actif=True).exists():
+            numero = CritereEvaluation.objects.aggregate(m=Max('numero_ordre'))['m'] or 0
+            nouveaux = []
+            for nom, abreviation, _, (mini, maxi), noms_criteres in CATALOGUE:
+                typologie = TypologieEvaluation.objects.create(
+                    nom=nom, abreviation=abreviation, description=f'{nom} (données de charge)'
+                )
+                noms = noms_criteres[:criteres_par_type]
+                noms += [f'{nom} - critère {i}' for i in range(len(noms) + 1, criteres_par_type + 1)]
+                for nom_critere in noms:
+                    numero += 1
+                    nouveaux.append(CritereEvaluation(
+                        nom=nom_critere, numero_ordre=numero, type_evaluation=typologie,
+                        valeur_mini=mini, valeur_maxi=maxi,
+                    ))
+            CritereEvaluation.objects.bulk_create(nouveaux)
+            self.stdout.write(f'   📋 Catalogue créé : {len(CATALOGUE)} types, {len(nouveaux)} critères')
+
+        poids_catalogue = {abreviation: poids for _, abreviation, poids, _, _ in CATALOGUE}
+        criteres = {}
+        for critere in CritereEvaluation.objects.filter(actif=True).select_related('type_evaluation').order_by('numero_ordre'):
+            poids = poids_catalogue.get(critere.type_evaluation.abreviation, 1 / 3)
+            # Difficulté propre au critère : certains sont mieux notés que d'autres
+            difficulte = rng.uniform(-0.15, 0.1)
+            criteres.setdefault(critere.type_evaluation_id, (poids, []))[1].append(
+                (critere.pk, critere.valeur_mini, critere.valeur_maxi, difficulte)
+            )
+        return criteres
+
+    def creer_sites(self, nombre):
+        rng = self.rng('sites')
+        sites = []
+        for i in range(nombre):
+            commune, code_postal = COMMUNES[i % len(COMMUNES)]
+            if i >= len(COMMUNES):
+                commune = f'{commune} {i // len(COMMUNES) + 1}'
+                code_postal = f'33{rng.randrange(1000):03d}'
+            sites.append(Site(nom_commune=commune, code_postal=code_postal))
+        sites = Site.objects.bulk_create(sites, batch_size=self.batch_size)
+        self.stdout.write(f'   🏢 {len(sites)} sites')
+        return [site.pk for site in sites]
+
+    def creer_societes(self, nombre):
+        rng = self.rng('societes')
+        premier_socid = (Societe.objects.aggregate(m=Max('socid'))['m'] or 0) + 1
+        societes = []
+        for socid in range(premier_socid, premier_socid + nombre):
+            commune, code_postal = rng.choice(COMMUNES)
+            societes.append(Societe(
+                socid=socid,
+                socnom=f'{rng.choice(PREFIXES_SOCIETES)} {rng.choice(NOMS)} {socid}',
+                soccode=f'S{socid:05d}',
+                socactif=rng.random() < 0.95,
+                soccp=code_postal,
+                socvillib1=commune,
+            ))
+        Societe.objects.bulk_create(societes, batch_size=self.batch_size)
+        self.stdout.write(f'   🏭 {nombre} sociétés')
+        return [societe.socid for societe in societes]
+
+    def creer_conducteurs(self, nombre, sites, societes):
+        rng = self.rng('conducteurs')
+        poids_sites = _poids_zipf(len(sites))
+        poids_societes = _poids_zipf(len(societes))
+        premier_id = (Conducteur.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+        ids = range(premier_id, premier_id + nombre)
+        for debut in range(0, nombre, self.batch_size):
+            lot = [
+                Conducteur(
+                    id=conducteur_id,
+                    salnom=rng.choice(NOMS),
+                    salnom2=rng.choice(PRENOMS),
+                    salsocid_id=rng.choices(societes, cum_weights=poids_societes)[0],
+                    site_id=rng.choices(sites, cum_weights=poids_sites)[0],
+                    salactif=rng.random() < 0.92,
+                    interim_p=rng.random() < 0.15,
+                    sous_traitant_p=rng.random() < 0.10,
+                    date_naissance=date(1960, 1, 1) + timedelta(days=rng.randrange(40 * 365)),
+                )
+                for conducteur_id in ids[debut:debut + self.batch_size]
+            ]
+            with transaction.atomic():
+                Conducteur.objects.bulk_create(lot)
+        self.stdout.write(f'   🚚 {nombre} conducteurs')
+        return list(ids)
+
+    def creer_evaluateurs(self, nombre):
+        """Comptes utilisateurs (Exploitation/RH), profils et évaluateurs, en bulk"""
+        rng = self.rng('evaluateurs')
+        groupes = list(Group.objects.filter(name__in=['Exploitation', 'RH']).order_by('name'))
+        if not groupes:
+            self.stdout.write('   ⚠️  Groupes Exploitation/RH absents : évaluateurs créés sans groupe')
+        services = {
+            service.nom: service.pk
+            for service in Service.objects.filter(nom__in=['Exploitation', 'Ressources Humaines'])
+        }
+        numero = User.objects.filter(username__startswith='charge.evaluateur.').count()
+        mot_de_passe = make_password(None)
+
+        users = []
+        for i in range(numero + 1, numero + nombre + 1):
+            users.append(User(
+                username=f'charge.evaluateur.{i:04d}',
+                first_name=rng.choice(PRENOMS),
+                last_name=rng.choice(NOMS),
+                password=mot_de_passe,
+            ))
+        with transaction.atomic():
+            users = User.objects.bulk_create(users)
+            profils = []
+            membres = []
+            evaluateurs = []
+            for i, user in enumerate(users):
+                groupe = groupes[i % len(groupes)] if groupes else None
+                nom_service = 'Ressources Humaines' if groupe and groupe.name == 'RH' else 'Exploitation'
+                profils.append(ProfilUtilisateur(
+                    user=user, nom=user.last_name, prenom=user.first_name,
+                    service_id=services.get(nom_service) or get_service_non_defini_id(),
+                ))
+                if groupe:
+                    membres.append(User.groups.through(user_id=user.pk, group_id=groupe.pk))
+                evaluateurs.append(Evaluateur(user=user, nom=user.last_name, prenom=user.first_name))
+            ProfilUtilisateur.objects.bulk_create(profils)
+            User.groups.through.objects.bulk_create(membres)
+            evaluateurs = Evaluateur.objects.bulk_create(evaluateurs)
+        self.stdout.write(f'   👨‍💼 {len(evaluateurs)} évaluateurs')
+        return [evaluateur.pk for evaluateur in evaluateurs]
+
+    def creer_evaluations(self, options, criteres, conducteurs, evaluateurs, par_conducteur):
+        if not criteres:
+            raise CommandError('Aucun critère actif : impossible de générer des notes')
+        rng = self.rng('niveaux')
+        types = list(criteres)
+        nb_evaluations = options['evaluations']
+        _contexte.update(
+            seed=self.seed,
+            taille_lot=self.batch_size,
+            batch_size=self.batch_size,
+            nb_evaluations=nb_evaluations,
+            conducteurs=conducteurs,
+            evaluateurs=evaluateurs,
+            # Niveau de chaque conducteur et sévérité de chaque évaluateur
+            niveaux=[min(0.95, max(0.2, rng.gauss(0.65, 0.12))) for _ in conducteurs],
+            severites=[rng.gauss(0, 0.05) for _ in evaluateurs],
+            types=types,
+            poids_types=list(accumulate(criteres[t][0] for t in types)),
+            criteres={t: criteres[t][1] for t in types},
+            taux_non_note=0.02,
+            duree_creneau=options['days'] // par_conducteur,
+            date_debut=options['end_date'] - timedelta(days=options['days'] - 1),
+            premier_id_evaluation=(Evaluation.objects.aggregate(m=Max('id'))['m'] or 0) + 1,
+        )
+
+        nb_lots = math.ceil(nb_evaluations / self.batch_size)
+        total_evaluations = total_notes = 0
+        palier = max(1, nb_lots // 10)
+        processus = options['processes']
+        self.stdout.write(f'   📝 {nb_evaluations} évaluations en {nb_lots} lots ({processus} processus)')
+
+        if processus > 1:
+            # Chaque processus ouvre sa propre connexion
+            contexte_mp = multiprocessing.get_context('fork')
+            sqlite = connections['default'].vendor == 'sqlite'
+            _contexte['verrou_ecriture'] = contexte_mp.Lock() if sqlite else nullcontext()
+            connections.close_all()
+            with contexte_mp.Pool(processus) as pool:
+                resultats = pool.imap_unordered(_generer_lot, range(nb_lots))
+                for i, (nb, nb_notes) in enumerate(resultats, 1):
+                    total_evaluations += nb
+                    total_notes += nb_notes
+                    if i % palier == 0 or i == nb_lots:
+                        self.stdout.write(f'      {i}/{nb_lots} lots')
+        else:
+            _contexte['verrou_ecriture'] = nullcontext()
+            for i in range(nb_lots):
+                nb, nb_notes = _generer_lot(i)
+                total_evaluations += nb
+                total_notes += nb_notes
+                if (i + 1) % palier == 0 or i + 1 == nb_lots:
+                    self.stdout.write(f'      {i + 1}/{nb_lots} lots')
+
+        self.stdout.write(f'   📊 {total_evaluations} évaluations, {total_notes} notes')
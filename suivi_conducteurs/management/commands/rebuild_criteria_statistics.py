@@ -0,0 +1,19 @@
+# suivi_conducteurs/management/commands/rebuild_criteria_statistics.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from suivi_conducteurs import fiabilite
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcule depuis les notes les statistiques des couples de critères du rapport de '
+        'fiabilité (remplissage initial, ou après des écritures de notes sans signaux)'
+    )
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        nombre = fiabilite.reconstruire()
+        self.stdout.write(f'📊 {nombre} couples de critères en {time.perf_counter() - debut:.2f} s')
+        self.stdout.write(self.style.SUCCESS('\n✅ Statistiques de fiabilité reconstruites'))
@@ -0,0 +1,73 @@
+# suivi_conducteurs/management/commands/rebuild_monthly_rollups.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from suivi_conducteurs import cumuls
+
+
+def lire_mois(valeur):
+    try:
+        annee, mois = valeur.split('-')
+        return date(int(annee), int(mois), 1)
+    except ValueError:
+        raise CommandError(f'Mois invalide : {valeur} (format attendu AAAA-MM)')
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcule les cumuls mensuels (calibrage des évaluateurs, tendances des sites et sociétés) '
+        'depuis les évaluations et les notes : remplissage initial, ou après des écritures sans signaux '
+        '(bulk_create, queryset.update)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            action='append',
+            dest='mois',
+            help='Mois à recalculer (AAAA-MM), répétable. Par défaut tous les mois',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processus calculant les mois en parallèle (1 : dans ce processus). Par défaut un par cœur',
+        )
+
+    def handle(self, *args, **options):
+        if options['mois']:
+            liste_mois = [lire_mois(valeur) for valeur in options['mois']]
+        else:
+            liste_mois = cumuls.mois_a_reconstruire()
+        processus = max(1, min(options['workers'], len(liste_mois)))
+        self.stdout.write(f'🔄 {len(liste_mois)} mois à recalculer ({processus} processus)')
+
+        debut = time.perf_counter()
+        total = 0
+        for mois, lignes in self.calculer(liste_mois, processus):
+            # Écritures dans ce processus seulement, une transaction par mois
+            total += cumuls.enregistrer_mois(mois, lignes)
+            self.stdout.write(f'   {mois:%Y-%m} : {len(lignes)} lignes')
+
+        self.stdout.write(f'\n📊 {total} lignes en {time.perf_counter() - debut:.2f} s')
+        self.stdout.write(self.style.SUCCESS('✅ Cumuls mensuels reconstruits'))
+
+    def calculer(self, liste_mois, processus):
+        """Lignes de chaque mois, calculées en lecture seule par un pool de processus"""
+        if processus == 1:
+            for mois in liste_mois:
+                yield mois, cumuls.calculer_mois(mois)
+            return
+
+        # Pas de connexion partagée avec les processus fils : chacun ouvre la sienne
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processus, initializer=django.setup) as pool:
+            taches = {pool.submit(cumuls.calculer_mois, mois): mois for mois in liste_mois}
+            for tache in as_completed(taches):
+                yield taches[tache], tache.result()
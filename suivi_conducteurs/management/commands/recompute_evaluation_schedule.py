@@ -0,0 +1,45 @@
+# suivi_conducteurs/management/commands/recompute_evaluation_schedule.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from suivi_conducteurs import echeances
+from suivi_conducteurs.models import TypologieEvaluation
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les échéances d'évaluation des conducteurs actifs : après un changement de "
+        "fréquence d'un type d'évaluation, au remplissage initial, ou après des écritures sans "
+        "signaux (bulk_create, queryset.update)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            action='append',
+            type=int,
+            dest='types',
+            help="Id du type d'évaluation à recalculer, répétable. Par défaut tous les types",
+        )
+
+    def handle(self, *args, **options):
+        types = TypologieEvaluation.objects.order_by('nom')
+        if options['types']:
+            types = types.filter(pk__in=options['types'])
+            inconnus = set(options['types']) - {type_evaluation.pk for type_evaluation in types}
+            if inconnus:
+                raise CommandError(f"Type d'évaluation inconnu : {', '.join(map(str, sorted(inconnus)))}")
+
+        debut = time.perf_counter()
+        total = 0
+        for type_evaluation in types:
+            nombre = echeances.recalculer_type(type_evaluation)
+            total += nombre
+            if type_evaluation.frequence_jours:
+                self.stdout.write(f'   {type_evaluation.nom} (tous les {type_evaluation.frequence_jours} jours) : {nombre} échéances')
+            else:
+                self.stdout.write(f'   {type_evaluation.nom} : pas de fréquence, échéances supprimées')
+
+        self.stdout.write(f'\n📅 {total} échéances en {time.perf_counter() - debut:.2f} s')
+        self.stdout.write(self.style.SUCCESS('✅ Échéances recalculées'))
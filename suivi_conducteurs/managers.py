@@ -70,17 +70,11 @@ class EvaluationManager(models.Manager):
             date_evaluation__range=[date_debut, date_fin]
         )
     
-    def statistiques_par_evaluateur(self):
-        """Statistiques groupées par évaluateur"""
-        return self.values(
-            'evaluateur__nom',
-            'evaluateur__prenom',
-            'evaluateur__user__profil__service__nom'
-        ).annotate(
-            nb_evaluations=models.Count('id'),
-            score_moyen=models.Avg('notes__valeur'),
-            derniere_evaluation=models.Max('date_evaluation')
-        )
+    def statistiques_par_evaluateur(self, mois=None):
+        """Statistiques groupées par évaluateur, lues dans les cumuls mensuels"""
+        from .models import CumulEvaluateurCritere
+
+        return CumulEvaluateurCritere.objects.statistiques_par_evaluateur(mois)
 
 class NoteManager(models.Manager):
     def get_queryset(self):
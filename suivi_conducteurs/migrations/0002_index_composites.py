@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suivi_conducteurs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='evaluation',
+            name='suivi_condu_conduct_f44a40_idx',
+        ),
+        migrations.AddIndex(
+            model_name='conducteur',
+            index=models.Index(condition=models.Q(('salactif', True)), fields=['salnom', 'salnom2'], name='conducteur_actif_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conducteur',
+            index=models.Index(fields=['site', 'salactif'], name='conducteur_site_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='critereevaluation',
+            index=models.Index(condition=models.Q(('actif', True)), fields=['type_evaluation', 'numero_ordre'], name='critere_actif_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evaluation',
+            index=models.Index(fields=['conducteur', '-date_evaluation'], name='evaluation_cond_date_idx'),
+        ),
+    ]
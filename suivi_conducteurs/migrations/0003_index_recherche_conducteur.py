@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:22
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suivi_conducteurs', '0002_index_composites'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conducteur',
+            index=models.Index(django.db.models.functions.text.Upper('salnom'), models.F('salnom2'), condition=models.Q(('salactif', True)), name='conducteur_actif_nom_maj_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suivi_conducteurs', '0003_index_recherche_conducteur'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiquesPaireCriteres',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.IntegerField(default=0, help_text='Évaluations notées sur les deux critères')),
+                ('somme_a', models.BigIntegerField(default=0)),
+                ('somme_b', models.BigIntegerField(default=0)),
+                ('somme_carres_a', models.BigIntegerField(default=0)),
+                ('somme_carres_b', models.BigIntegerField(default=0)),
+                ('somme_produits', models.BigIntegerField(default=0)),
+                ('critere_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.critereevaluation')),
+                ('critere_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.critereevaluation')),
+            ],
+            options={
+                'verbose_name': "Statistiques d'un couple de critères",
+                'verbose_name_plural': 'Statistiques des couples de critères',
+                'constraints': [models.UniqueConstraint(fields=('critere_a', 'critere_b'), name='stats_paire_criteres_unique'), models.CheckConstraint(condition=models.Q(('critere_a__lte', models.F('critere_b'))), name='stats_paire_criteres_ordre')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suivi_conducteurs', '0004_statistiques_paire_criteres'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CumulEvaluateur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(help_text='Premier jour du mois')),
+                ('nombre_evaluations', models.IntegerField(default=0)),
+                ('evaluateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.evaluateur')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.site')),
+            ],
+            options={
+                'verbose_name': "Cumul mensuel d'un évaluateur",
+                'verbose_name_plural': 'Cumuls mensuels des évaluateurs',
+                'constraints': [models.UniqueConstraint(fields=('mois', 'evaluateur', 'site'), name='cumul_evaluateur_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CumulEvaluateurCritere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(help_text='Premier jour du mois')),
+                ('nombre_notes', models.IntegerField(default=0)),
+                ('somme_notes', models.BigIntegerField(default=0)),
+                ('critere', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.critereevaluation')),
+                ('evaluateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.evaluateur')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.site')),
+            ],
+            options={
+                'verbose_name': "Cumul mensuel d'un évaluateur par critère",
+                'verbose_name_plural': 'Cumuls mensuels des évaluateurs par critère',
+                'constraints': [models.UniqueConstraint(fields=('mois', 'evaluateur', 'site', 'critere'), name='cumul_evaluateur_critere_unique')],
+            },
+        ),
+    ]
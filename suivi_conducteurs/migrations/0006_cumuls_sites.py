@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suivi_conducteurs', '0005_cumuls_evaluateurs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CumulSite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(help_text='Premier jour du mois')),
+                ('nombre_evaluations', models.IntegerField(default=0)),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.site')),
+                ('societe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.societe', to_field='socid')),
+                ('type_evaluation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.typologieevaluation')),
+            ],
+            options={
+                'verbose_name': "Cumul mensuel d'un site",
+                'verbose_name_plural': 'Cumuls mensuels des sites',
+                'constraints': [models.UniqueConstraint(fields=('mois', 'site', 'societe', 'type_evaluation'), name='cumul_site_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CumulSiteCritere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(help_text='Premier jour du mois')),
+                ('nombre_notes', models.IntegerField(default=0)),
+                ('somme_notes', models.BigIntegerField(default=0)),
+                ('critere', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.critereevaluation')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.site')),
+                ('societe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.societe', to_field='socid')),
+                ('type_evaluation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.typologieevaluation')),
+            ],
+            options={
+                'verbose_name': "Cumul mensuel d'un site par critère",
+                'verbose_name_plural': 'Cumuls mensuels des sites par critère',
+                'constraints': [models.UniqueConstraint(fields=('mois', 'site', 'societe', 'type_evaluation', 'critere'), name='cumul_site_critere_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suivi_conducteurs', '0006_cumuls_sites'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EcheanceEvaluation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('derniere_evaluation', models.DateField(blank=True, null=True)),
+                ('date_echeance', models.DateField(verbose_name='Échéance')),
+            ],
+            options={
+                'verbose_name': "Échéance d'évaluation",
+                'verbose_name_plural': "Échéances d'évaluation",
+            },
+        ),
+        migrations.AddField(
+            model_name='typologieevaluation',
+            name='frequence_jours',
+            field=models.PositiveIntegerField(blank=True, help_text="Délai entre deux évaluations d'un conducteur actif ; vide : pas de réévaluation planifiée", null=True, verbose_name='Fréquence (jours)'),
+        ),
+        migrations.AddIndex(
+            model_name='evaluation',
+            index=models.Index(fields=['conducteur', 'type_evaluation', '-date_evaluation'], name='evaluation_cond_type_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='echeanceevaluation',
+            name='conducteur',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='echeances', to='suivi_conducteurs.conducteur'),
+        ),
+        migrations.AddField(
+            model_name='echeanceevaluation',
+            name='evaluateur',
+            field=models.ForeignKey(blank=True, help_text='Auteur de la dernière évaluation', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='suivi_conducteurs.evaluateur'),
+        ),
+        migrations.AddField(
+            model_name='echeanceevaluation',
+            name='site',
+            field=models.ForeignKey(help_text='Site du conducteur, copié pour les listes par site', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.site'),
+        ),
+        migrations.AddField(
+            model_name='echeanceevaluation',
+            name='type_evaluation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='suivi_conducteurs.typologieevaluation'),
+        ),
+        migrations.AddIndex(
+            model_name='echeanceevaluation',
+            index=models.Index(fields=['date_echeance'], name='echeance_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='echeanceevaluation',
+            index=models.Index(fields=['site', 'date_echeance'], name='echeance_site_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='echeanceevaluation',
+            index=models.Index(fields=['evaluateur', 'date_echeance'], name='echeance_evaluateur_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='echeanceevaluation',
+            constraint=models.UniqueConstraint(fields=('conducteur', 'type_evaluation'), name='echeance_evaluation_unique'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suivi_conducteurs', '0007_echeances_evaluations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlerteScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_evaluation', models.DateField(help_text="Date de l'évaluation, copiée pour le tri des alertes")),
+                ('score', models.FloatField()),
+                ('score_precedent', models.FloatField(blank=True, null=True)),
+                ('sous_seuil', models.BooleanField(default=False)),
+                ('en_baisse', models.BooleanField(default=False)),
+                ('traitee', models.BooleanField(default=False, verbose_name='Traitée')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('evaluation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='alerte', to='suivi_conducteurs.evaluation')),
+                ('evaluation_precedente', models.ForeignKey(blank=True, help_text='Évaluation précédente du conducteur pour ce type, base de la baisse', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='suivi_conducteurs.evaluation')),
+            ],
+            options={
+                'verbose_name': 'Alerte de score',
+                'verbose_name_plural': 'Alertes de score',
+                'indexes': [models.Index(fields=['traitee', '-date_evaluation', '-id'], name='alerte_traitee_date_idx'), models.Index(fields=['-date_evaluation', '-id'], name='alerte_date_idx')],
+            },
+        ),
+    ]
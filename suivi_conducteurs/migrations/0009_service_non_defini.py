@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def creer_service_non_defini(apps, schema_editor):
+    """Service des profils sans service connu, présent dans toute base (gestion_groupes.signals)"""
+    Service = apps.get_model('suivi_conducteurs', 'Service')
+    Service.objects.using(schema_editor.connection.alias).get_or_create(
+        nom='Non défini', defaults={'abreviation': 'ND'},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suivi_conducteurs', '0008_alertes_scores'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_service_non_defini, migrations.RunPython.noop),
+    ]
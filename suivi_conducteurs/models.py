@@ -1,15 +1,38 @@
 # suivi_conducteurs/models.py
-from django.db import models, transaction
+from django.db import connections, models, transaction
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 from django.contrib.auth.models import User
+from django.db.models.functions import Concat, Upper
 from gestion_groupes.config import get_groupes_evaluateurs
 
 # ==============================================
 # MANAGERS DÉFINIS DANS LE MÊME FICHIER
 # ==============================================
 
-class ConducteurManager(models.Manager):
+class ConducteurQuerySet(models.QuerySet):
+    def avec_statistiques_evaluations(self):
+        """Conducteurs annotés du nombre d'évaluations et de l'id de la dernière"""
+        derniere = Evaluation.objects.filter(
+            conducteur=models.OuterRef('pk')
+        ).order_by('-date_evaluation', '-id').values('pk')[:1]
+        return self.annotate(
+            nb_evaluations=models.Count('evaluation'),
+            derniere_evaluation_id=models.Subquery(derniere),
+        )
+
+    def nom_commencant_par(self, recherche):
+        """Conducteurs dont le nom commence par recherche, sans tenir compte de la casse.
+        Intervalle [RECHERCHE, RECHERCHE + dernier caractère Unicode[ plutôt que LIKE :
+        parcours de l'index conducteur_actif_nom_maj_idx (majuscules calculées par la base)"""
+        prefixe = Upper(models.Value(recherche))
+        return self.annotate(nom_majuscule=Upper('salnom')).filter(
+            nom_majuscule__gte=prefixe,
+            nom_majuscule__lt=Concat(prefixe, models.Value(chr(0x10FFFF))),
+        ).order_by('nom_majuscule', 'salnom2')
+
+
+class ConducteurManager(models.Manager.from_queryset(ConducteurQuerySet)):
     def get_queryset(self):
         return super().get_queryset().select_related(
             'salsocid',
@@ -48,7 +71,17 @@ class EvaluateurManager(models.Manager):
             user__groups__name__in=groupes_autorises
         ).distinct()
 
-class EvaluationManager(models.Manager):
+class EvaluationQuerySet(models.QuerySet):
+    def avec_score(self):
+        """Évaluations annotées des sommes utilisées par calculate_score (sans requête par évaluation)"""
+        notes_valides = models.Q(notes__valeur__isnull=False, notes__critere__actif=True)
+        return self.annotate(
+            somme_notes=models.Sum('notes__valeur', filter=notes_valides),
+            somme_maxi=models.Sum('notes__critere__valeur_maxi', filter=notes_valides),
+        )
+
+
+class EvaluationManager(models.Manager.from_queryset(EvaluationQuerySet)):
     def get_queryset(self):
         return super().get_queryset().select_related(
             'conducteur__salsocid',
@@ -72,6 +105,10 @@ class EvaluationManager(models.Manager):
         return self.filter(
             date_evaluation__range=[date_debut, date_fin]
         )
+    
+    def statistiques_par_evaluateur(self, mois=None):
+        """Statistiques groupées par évaluateur, lues dans les cumuls mensuels"""
+        return CumulEvaluateurCritere.objects.statistiques_par_evaluateur(mois)
 
 class NoteManager(models.Manager):
     def get_queryset(self):
@@ -221,6 +258,14 @@ class Conducteur(models.Model):
         verbose_name = "Conducteur"
         verbose_name_plural = "Conducteurs"
         ordering = ['salnom','salnom2']
+        indexes = [
+            # Listes de conducteurs actifs triées par nom
+            models.Index(fields=['salnom', 'salnom2'], condition=models.Q(salactif=True), name='conducteur_actif_nom_idx'),
+            # Recherche par début de nom, insensible à la casse (sélecteur de conducteur)
+            models.Index(Upper('salnom'), 'salnom2', condition=models.Q(salactif=True), name='conducteur_actif_nom_maj_idx'),
+            # Conducteurs (actifs) d'un site
+            models.Index(fields=['site', 'salactif'], name='conducteur_site_actif_idx'),
+        ]
 
 class Evaluateur(models.Model):
     """Utilisateur effectuant l'évaluation d'un conducteur"""
@@ -300,6 +345,10 @@ class TypologieEvaluation(models.Model):
     nom = models.CharField(max_length=255, verbose_name="Nom")
     abreviation = models.CharField(max_length=10, verbose_name="Abréviation")
     description = models.TextField(verbose_name="Description")
+    frequence_jours = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name="Fréquence (jours)",
+        help_text="Délai entre deux évaluations d'un conducteur actif ; vide : pas de réévaluation planifiée",
+    )
 
     def __str__(self):
         return f"{self.nom}"
@@ -343,6 +392,10 @@ class CritereEvaluation(models.Model):
         verbose_name = "Critère d'évaluation"
         verbose_name_plural = "Critères d'évaluation"
         ordering = ['numero_ordre']
+        indexes = [
+            # Critères actifs d'un type d'évaluation, dans l'ordre d'affichage
+            models.Index(fields=['type_evaluation', 'numero_ordre'], condition=models.Q(actif=True), name='critere_actif_type_idx'),
+        ]
 
 class Evaluation(models.Model):
     """Session de notation regroupant toutes les notes d'un conducteur par un évaluateur à une date donnée"""
@@ -371,6 +424,12 @@ class Evaluation(models.Model):
 
     def calculate_score(self):
         """Version optimisée du calcul de score"""
+        # Sommes calculées en base par Evaluation.objects.avec_score()
+        if hasattr(self, 'somme_notes'):
+            if not self.somme_maxi:
+                return None
+            return round((self.somme_notes / self.somme_maxi) * 100, 1)
+
         # Utiliser les notes préchargées si disponibles
         if hasattr(self, '_prefetched_objects_cache') and 'notes' in self._prefetched_objects_cache:
             notes = [note for note in self.notes.all() 
@@ -424,7 +483,10 @@ class Evaluation(models.Model):
         ordering = ['-date_evaluation']
         indexes = [
             models.Index(fields=['date_evaluation']),
-            models.Index(fields=['conducteur']),
+            # Évaluations d'un conducteur, la plus récente d'abord (remplace l'index sur conducteur seul)
+            models.Index(fields=['conducteur', '-date_evaluation'], name='evaluation_cond_date_idx'),
+            # Dernière évaluation d'un conducteur pour un type (échéances, baisses de score)
+            models.Index(fields=['conducteur', 'type_evaluation', '-date_evaluation'], name='evaluation_cond_type_date_idx'),
             models.Index(fields=['type_evaluation']),
         ]
         
@@ -479,6 +541,256 @@ class Note(models.Model):
             models.Index(fields=['evaluation', 'critere']),
         ]
 
+class IncrementsQuerySet(models.QuerySet):
+    def incrementer(self, lignes, creer=()):
+        """
+        Ajoute des incréments aux lignes repérées par la contrainte d'unicité du modèle :
+        une instruction INSERT ... ON CONFLICT DO UPDATE par lot, quel que soit le nombre
+        de lignes. lignes : {valeurs des champs de la contrainte: {champ: incrément}}.
+        Seules les clés de creer sont créées au besoin : un retrait sans ligne (critère
+        en cours de suppression...) n'a rien à corriger. Renvoie le nombre de lignes écrites.
+        """
+        lignes = {cle: increments for cle, increments in lignes.items() if any(increments.values())}
+        contrainte, = [contrainte for contrainte in self.model._meta.constraints if isinstance(contrainte, models.UniqueConstraint)]
+        cles = [self.model._meta.get_field(nom) for nom in contrainte.fields]
+        retraits = [cle for cle in lignes if cle not in creer]
+        if retraits:
+            existantes = set(self.filter(**{
+                f'{champ.attname}__in': {cle[i] for cle in retraits} for i, champ in enumerate(cles)
+            }).values_list(*[champ.attname for champ in cles]))
+            lignes = {cle: increments for cle, increments in lignes.items() if cle in creer or cle in existantes}
+        if not lignes:
+            return 0
+
+        connexion = connections[self.db]
+        nom = connexion.ops.quote_name
+        table = nom(self.model._meta.db_table)
+        champs = [self.model._meta.get_field(champ) for champ in next(iter(lignes.values()))]
+        colonnes = cles + champs
+        sql = (
+            f'INSERT INTO {table} ({", ".join(nom(champ.column) for champ in colonnes)}) VALUES {{}} '
+            f'ON CONFLICT ({", ".join(nom(champ.column) for champ in cles)}) DO UPDATE SET '
+            + ', '.join(f'{nom(champ.column)} = {table}.{nom(champ.column)} + excluded.{nom(champ.column)}' for champ in champs)
+        )
+        valeurs = [
+            [
+                champ.get_db_prep_save(valeur, connexion)
+                for champ, valeur in zip(colonnes, (*cle, *(increments.get(champ.name, 0) for champ in champs)))
+            ]
+            for cle, increments in lignes.items()
+        ]
+        marqueurs = f'({", ".join(["%s"] * len(colonnes))})'
+        taille = connexion.ops.bulk_batch_size(colonnes, valeurs)
+        with connexion.cursor() as cursor:
+            for debut in range(0, len(valeurs), taille):
+                lot = valeurs[debut:debut + taille]
+                cursor.execute(sql.format(', '.join([marqueurs] * len(lot))), [valeur for ligne in lot for valeur in ligne])
+        return len(valeurs)
+
+class StatistiquesPaireCriteres(models.Model):
+    """
+    Statistiques suffisantes des notes de deux critères renseignées dans une même
+    évaluation (critere_a <= critere_b ; le couple (c, c) porte celles du critère seul).
+    Tenues à jour au commit des évaluations écrites (voir fiabilite.py).
+    """
+    critere_a = models.ForeignKey(CritereEvaluation, on_delete=models.CASCADE, related_name='+')
+    critere_b = models.ForeignKey(CritereEvaluation, on_delete=models.CASCADE, related_name='+')
+    nombre = models.IntegerField(default=0, help_text="Évaluations notées sur les deux critères")
+    somme_a = models.BigIntegerField(default=0)
+    somme_b = models.BigIntegerField(default=0)
+    somme_carres_a = models.BigIntegerField(default=0)
+    somme_carres_b = models.BigIntegerField(default=0)
+    somme_produits = models.BigIntegerField(default=0)
+
+    objects = IncrementsQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.critere_a_id} × {self.critere_b_id} ({self.nombre})"
+
+    class Meta:
+        verbose_name = "Statistiques d'un couple de critères"
+        verbose_name_plural = "Statistiques des couples de critères"
+        constraints = [
+            models.UniqueConstraint(fields=['critere_a', 'critere_b'], name='stats_paire_criteres_unique'),
+            models.CheckConstraint(condition=models.Q(critere_a__lte=models.F('critere_b')), name='stats_paire_criteres_ordre'),
+        ]
+
+# ==============================================
+# CUMULS MENSUELS (tenus à jour par cumuls.py)
+# ==============================================
+
+class CumulQuerySet(IncrementsQuerySet):
+    def depuis(self, mois):
+        return self if mois is None else self.filter(mois__gte=mois)
+
+class CumulEvaluateurQuerySet(CumulQuerySet):
+    def evaluations_par_evaluateur(self, mois=None):
+        """Nombre d'évaluations par évaluateur et site, depuis le mois donné"""
+        return self.depuis(mois).order_by().values('evaluateur', 'site').annotate(
+            nombre=models.Sum('nombre_evaluations'),
+        )
+
+    def statistiques_par_evaluateur(self, mois=None):
+        """Effectif et somme des notes par évaluateur, site et critère, depuis le mois donné"""
+        return self.depuis(mois).order_by().values('evaluateur', 'site', 'critere').annotate(
+            nombre=models.Sum('nombre_notes'),
+            somme=models.Sum('somme_notes'),
+        )
+
+class CumulEvaluateur(models.Model):
+    """Évaluations réalisées par un évaluateur sur un site, par mois"""
+    mois = models.DateField(help_text="Premier jour du mois")
+    evaluateur = models.ForeignKey(Evaluateur, on_delete=models.CASCADE, related_name='+')
+    site = models.ForeignKey(Site, on_delete=models.CASCADE, related_name='+')
+    nombre_evaluations = models.IntegerField(default=0)
+
+    objects = CumulEvaluateurQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Cumul mensuel d'un évaluateur"
+        verbose_name_plural = "Cumuls mensuels des évaluateurs"
+        constraints = [
+            models.UniqueConstraint(fields=['mois', 'evaluateur', 'site'], name='cumul_evaluateur_unique'),
+        ]
+
+class CumulEvaluateurCritere(models.Model):
+    """Notes renseignées par un évaluateur sur un site, par mois et par critère"""
+    mois = models.DateField(help_text="Premier jour du mois")
+    evaluateur = models.ForeignKey(Evaluateur, on_delete=models.CASCADE, related_name='+')
+    site = models.ForeignKey(Site, on_delete=models.CASCADE, related_name='+')
+    critere = models.ForeignKey(CritereEvaluation, on_delete=models.CASCADE, related_name='+')
+    nombre_notes = models.IntegerField(default=0)
+    somme_notes = models.BigIntegerField(default=0)
+
+    objects = CumulEvaluateurQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Cumul mensuel d'un évaluateur par critère"
+        verbose_name_plural = "Cumuls mensuels des évaluateurs par critère"
+        constraints = [
+            models.UniqueConstraint(fields=['mois', 'evaluateur', 'site', 'critere'], name='cumul_evaluateur_critere_unique'),
+        ]
+
+class CumulSiteQuerySet(CumulQuerySet):
+    def evaluations_par_mois(self, mois=None):
+        """Nombre d'évaluations par mois, site et société, depuis le mois donné"""
+        return self.depuis(mois).order_by().values('mois', 'site', 'societe').annotate(
+            nombre=models.Sum('nombre_evaluations'),
+        )
+
+    def scores_par_mois(self, mois=None):
+        """Somme des notes et des maxima des critères actifs par mois, site et société, depuis le mois donné"""
+        return self.depuis(mois).filter(critere__actif=True).order_by().values('mois', 'site', 'societe').annotate(
+            somme=models.Sum('somme_notes'),
+            maxi=models.Sum(models.F('nombre_notes') * models.F('critere__valeur_maxi')),
+        )
+
+class CumulSite(models.Model):
+    """Évaluations des conducteurs d'un site et d'une société, par mois et par type"""
+    mois = models.DateField(help_text="Premier jour du mois")
+    site = models.ForeignKey(Site, on_delete=models.CASCADE, related_name='+')
+    societe = models.ForeignKey(Societe, to_field='socid', on_delete=models.CASCADE, related_name='+')
+    type_evaluation = models.ForeignKey(TypologieEvaluation, on_delete=models.CASCADE, related_name='+')
+    nombre_evaluations = models.IntegerField(default=0)
+
+    objects = CumulSiteQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Cumul mensuel d'un site"
+        verbose_name_plural = "Cumuls mensuels des sites"
+        constraints = [
+            models.UniqueConstraint(fields=['mois', 'site', 'societe', 'type_evaluation'], name='cumul_site_unique'),
+        ]
+
+class CumulSiteCritere(models.Model):
+    """Notes des conducteurs d'un site et d'une société, par mois, par type et par critère"""
+    mois = models.DateField(help_text="Premier jour du mois")
+    site = models.ForeignKey(Site, on_delete=models.CASCADE, related_name='+')
+    societe = models.ForeignKey(Societe, to_field='socid', on_delete=models.CASCADE, related_name='+')
+    type_evaluation = models.ForeignKey(TypologieEvaluation, on_delete=models.CASCADE, related_name='+')
+    critere = models.ForeignKey(CritereEvaluation, on_delete=models.CASCADE, related_name='+')
+    nombre_notes = models.IntegerField(default=0)
+    somme_notes = models.BigIntegerField(default=0)
+
+    objects = CumulSiteQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Cumul mensuel d'un site par critère"
+        verbose_name_plural = "Cumuls mensuels des sites par critère"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['mois', 'site', 'societe', 'type_evaluation', 'critere'], name='cumul_site_critere_unique',
+            ),
+        ]
+
+# ==============================================
+# ÉCHÉANCES (tenues à jour par echeances.py)
+# ==============================================
+
+class EcheanceEvaluation(models.Model):
+    """Prochaine évaluation due d'un conducteur actif pour un type d'évaluation à fréquence définie"""
+    conducteur = models.ForeignKey(Conducteur, on_delete=models.CASCADE, related_name='echeances')
+    type_evaluation = models.ForeignKey(TypologieEvaluation, on_delete=models.CASCADE, related_name='+')
+    site = models.ForeignKey(
+        Site, on_delete=models.CASCADE, related_name='+', help_text="Site du conducteur, copié pour les listes par site",
+    )
+    evaluateur = models.ForeignKey(
+        Evaluateur, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        help_text="Auteur de la dernière évaluation",
+    )
+    derniere_evaluation = models.DateField(null=True, blank=True)
+    date_echeance = models.DateField(verbose_name="Échéance")
+
+    class Meta:
+        verbose_name = "Échéance d'évaluation"
+        verbose_name_plural = "Échéances d'évaluation"
+        constraints = [
+            models.UniqueConstraint(fields=['conducteur', 'type_evaluation'], name='echeance_evaluation_unique'),
+        ]
+        indexes = [
+            # Listes « en retard / bientôt dues » : toutes, par site, par évaluateur
+            models.Index(fields=['date_echeance'], name='echeance_date_idx'),
+            models.Index(fields=['site', 'date_echeance'], name='echeance_site_date_idx'),
+            models.Index(fields=['evaluateur', 'date_echeance'], name='echeance_evaluateur_date_idx'),
+        ]
+
+# ==============================================
+# ALERTES (tenues à jour par alertes.py)
+# ==============================================
+
+class AlerteScore(models.Model):
+    """Évaluation dont le score est sous le seuil, ou en baisse sur l'évaluation précédente du même type"""
+    evaluation = models.OneToOneField(Evaluation, on_delete=models.CASCADE, related_name='alerte')
+    evaluation_precedente = models.ForeignKey(
+        Evaluation, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        help_text="Évaluation précédente du conducteur pour ce type, base de la baisse",
+    )
+    date_evaluation = models.DateField(help_text="Date de l'évaluation, copiée pour le tri des alertes")
+    score = models.FloatField()
+    score_precedent = models.FloatField(null=True, blank=True)
+    sous_seuil = models.BooleanField(default=False)
+    en_baisse = models.BooleanField(default=False)
+    traitee = models.BooleanField(default=False, verbose_name="Traitée")
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Alerte de score"
+        verbose_name_plural = "Alertes de score"
+        indexes = [
+            # Liste paginée (ouvertes / traitées, les plus récentes d'abord) et compteur du tableau de bord
+            models.Index(fields=['traitee', '-date_evaluation', '-id'], name='alerte_traitee_date_idx'),
+            models.Index(fields=['-date_evaluation', '-id'], name='alerte_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Alerte {self.score} % ({self.date_evaluation})"
+
+    @property
+    def baisse(self):
+        if self.score_precedent is None:
+            return None
+        return round(self.score_precedent - self.score, 1)
+
 # ==============================================
 # POST-TRAITEMENT DES MANAGERS 
 # ==============================================
@@ -0,0 +1,121 @@
+# suivi_conducteurs/scores.py
+"""
+Historique des scores d'un conducteur par type d'évaluation, avec moyennes
+mobiles sur les dernières évaluations. Calculé en une requête (sommes des notes
+en base, comme Evaluation.objects.avec_score()) puis mis en cache par conducteur :
+signals.py efface l'entrée d'un conducteur à chaque écriture de ses évaluations
+ou de leurs notes, et change la version des critères (clé de toutes les entrées)
+quand un critère est modifié.
+"""
+import time
+
+from .models import Conducteur, Evaluation
+from .tableau_de_bord import cache_partage
+
+# Moyennes mobiles calculées, en nombre d'évaluations
+FENETRES = (3, 6)
+
+# Les entrées sont effacées à l'écriture, l'expiration ne libère que les conducteurs inactifs
+DUREE_CACHE = 24 * 3600
+
+CLE_VERSION_CRITERES = 'scores:version_criteres'
+
+# Dimensions (unités SVG) des courbes : viewBox de conducteur_detail.html
+LARGEUR_TRACE = 300
+HAUTEUR_TRACE = 80
+
+
+def cle_cache(conducteur_id):
+    return f'scores:conducteur:{conducteur_id}:{cache_partage().get(CLE_VERSION_CRITERES)}'
+
+
+def invalider(conducteur_id):
+    cache_partage().delete(cle_cache(conducteur_id))
+
+
+def invalider_tous():
+    """Critère modifié (maximum, activation) : tous les scores sont à recalculer"""
+    cache_partage().set(CLE_VERSION_CRITERES, time.time_ns(), timeout=None)
+
+
+def moyennes_mobiles(valeurs, fenetre):
+    """Moyenne des fenetre dernières valeurs à chaque rang, None tant que la fenêtre n'est pas pleine"""
+    moyennes = []
+    somme = 0
+    for rang, valeur in enumerate(valeurs):
+        somme += valeur
+        if rang >= fenetre:
+            somme -= valeurs[rang - fenetre]
+        moyennes.append(round(somme / fenetre, 1) if rang >= fenetre - 1 else None)
+    return moyennes
+
+
+def calculer(conducteur_id):
+    """Séries des scores du conducteur par type, de la plus ancienne évaluation à la plus récente"""
+    lignes = Evaluation.objects.filter(conducteur_id=conducteur_id).avec_score().order_by(
+        'date_evaluation', 'id',
+    ).values_list('id', 'date_evaluation', 'type_evaluation_id', 'type_evaluation__nom', 'somme_notes', 'somme_maxi')
+    if not lignes and not Conducteur.objects.filter(pk=conducteur_id).exists():
+        return None
+
+    types = {}
+    for evaluation_id, date_evaluation, type_id, type_nom, somme_notes, somme_maxi in lignes:
+        type_evaluation = types.setdefault(type_id, {'id': type_id, 'nom': type_nom, 'nombre': 0, 'points': []})
+        type_evaluation['nombre'] += 1
+        # Évaluations sans note complète : comptées, mais sans point sur la courbe
+        if somme_maxi:
+            type_evaluation['points'].append({
+                'evaluation': evaluation_id,
+                'date': date_evaluation.isoformat(),
+                'score': round(somme_notes / somme_maxi * 100, 1),
+            })
+
+    for type_evaluation in types.values():
+        points = type_evaluation['points']
+        valeurs = [point['score'] for point in points]
+        for fenetre in FENETRES:
+            for point, moyenne in zip(points, moyennes_mobiles(valeurs, fenetre)):
+                point[f'moyenne_{fenetre}'] = moyenne
+
+    return {
+        'conducteur': conducteur_id,
+        'fenetres': list(FENETRES),
+        'types': sorted(types.values(), key=lambda type_evaluation: type_evaluation['nom']),
+    }
+
+
+def scores_conducteur(conducteur_id):
+    """Séries du conducteur (voir calculer), None s'il n'existe pas ; sans requête si elles sont en cache"""
+    cle = cle_cache(conducteur_id)
+    serie = cache_partage().get(cle)
+    if serie is None:
+        serie = calculer(conducteur_id)
+        if serie is not None:
+            cache_partage().set(cle, serie, timeout=DUREE_CACHE)
+    return serie
+
+
+def trace(points, champ):
+    """Coordonnées SVG (polyline) d'une série, de 0 à 100 % sur la hauteur"""
+    pas = LARGEUR_TRACE / (len(points) - 1) if len(points) > 1 else 0
+    return ' '.join(
+        f'{rang * pas:.1f},{HAUTEUR_TRACE - point[champ] / 100 * HAUTEUR_TRACE:.1f}'
+        for rang, point in enumerate(points)
+        if point[champ] is not None
+    )
+
+
+def avec_traces(serie):
+    """Types de la série complétés des courbes et des trois derniers scores, pour conducteur_detail"""
+    types = []
+    for type_evaluation in serie['types']:
+        points = type_evaluation['points']
+        types.append({
+            **type_evaluation,
+            'derniers_scores': [point['score'] for point in reversed(points[-3:])],
+            'traces': {
+                'score': trace(points, 'score'),
+                **{f'moyenne_{fenetre}': trace(points, f'moyenne_{fenetre}') for fenetre in FENETRES},
+            },
+        })
+    return types
@@ -0,0 +1,281 @@
+# suivi_conducteurs/signals.py
+from functools import partial
+
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from configurations.metriques import EVALUATIONS_SOUMISES
+
+from . import alertes, au_commit, cumuls, echeances, fiabilite, instantane, scores, tableau_de_bord
+from .models import CritereEvaluation, Evaluateur, Evaluation
+
+
+def au_commit_une_fois(fonction, *args):
+    """fonction(*args) au commit, une seule fois par transaction quel que soit le nombre d'écritures"""
+    au_commit.une_fois((fonction, args), fonction, *args)
+
+
+@receiver([post_save, post_delete], sender='suivi_conducteurs.Evaluation')
+@receiver([post_save, post_delete], sender='suivi_conducteurs.Note')
+@receiver([post_save, post_delete], sender='suivi_conducteurs.Conducteur')
+@receiver([post_save, post_delete], sender='suivi_conducteurs.CritereEvaluation')
+@receiver([post_save, post_delete], sender='gestion_groupes.HistoriqueGroupes')
+@receiver([post_save, post_delete], sender='suivi_conducteurs.AlerteScore')
+def signaler_changement_tableau_de_bord(sender, **kwargs):
+    """Publie le changement une fois la transaction validée (sinon le flux relirait l'ancien état)"""
+    au_commit_une_fois(tableau_de_bord.signaler_changement)
+
+
+@receiver([post_save, post_delete], sender='suivi_conducteurs.Evaluation')
+@receiver([post_save, post_delete], sender='suivi_conducteurs.Note')
+@receiver([post_save, post_delete], sender='suivi_conducteurs.Conducteur')
+@receiver([post_save, post_delete], sender='suivi_conducteurs.CritereEvaluation')
+def invalider_instantane_notes(sender, created=False, **kwargs):
+    """Les créations sont lues en delta (notes d'id supérieur) ; modifications et suppressions
+    rendent l'instantané des notes inexact"""
+    if not created:
+        au_commit_une_fois(instantane.signaler_modification)
+
+
+# ---------------------------------------------------------------------------
+# Statistiques et cumuls des évaluations : une écriture par évaluation et par
+# transaction. L'état d'une évaluation (clé des cumuls, notes renseignées) est lu
+# avant sa première écriture, puis relu au commit : les incréments de l'un à
+# l'autre sont écrits ensemble, quel que soit le nombre de notes enregistrées.
+# ---------------------------------------------------------------------------
+
+def cle_ecritures(evaluation_id):
+    return ('ecritures_evaluation', evaluation_id)
+
+
+def etat_evaluation(evaluation_id):
+    return cumuls.cle_evaluation(evaluation_id), fiabilite.notes_evaluation(evaluation_id)
+
+
+# État d'une évaluation qui n'existait pas avant la transaction
+ETAT_VIDE = (None, {})
+
+
+def etat_avant(evaluation_id):
+    """État d'une évaluation avant l'écriture, None si elle est déjà suivie dans la transaction"""
+    if evaluation_id is None or au_commit.en_attente(cle_ecritures(evaluation_id)):
+        return None
+    return etat_evaluation(evaluation_id)
+
+
+def suivre_evaluation(evaluation_id, avant):
+    if evaluation_id is not None:
+        au_commit.une_fois(cle_ecritures(evaluation_id), ecrire_evaluation, evaluation_id, avant)
+
+
+def evaluations_suivies():
+    """Évaluations dont l'écriture est en attente du commit de la transaction courante"""
+    return au_commit.cles_en_attente('ecritures_evaluation')
+
+
+def ecrire_evaluation(evaluation_id, avant):
+    """
+    Au commit : si une autre transaction écrit la même évaluation entre ce commit et la
+    relecture, rebuild_criteria_statistics et rebuild_monthly_rollups rétablissent les totaux
+    """
+    with transaction.atomic():
+        apres = etat_evaluation(evaluation_id)
+        fiabilite.evaluation_modifiee(avant[1], apres[1])
+        cumuls.evaluation_modifiee(avant, apres)
+
+
+@receiver(pre_save, sender='suivi_conducteurs.Note')
+def memoriser_note(sender, instance, raw=False, **kwargs):
+    """État enregistré d'une note modifiée, et celui de ses évaluations avant la première écriture"""
+    instance._etat_precedent = None
+    instance._etats_evaluations = {}
+    if raw:
+        return
+    if not instance._state.adding and instance.pk:
+        instance._etat_precedent = sender.objects.filter(pk=instance.pk).values_list(
+            'evaluation_id', 'critere_id', 'valeur',
+        ).first()
+    # Note déplacée : les deux évaluations changent
+    evaluations = {instance.evaluation_id, instance._etat_precedent and instance._etat_precedent[0]}
+    instance._etats_evaluations = {evaluation_id: etat_avant(evaluation_id) for evaluation_id in evaluations - {None}}
+
+
+@receiver(post_save, sender='suivi_conducteurs.Note')
+def mettre_a_jour_statistiques_note(sender, instance, raw=False, **kwargs):
+    if not raw:
+        for evaluation_id, avant in instance._etats_evaluations.items():
+            suivre_evaluation(evaluation_id, avant)
+
+
+@receiver(pre_delete, sender='suivi_conducteurs.Note')
+def suivre_note_supprimee(sender, instance, origin=None, **kwargs):
+    # Critère supprimé : ses couples et ses cumuls partent avec lui, le reste ne change pas
+    if origin is None or getattr(origin, 'model', type(origin)) is not CritereEvaluation:
+        suivre_evaluation(instance.evaluation_id, etat_avant(instance.evaluation_id))
+
+
+@receiver(pre_save, sender='suivi_conducteurs.Evaluation')
+def memoriser_cle_evaluation(sender, instance, raw=False, **kwargs):
+    instance._cle_precedente = instance._conducteur_precedent = instance._etat_avant = None
+    if not raw and not instance._state.adding and instance.pk:
+        instance._etat_avant = etat_avant(instance.pk)
+        instance._cle_precedente = (
+            instance._etat_avant[0] if instance._etat_avant else cumuls.cle_evaluation(instance.pk)
+        )
+        instance._conducteur_precedent = sender.objects.filter(pk=instance.pk).values_list(
+            'conducteur_id', flat=True,
+        ).first()
+
+
+@receiver(post_save, sender='suivi_conducteurs.Evaluation')
+def mettre_a_jour_cumuls_evaluation(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        # Création : notes écrites ensuite, une à une ou en bulk_create, et lues au commit
+        suivre_evaluation(instance.pk, ETAT_VIDE if created else instance._etat_avant)
+
+
+@receiver(pre_delete, sender='suivi_conducteurs.Evaluation')
+def retirer_evaluation_cumuls(sender, instance, **kwargs):
+    suivre_evaluation(instance.pk, etat_avant(instance.pk))
+
+
+def invalider_scores(*conducteurs):
+    """Historique des scores effacé du cache une fois la transaction validée, une fois par conducteur"""
+    for conducteur_id in set(conducteurs) - {None}:
+        au_commit_une_fois(scores.invalider, conducteur_id)
+
+
+def conducteur_evaluation(evaluation_id):
+    return Evaluation.objects.filter(pk=evaluation_id).values_list('conducteur_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender='suivi_conducteurs.Evaluation')
+def invalider_scores_evaluation(sender, instance, **kwargs):
+    """Conducteur de l'évaluation, et ancien conducteur d'une évaluation réattribuée"""
+    invalider_scores(instance.conducteur_id, getattr(instance, '_conducteur_precedent', None))
+
+
+@receiver(post_save, sender='suivi_conducteurs.Note')
+def invalider_scores_note(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    conducteurs = [
+        instance.evaluation.conducteur_id if sender.evaluation.is_cached(instance)
+        else conducteur_evaluation(instance.evaluation_id)
+    ]
+    precedent = getattr(instance, '_etat_precedent', None)
+    if precedent and precedent[0] != instance.evaluation_id:
+        conducteurs.append(conducteur_evaluation(precedent[0]))
+    invalider_scores(*conducteurs)
+
+
+@receiver(pre_delete, sender='suivi_conducteurs.Note')
+def invalider_scores_note_supprimee(sender, instance, origin=None, **kwargs):
+    """
+    Suppression en cascade (évaluation, conducteur, critère...) : déjà couverte par
+    la suppression de l'évaluation ou le changement de critère
+    """
+    if origin is not None and getattr(origin, 'model', type(origin)) is not sender:
+        return
+    invalider_scores(conducteur_evaluation(instance.evaluation_id))
+
+
+@receiver([post_save, post_delete], sender='suivi_conducteurs.CritereEvaluation')
+def invalider_scores_criteres(sender, **kwargs):
+    au_commit_une_fois(scores.invalider_tous)
+
+
+@receiver(post_save, sender='suivi_conducteurs.Evaluation')
+def mettre_a_jour_echeance_evaluation(sender, instance, raw=False, **kwargs):
+    """Échéance du conducteur pour ce type (et de l'ancien couple d'une évaluation réattribuée)"""
+    if raw:
+        return
+    couple_precedent = None
+    if instance._cle_precedente:
+        couple_precedent = (instance._conducteur_precedent, instance._cle_precedente['type_evaluation_id'])
+    echeances.evaluation_enregistree(instance, couple_precedent)
+
+
+@receiver(post_delete, sender='suivi_conducteurs.Evaluation')
+def mettre_a_jour_echeance_evaluation_supprimee(sender, instance, origin=None, **kwargs):
+    """
+    Suppression en cascade d'un conducteur, d'un type ou d'un site : leurs échéances
+    partent avec eux (et ne doivent pas être recréées)
+    """
+    if origin is not None and getattr(origin, 'model', type(origin)) not in (Evaluation, Evaluateur):
+        return
+    echeances.evaluation_enregistree(instance)
+
+
+@receiver(post_save, sender='suivi_conducteurs.Evaluation')
+def verifier_alerte_evaluation(sender, instance, raw=False, **kwargs):
+    """
+    Vérifiée au commit : submit_evaluation et les inlines de l'admin écrivent les
+    notes après l'évaluation, dans la même transaction
+    """
+    if not raw:
+        au_commit_une_fois(alertes.evaluation_enregistree, instance.pk)
+
+
+@receiver(post_save, sender='suivi_conducteurs.Note')
+def verifier_alerte_note(sender, instance, created, raw=False, **kwargs):
+    """Note modifiée seule (les créations accompagnent l'enregistrement de leur évaluation)"""
+    if not raw and not created:
+        au_commit_une_fois(alertes.evaluation_enregistree, instance.evaluation_id)
+
+
+@receiver(post_delete, sender='suivi_conducteurs.Evaluation')
+def verifier_alerte_evaluation_supprimee(sender, instance, origin=None, **kwargs):
+    """Suppression d'un conducteur ou d'un type : les évaluations suivantes partent aussi"""
+    if origin is not None and getattr(origin, 'model', type(origin)) not in (Evaluation, Evaluateur):
+        return
+    transaction.on_commit(partial(
+        alertes.evaluation_supprimee,
+        instance.conducteur_id, instance.type_evaluation_id, instance.date_evaluation, instance.pk,
+    ))
+
+
+@receiver([post_save, post_delete], sender='suivi_conducteurs.AlerteScore')
+def invalider_nombre_alertes(sender, **kwargs):
+    au_commit_une_fois(alertes.invalider_nombre)
+
+
+@receiver(pre_save, sender='suivi_conducteurs.Conducteur')
+def memoriser_affectation_conducteur(sender, instance, raw=False, **kwargs):
+    instance._affectation_precedente = None
+    instance._actif_precedent = False
+    if not raw and not instance._state.adding and instance.pk:
+        precedent = sender.objects.filter(pk=instance.pk).values_list('site_id', 'salsocid_id', 'salactif').first()
+        if precedent:
+            instance._affectation_precedente = precedent[:2]
+            instance._actif_precedent = precedent[2]
+
+
+@receiver(post_save, sender='suivi_conducteurs.Conducteur')
+def deplacer_cumuls_conducteur(sender, instance, raw=False, **kwargs):
+    """Un conducteur changé de site ou de société emporte ses évaluations dans les cumuls de sa nouvelle affectation"""
+    if not raw:
+        cumuls.conducteur_enregistre(instance, instance._affectation_precedente, evaluations_suivies())
+
+
+@receiver(post_save, sender='suivi_conducteurs.Conducteur')
+def mettre_a_jour_echeances_conducteur(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        site_precedent = instance._affectation_precedente[0] if instance._affectation_precedente else None
+        echeances.conducteur_enregistre(instance, created, instance._actif_precedent, site_precedent)
+
+
+@receiver(m2m_changed, sender=Group.user_set.through)
+def signaler_changement_groupes(sender, action, **kwargs):
+    """L'historique des groupes est écrit en bulk_create, sans post_save : on suit le m2m"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        au_commit_une_fois(tableau_de_bord.signaler_changement)
+
+
+@receiver(post_save, sender='suivi_conducteurs.Evaluation')
+def compter_evaluation_soumise(sender, created, **kwargs):
+    """Débit de saisie des évaluations (métrique suivi_evaluations_submitted_total)"""
+    if created:
+        transaction.on_commit(EVALUATIONS_SOUMISES.inc)
@@ -0,0 +1,85 @@
+# suivi_conducteurs/tableau_de_bord.py
+import time
+from datetime import date
+
+from django.core.cache import caches
+from django.urls import reverse
+
+# Jeton de version partagé par tous les processus : il change à chaque
+# modification d'une Evaluation, d'une Note, d'un Conducteur ou de l'historique des groupes
+CLE_VERSION = 'tableau_de_bord:version'
+
+
+def cache_partage():
+    return caches['partage']
+
+
+def signaler_changement():
+    """Marque les données du tableau de bord comme modifiées"""
+    cache_partage().set(CLE_VERSION, time.time_ns(), timeout=None)
+
+
+def get_version():
+    """Version courante des données du tableau de bord (None si jamais modifiées)"""
+    return cache_partage().get(CLE_VERSION)
+
+
+async def aget_version():
+    """Version courante des données du tableau de bord (None si jamais modifiées)"""
+    return await cache_partage().aget(CLE_VERSION)
+
+
+def statistiques(user):
+    """Compteurs du tableau de bord selon les permissions de l'utilisateur"""
+    from . import alertes
+    from .models import Conducteur, Evaluation
+
+    peut_voir_evaluations = user.has_perm('suivi_conducteurs.view_evaluation')
+    return {
+        'total_conducteurs': Conducteur.objects.filter(salactif=True).count() if user.has_perm('suivi_conducteurs.view_conducteur') else 0,
+        'total_evaluations': Evaluation.objects.count() if peut_voir_evaluations else 0,
+        'evaluations_ce_mois': Evaluation.objects.filter(
+            date_evaluation__gte=date.today().replace(day=1)
+        ).count() if peut_voir_evaluations else 0,
+        'alertes_ouvertes': alertes.nombre_ouvertes() if peut_voir_evaluations else 0,
+    }
+
+
+def evaluations_recentes(user, limite=5):
+    """Dernières évaluations (si permission), notes préchargées pour le calcul du score"""
+    from .models import Evaluation
+
+    if not user.has_perm('suivi_conducteurs.view_evaluation'):
+        return []
+    return list(
+        Evaluation.objects.select_related(
+            'conducteur__site', 'evaluateur', 'type_evaluation'
+        ).prefetch_related('notes__critere').order_by('-date_evaluation', '-id')[:limite]
+    )
+
+
+def serialiser_evaluation(evaluation):
+    """Représentation JSON d'une ligne du tableau des évaluations récentes"""
+    return {
+        'id': evaluation.pk,
+        'date': evaluation.date_evaluation.isoformat(),
+        'conducteur': evaluation.conducteur.nom_complet,
+        'site': evaluation.conducteur.site.nom_commune,
+        'type': evaluation.type_evaluation.nom,
+        'type_abreviation': evaluation.type_evaluation.abreviation,
+        'score': evaluation.calculate_score(),
+        'evaluateur': evaluation.evaluateur.nom_complet,
+        'url': reverse('suivi_conducteurs:evaluation_detail', args=[evaluation.pk]),
+    }
+
+
+def activites_recentes(user, limite=5):
+    return [serialiser_evaluation(evaluation) for evaluation in evaluations_recentes(user, limite)]
+
+
+def etat_tableau_de_bord(user):
+    """État complet poussé par le flux SSE ; le flux n'envoie que les clefs modifiées"""
+    etat = statistiques(user)
+    etat['groupes'] = sorted(user.groups.values_list('name', flat=True))
+    etat['activites'] = activites_recentes(user)
+    return etat
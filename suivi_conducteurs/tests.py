@@ -1,3 +1,913 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from configurations import metriques
+from configurations.performance import MesurePerformanceMiddleware
+
+from . import alertes, analytics, cumuls, echeances, fiabilite, instantane, scores, tableau_de_bord
+from .models import (
+    AlerteScore, Conducteur, CritereEvaluation, CumulEvaluateur, CumulEvaluateurCritere, EcheanceEvaluation,
+    Evaluateur, Evaluation, Note,
+    Service, Site, Societe, StatistiquesPaireCriteres, TypologieEvaluation,
+)
+
+# Caches en mémoire : les tests n'écrivent pas dans cache/ du projet
+CACHES_TESTS = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'tests-{alias}'}
+    for alias in ('default', 'sessions', 'partage')
+}
+
+# Instantané des notes propre aux tests (absent tant qu'un test ne le construit pas)
+INSTANTANE_TESTS = os.path.join(tempfile.mkdtemp(prefix='tests-instantane-'), 'notes.snapshot')
+
+
+class NombreRequetesConstantMixin:
+    """
+    Vérifie qu'une page exécute le même nombre de requêtes SQL, fixé par vue,
+    pour un petit et un grand jeu de données : O(1) en nombre de lignes.
+
+    Les classes de test définissent REQUETES (nombre attendu par route),
+    peupler(nombre), qui ajoute des données et renvoie les objets à utiliser
+    dans les URL, et routes(objets), qui renvoie des (nom, url) ou, pour un
+    formulaire envoyé en POST, des (nom, url, données). Les rappels au commit
+    sont exécutés et comptés avec la requête.
+    """
+
+    PETIT = 2
+    GRAND = 8
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'motdepasse')
+        self.client.force_login(self.admin)
+
+    def compter_requetes(self, url, donnees=None):
+        # Première requête non mesurée (en GET, sans effet pour un POST) : caches et session chauds
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as requetes, self.captureOnCommitCallbacks(execute=True):
+            if donnees is None:
+                response = self.client.get(url)
+            else:
+                response = self.client.post(url, donnees)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200 if donnees is None else 302, url)
+        return [requete['sql'] for requete in requetes.captured_queries]
+
+    def mesurer(self, nombre):
+        return {nom: self.compter_requetes(*route) for nom, *route in self.routes(self.peupler(nombre))}
+
+    def test_nombre_requetes_independant_du_volume(self):
+        petit = self.mesurer(self.PETIT)
+        grand = self.mesurer(self.GRAND - self.PETIT)
+        for nom, attendu in self.REQUETES.items():
+            with self.subTest(vue=nom):
+                self.assertEqual(
+                    len(petit[nom]), len(grand[nom]),
+                    f'{nom} : {len(petit[nom])} requêtes avec le petit jeu de données, '
+                    f'{len(grand[nom])} avec le grand\n' + '\n'.join(grand[nom]),
+                )
+                self.assertEqual(
+                    len(grand[nom]), attendu,
+                    f'{nom} : {len(grand[nom])} requêtes au lieu de {attendu}\n' + '\n'.join(grand[nom]),
+                )
+
+
+def changelists(app_label):
+    """Nom et URL de la liste d'administration de chaque modèle enregistré de l'application"""
+    return [
+        (f'admin:{model._meta.model_name}', reverse(f'admin:{app_label}_{model._meta.model_name}_changelist'))
+        for model in admin.site._registry
+        if model._meta.app_label == app_label
+    ]
+
+
+@override_settings(CACHES=CACHES_TESTS, NOTES_SNAPSHOT_PATH=INSTANTANE_TESTS)
+class RequetesSuiviConducteursTests(NombreRequetesConstantMixin, TestCase):
+    """Nombre de requêtes des vues, API et listes d'administration de suivi_conducteurs"""
+
+    REQUETES = {
+        'suivi_conducteurs:dashboard': 12,
+        'suivi_conducteurs:evaluation_list': 9,
+        'suivi_conducteurs:evaluation_detail': 10,
+        'suivi_conducteurs:create_evaluation': 10,
+        'suivi_conducteurs:load_criteres_htmx': 3,
+        'suivi_conducteurs:rechercher_conducteurs_htmx': 2,
+        'suivi_conducteurs:conducteur_list': 10,
+        'suivi_conducteurs:conducteur_detail': 10,
+        'suivi_conducteurs:conducteur_scores': 1,
+        'suivi_conducteurs:societe_list': 9,
+        'suivi_conducteurs:site_list': 11,
+        'suivi_conducteurs:statistiques': 17,
+        'suivi_conducteurs:fiabilite_criteres': 9,
+        'suivi_conducteurs:calibrage_evaluateurs': 10,
+        'suivi_conducteurs:echeances': 11,
+        'suivi_conducteurs:alertes_scores': 7,
+        'suivi_conducteurs:alertes_scores:toutes': 8,
+        'suivi_conducteurs:submit_evaluation': 24,
+        'recent_activities': 3,
+        'admin:site': 5,
+        'admin:societe': 5,
+        'admin:service': 4,
+        'admin:conducteur': 7,
+        'admin:evaluateur': 5,
+        'admin:typologieevaluation': 4,
+        'admin:critereevaluation': 5,
+        'admin:evaluation': 5,
+        'admin:note': 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.types = []
+        with cls.captureOnCommitCallbacks(execute=True):
+            for nom, abreviation in (('Conduite', 'CON'), ('Comportement', 'COMP')):
+                type_evaluation = TypologieEvaluation.objects.create(
+                    nom=nom, abreviation=abreviation, description=nom, frequence_jours=180,
+                )
+                for i in range(3):
+                    CritereEvaluation.objects.create(
+                        nom=f'{nom} {i}', type_evaluation=type_evaluation, valeur_mini=1, valeur_maxi=5,
+                    )
+                cls.types.append(type_evaluation)
+        cls.service = Service.objects.create(nom='Exploitation', abreviation='EXP')
+        cls.groupe, _ = Group.objects.get_or_create(name='Exploitation')
+        cls.numero = 0
+
+    def peupler(self, nombre):
+        """Ajoute nombre sites, sociétés, évaluateurs et conducteurs, chacun avec nombre évaluations"""
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.ajouter(nombre)
+
+    def ajouter(self, nombre):
+        dernier = {}
+        for _ in range(nombre):
+            self.__class__.numero += 1
+            n = self.numero
+            site = Site.objects.create(nom_commune=f'Commune {n}', code_postal=f'{n:05d}')
+            societe = Societe.objects.create(
+                socid=n, socnom=f'Société {n}', soccode=f'S{n}', soccp=f'{n:05d}', socvillib1=f'Ville {n}',
+            )
+            user = User.objects.create_user(f'evaluateur{n}', first_name='Eva', last_name=f'Luateur {n}')
+            user.groups.add(self.groupe)
+            user.profil.service = self.service
+            user.profil.save()
+            evaluateur = Evaluateur.objects.create(nom=f'Luateur {n}', prenom='Eva', user=user)
+            conducteur = Conducteur.objects.create(
+                salnom=f'Conducteur {n}', salnom2='Jean', salsocid=societe, site=site,
+                interim_p=n % 2 == 0, sous_traitant_p=n % 3 == 0,
+            )
+            for i in range(nombre):
+                type_evaluation = self.types[i % len(self.types)]
+                evaluation = Evaluation.objects.create(
+                    date_evaluation=date(2024, 1, 1) + timedelta(days=i), evaluateur=evaluateur,
+                    conducteur=conducteur, type_evaluation=type_evaluation,
+                )
+                # Notes en bulk_create : statistiques, cumuls et alertes calculés au commit
+                Note.objects.bulk_create([
+                    Note(evaluation=evaluation, critere=critere, valeur=1 + (i + critere.pk) % 5)
+                    for critere in type_evaluation.critereevaluation_set.all()
+                ])
+            dernier = {'conducteur': conducteur, 'evaluateur': evaluateur, 'evaluation': evaluation}
+        return dernier
+
+    def routes(self, objets):
+        return [
+            ('suivi_conducteurs:dashboard', reverse('suivi_conducteurs:dashboard')),
+            ('suivi_conducteurs:evaluation_list', reverse('suivi_conducteurs:evaluation_list')),
+            ('suivi_conducteurs:create_evaluation', reverse('suivi_conducteurs:create_evaluation')),
+            ('suivi_conducteurs:load_criteres_htmx',
+             reverse('suivi_conducteurs:load_criteres_htmx') + f'?type_evaluation={self.types[0].pk}'),
+            ('suivi_conducteurs:rechercher_conducteurs_htmx',
+             reverse('suivi_conducteurs:rechercher_conducteurs_htmx') + '?q=cond'),
+            ('suivi_conducteurs:conducteur_list', reverse('suivi_conducteurs:conducteur_list')),
+            ('suivi_conducteurs:societe_list', reverse('suivi_conducteurs:societe_list')),
+            ('suivi_conducteurs:site_list', reverse('suivi_conducteurs:site_list')),
+            ('suivi_conducteurs:statistiques', reverse('suivi_conducteurs:statistiques')),
+            ('suivi_conducteurs:fiabilite_criteres', reverse('suivi_conducteurs:fiabilite_criteres')),
+            ('suivi_conducteurs:calibrage_evaluateurs', reverse('suivi_conducteurs:calibrage_evaluateurs') + '?periode=0'),
+            ('suivi_conducteurs:echeances', reverse('suivi_conducteurs:echeances') + '?horizon=60'),
+            ('suivi_conducteurs:alertes_scores', reverse('suivi_conducteurs:alertes_scores')),
+            ('suivi_conducteurs:alertes_scores:toutes', reverse('suivi_conducteurs:alertes_scores') + '?statut=toutes'),
+            ('recent_activities', reverse('recent_activities')),
+        ] + changelists('suivi_conducteurs') + [
+            ('suivi_conducteurs:evaluation_detail',
+             reverse('suivi_conducteurs:evaluation_detail', args=[objets['evaluation'].pk])),
+            ('suivi_conducteurs:conducteur_detail',
+             reverse('suivi_conducteurs:conducteur_detail', args=[objets['conducteur'].pk])),
+            ('suivi_conducteurs:conducteur_scores',
+             reverse('suivi_conducteurs:conducteur_scores', args=[objets['conducteur'].pk])),
+            ('suivi_conducteurs:submit_evaluation', reverse('suivi_conducteurs:submit_evaluation'), {
+                'conducteur': objets['conducteur'].pk,
+                'evaluateur': objets['evaluateur'].pk,
+                'type_evaluation': self.types[0].pk,
+                **{f'note_{critere.pk}': 4 for critere in self.types[0].critereevaluation_set.all()},
+            }),
+        ]
+
+
+class EvaluationsTestCase(TestCase):
+    """
+    Jeu de données commun : un type d'évaluation, un site, une société, un conducteur et un
+    évaluateur. Chaque classe ajoute les siens dans donnees(), écrites comme le reste dans
+    setUpTestData avec leurs rappels au commit exécutés (caches, statistiques)
+    """
+
+    FREQUENCE_JOURS = None
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.type_evaluation = TypologieEvaluation.objects.create(
+                nom='Conduite', abreviation='CON', description='Conduite', frequence_jours=cls.FREQUENCE_JOURS,
+            )
+            cls.site = Site.objects.create(nom_commune='Brest', code_postal='29200')
+            cls.societe = Societe.objects.create(
+                socid=1, socnom='Kenavo', soccode='K', soccp='29200', socvillib1='Brest',
+            )
+            cls.conducteur = Conducteur.objects.create(
+                salnom='Le Goff', salnom2='Yann', salsocid=cls.societe, site=cls.site,
+            )
+            cls.evaluateur = Evaluateur.objects.create(nom='Luateur', prenom='Eva')
+            cls.donnees()
+
+    @classmethod
+    def donnees(cls):
+        pass
+
+    @classmethod
+    def creer_evaluation(cls, jour, **champs):
+        champs = {'evaluateur': cls.evaluateur, 'conducteur': cls.conducteur, **champs}
+        return Evaluation.objects.create(date_evaluation=jour, type_evaluation=cls.type_evaluation, **champs)
+
+
+@override_settings(CACHES=CACHES_TESTS, NOTES_SNAPSHOT_PATH=INSTANTANE_TESTS)
+class AnalyticsTests(EvaluationsTestCase):
+    """Le moteur vectorisé et l'instantané donnent les mêmes scores que calculate_score"""
+
+    @classmethod
+    def donnees(cls):
+        cls.criteres = [
+            CritereEvaluation.objects.create(
+                nom=f'Critère {i}', type_evaluation=cls.type_evaluation, valeur_mini=1, valeur_maxi=3 + i,
+            )
+            for i in range(3)
+        ]
+        CritereEvaluation.objects.filter(pk=cls.criteres[2].pk).update(actif=False)
+        for i in range(7):
+            cls.evaluer(date(2024, 1, 1) + timedelta(days=i), [
+                None if i == j else 1 + (i * j) % 3 for j in range(len(cls.criteres))
+            ])
+
+    @classmethod
+    def evaluer(cls, jour, valeurs):
+        evaluation = cls.creer_evaluation(jour)
+        Note.objects.bulk_create([
+            Note(evaluation=evaluation, critere=critere, valeur=valeur)
+            for critere, valeur in zip(cls.criteres, valeurs)
+        ])
+        return evaluation
+
+    def test_scores_identiques_a_calculate_score(self):
+        attendus = [evaluation.calculate_score() for evaluation in Evaluation.objects.order_by('pk')]
+        scores = analytics.ColonnesNotes.charger().scores_evaluations()
+
+        self.assertEqual(scores['score'].tolist(), [score for score in attendus if score is not None])
+        stats = analytics.statistiques_par_type(analytics.ColonnesNotes.charger())[self.type_evaluation.pk]
+        self.assertEqual(stats['count'], len(scores['score']))
+        self.assertAlmostEqual(stats['moyenne'], sum(scores['score']) / len(scores['score']), places=1)
+
+    def test_instantane_et_notes_ajoutees(self):
+        self.addCleanup(lambda: os.path.exists(INSTANTANE_TESTS) and os.remove(INSTANTANE_TESTS))
+        instantane.construire()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evaluer(date(2024, 2, 1), [2, 3, 1])
+
+        def scores(colonnes):
+            resultat = colonnes.scores_evaluations()
+            return dict(zip(resultat['evaluation_id'].tolist(), resultat['score'].tolist()))
+
+        self.assertTrue(instantane.est_exact(instantane.instantane_courant()))
+        self.assertEqual(scores(instantane.colonnes_notes()), scores(analytics.ColonnesNotes.charger()))
+        self.assertEqual(
+            analytics.statistiques_par_critere(instantane.colonnes_notes()),
+            analytics.statistiques_par_critere(analytics.ColonnesNotes.charger()),
+        )
+
+        # Une note déjà capturée modifiée : l'instantané est ignoré jusqu'à reconstruction
+        note = Note.objects.filter(valeur__isnull=False).order_by('pk').first()
+        note.valeur = 3
+        with self.captureOnCommitCallbacks(execute=True):
+            note.save()
+        self.assertFalse(instantane.est_exact(instantane.instantane_courant()))
+        self.assertEqual(scores(instantane.colonnes_notes()), scores(analytics.ColonnesNotes.charger()))
+        self.assertIsNotNone(instantane.raison_reconstruction())
+
+    def test_changement_publie_une_fois_par_transaction(self):
+        with mock.patch.object(tableau_de_bord, 'signaler_changement') as signaler_changement, \
+                self.captureOnCommitCallbacks(execute=True):
+            evaluation = self.creer_evaluation(date(2024, 3, 1))
+            for critere in self.criteres:
+                Note.objects.create(evaluation=evaluation, critere=critere, valeur=2)
+        signaler_changement.assert_called_once_with()
+
+
+class LectureColonnesTests(TestCase):
+    """Chargement des colonnes hors transaction : une transaction de lecture, sans verrou d'écriture"""
+
+    def test_transaction_differee(self):
+        instructions = []
+
+        def charger():
+            # Nouveau fil : connexion hors du bloc atomic du test
+            try:
+                with CaptureQueriesContext(connection) as requetes:
+                    analytics.ColonnesNotes.charger()
+                instructions.extend(requete['sql'] for requete in requetes)
+            finally:
+                connection.close()
+
+        fil = threading.Thread(target=charger)
+        fil.start()
+        fil.join()
+        self.assertEqual(instructions[0], 'BEGIN DEFERRED')
+        self.assertEqual(instructions[-1], 'COMMIT')
+        self.assertEqual(len(instructions), 5)
+
+class FiabiliteTests(EvaluationsTestCase):
+    """Statistiques des couples de critères tenues à jour au commit des évaluations écrites, rapport de fiabilité"""
+
+    NOTES = [(1, 2, 2), (2, 3, 3), (3, 3, 5), (4, 5, 4), (5, 4, 5), (2, 2, 1)]
+
+    @classmethod
+    def donnees(cls):
+        cls.criteres = [
+            CritereEvaluation.objects.create(
+                nom=f'Critère {i}', type_evaluation=cls.type_evaluation, valeur_mini=1, valeur_maxi=5,
+            )
+            for i in range(3)
+        ]
+        cls.evaluations = []
+        for i, valeurs in enumerate(cls.NOTES):
+            evaluation = cls.creer_evaluation(date(2024, 1, 1) + timedelta(days=i))
+            for critere, valeur in zip(cls.criteres, valeurs):
+                Note.objects.create(evaluation=evaluation, critere=critere, valeur=valeur)
+            cls.evaluations.append(evaluation)
+
+    def statistiques(self):
+        return sorted(StatistiquesPaireCriteres.objects.values_list('critere_a', 'critere_b', *fiabilite.CHAMPS))
+
+    def test_mise_a_jour_incrementale_identique_a_la_reconstruction(self):
+        # Une transaction par écriture, puis plusieurs écritures d'une évaluation dans une transaction
+        note = Note.objects.get(evaluation=self.evaluations[0], critere=self.criteres[1])
+        note.valeur = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            note.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Note.objects.filter(evaluation=self.evaluations[1], critere=self.criteres[2]).get().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            Note.objects.filter(evaluation=self.evaluations[2], critere__in=self.criteres[:2]).delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evaluations[3].delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            note = Note.objects.get(evaluation=self.evaluations[4], critere=self.criteres[0])
+            note.valeur = 1
+            note.save()
+            note.evaluation = self.evaluations[5]
+            note.critere = self.criteres[2]
+            Note.objects.filter(evaluation=self.evaluations[5], critere=self.criteres[2]).delete()
+            note.save()
+            Note.objects.create(evaluation=self.evaluations[4], critere=self.criteres[0], valeur=3)
+
+        incrementales = self.statistiques()
+        fiabilite.reconstruire()
+        self.assertEqual(incrementales, self.statistiques())
+
+    def test_alpha_de_cronbach(self):
+        rapport, = fiabilite.rapports()
+        # Alpha classique calculé sur les notes complètes
+        k = len(self.criteres)
+        colonnes = list(zip(*self.NOTES))
+
+        def variance(valeurs):
+            moyenne = sum(valeurs) / len(valeurs)
+            return sum((valeur - moyenne) ** 2 for valeur in valeurs) / (len(valeurs) - 1)
+
+        attendu = k / (k - 1) * (1 - sum(map(variance, colonnes)) / variance([sum(ligne) for ligne in self.NOTES]))
+        self.assertAlmostEqual(rapport['alpha'], attendu, places=2)
+        self.assertEqual(rapport['matrice'][0]['cellules'][0]['r'], 1.0)
+        self.assertEqual(len(rapport['criteres']), k)
+
+
+class CumulsTests(EvaluationsTestCase):
+    """Cumuls mensuels tenus à jour à l'écriture, identiques à la reconstruction"""
+
+    @classmethod
+    def donnees(cls):
+        cls.criteres = [
+            CritereEvaluation.objects.create(
+                nom=f'Critère {i}', type_evaluation=cls.type_evaluation, valeur_mini=1, valeur_maxi=4,
+            )
+            for i in range(2)
+        ]
+        cls.sites = [cls.site, Site.objects.create(nom_commune='Quimper', code_postal='29000')]
+        cls.societes = [
+            cls.societe,
+            Societe.objects.create(socid=2, socnom='Trugarez', soccode='T', soccp='29000', socvillib1='Quimper'),
+        ]
+        cls.conducteurs = [
+            cls.conducteur,
+            Conducteur.objects.create(salnom='Le Bihan', salnom2='Anna', salsocid=cls.societe, site=cls.site),
+        ]
+        # Le premier évaluateur met 4/4, le sévère 2/4, sur le même site
+        cls.evaluateurs = [cls.evaluateur, Evaluateur.objects.create(nom='Sévère', prenom='Eva')]
+        cls.evaluations = []
+        for i in range(10):
+            evaluation = cls.creer_evaluation(
+                date(2024, 1 + i % 3, 1 + i), evaluateur=cls.evaluateurs[i % 2], conducteur=cls.conducteurs[i % 2],
+            )
+            for critere in cls.criteres:
+                Note.objects.create(evaluation=evaluation, critere=critere, valeur=4 if i % 2 == 0 else 2)
+            cls.evaluations.append(evaluation)
+
+    def cumuls(self):
+        return {
+            modele.__name__: sorted(
+                ligne for ligne in modele.objects.values_list(
+                    *[champ.attname for champ in modele._meta.concrete_fields if champ.name != 'id']
+                )
+                # Lignes vidées par les retraits (dernier cumul à 0) : absentes après reconstruction
+                if ligne[-1]
+            )
+            for modele in cumuls.MODELES
+        }
+
+    def test_mise_a_jour_incrementale_identique_a_la_reconstruction(self):
+        note = self.evaluations[0].notes.first()
+        note.valeur = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            note.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evaluations[1].notes.last().delete()
+        evaluation = self.evaluations[2]
+        evaluation.date_evaluation = date(2024, 6, 15)
+        evaluation.evaluateur = self.evaluateurs[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            evaluation.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evaluations[3].delete()
+        conducteur = self.conducteurs[1]
+        conducteur.site = self.sites[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            conducteur.save()
+        # Évaluation et conducteur modifiés dans la même transaction : déplacée une seule fois
+        conducteur = self.conducteurs[0]
+        conducteur.salsocid = self.societes[1]
+        evaluation = self.evaluations[4]
+        with self.captureOnCommitCallbacks(execute=True):
+            evaluation.notes.first().delete()
+            conducteur.save()
+            evaluation.date_evaluation = date(2024, 7, 1)
+            evaluation.save()
+
+        incrementaux = self.cumuls()
+        for mois in cumuls.mois_a_reconstruire():
+            cumuls.reconstruire_mois(mois)
+        self.assertEqual(incrementaux, self.cumuls())
+
+    def test_calibrage(self):
+        calibrage = cumuls.calibrage()
+        lignes = {ligne['evaluateur'].nom: ligne for ligne in calibrage['evaluateurs']}
+        self.assertEqual(lignes['Luateur']['nombre_evaluations'], 5)
+        self.assertEqual(lignes['Luateur']['score'], 100.0)
+        self.assertEqual(lignes['Sévère']['score'], 50.0)
+        # Moyenne du site : 75 %
+        self.assertEqual(lignes['Luateur']['ecart'], 25.0)
+        self.assertEqual(lignes['Sévère']['ecart'], -25.0)
+        grille, = calibrage['grilles']
+        self.assertTrue(all(cellule['signale'] for ligne in grille['lignes'] for cellule in ligne['cellules']))
+
+    def test_statistiques_par_evaluateur(self):
+        # 5 évaluations de 2 notes par évaluateur : 4/4 pour le premier, 2/4 pour le sévère
+        statistiques = {
+            (ligne['evaluateur'], ligne['critere']): (ligne['nombre'], ligne['somme'])
+            for ligne in Evaluation.objects.statistiques_par_evaluateur()
+        }
+        for critere in self.criteres:
+            self.assertEqual(statistiques[self.evaluateurs[0].pk, critere.pk], (5, 20))
+            self.assertEqual(statistiques[self.evaluateurs[1].pk, critere.pk], (5, 10))
+
+    def test_tendances(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            evaluation = self.creer_evaluation(date.today())
+            for critere, valeur in zip(self.criteres, (4, 2)):
+                Note.objects.create(evaluation=evaluation, critere=critere, valeur=valeur)
+
+        tendances = cumuls.tendances()
+        for serie in (tendances['site'][self.sites[0].pk], tendances['societe'][self.societes[0].socid]):
+            self.assertEqual(len(serie), cumuls.MOIS_TENDANCE)
+            self.assertEqual(serie[-1]['evaluations'], 1)
+            self.assertEqual(serie[-1]['score'], 75.0)
+        # Site sans évaluation : série vide
+        self.assertTrue(all(point['score'] is None for point in tendances['site'][self.sites[1].pk]))
+
+
+@override_settings(CACHES=CACHES_TESTS)
+class ScoresTests(EvaluationsTestCase):
+    """Historique des scores d'un conducteur : moyennes mobiles et invalidation du cache"""
+
+    SCORES = [100, 50, 75, 25, 100, 50, 75]
+
+    @classmethod
+    def donnees(cls):
+        cls.critere = CritereEvaluation.objects.create(
+            nom='Critère', type_evaluation=cls.type_evaluation, valeur_mini=0, valeur_maxi=4,
+        )
+        cls.notes = [
+            Note.objects.create(
+                evaluation=cls.creer_evaluation(date(2024, 1, 1) + timedelta(days=i)),
+                critere=cls.critere, valeur=score // 25,
+            )
+            for i, score in enumerate(cls.SCORES)
+        ]
+
+    def setUp(self):
+        # Le cache survit aux autres tests, dont les conducteurs ont les mêmes id
+        scores.invalider_tous()
+
+    def points(self):
+        type_evaluation, = scores.scores_conducteur(self.conducteur.pk)['types']
+        return type_evaluation['points']
+
+    def test_moyennes_mobiles(self):
+        points = self.points()
+        self.assertEqual([point['score'] for point in points], self.SCORES)
+        self.assertEqual([point['moyenne_3'] for point in points], [None, None, 75.0, 50.0, 66.7, 58.3, 75.0])
+        self.assertEqual(points[5]['moyenne_6'], 66.7)
+
+    def test_cache_invalide_par_les_ecritures(self):
+        self.points()
+        with self.assertNumQueries(0):
+            self.points()
+
+        note = self.notes[-1]
+        note.valeur = 0
+        with self.captureOnCommitCallbacks(execute=True):
+            note.save()
+        self.assertEqual(self.points()[-1]['score'], 0.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notes[0].evaluation.delete()
+        self.assertEqual(len(self.points()), len(self.SCORES) - 1)
+
+        self.critere.valeur_maxi = 8
+        with self.captureOnCommitCallbacks(execute=True):
+            self.critere.save()
+        self.assertEqual(self.points()[0]['score'], 25.0)
+
+    def test_invalidation_une_fois_par_transaction(self):
+        with mock.patch.object(scores, 'invalider', wraps=scores.invalider) as invalider, \
+                self.captureOnCommitCallbacks(execute=True):
+            for note in self.notes:
+                note.valeur = 1
+                note.save()
+        invalider.assert_called_once_with(self.conducteur.pk)
+
+    def test_invalidation_apres_rollback(self):
+        # Rappel enregistré dans un savepoint annulé : la nouvelle écriture le réenregistre
+        with mock.patch.object(scores, 'invalider') as invalider, \
+                self.captureOnCommitCallbacks(execute=True) as rappels:
+            with self.assertRaises(ValueError), transaction.atomic():
+                self.notes[0].valeur = 1
+                self.notes[0].save()
+                raise ValueError
+            self.notes[1].valeur = 1
+            self.notes[1].save()
+        invalider.assert_called_once_with(self.conducteur.pk)
+        self.assertEqual(len(rappels), 1)
+
+    def test_conducteur_inconnu(self):
+        self.assertIsNone(scores.scores_conducteur(self.conducteur.pk + 1))
+
+
+class EcheancesTests(EvaluationsTestCase):
+    """Échéances des évaluations : mise à jour à chaque écriture et recalcul en bloc"""
+
+    FREQUENCE_JOURS = 90
+
+    @classmethod
+    def donnees(cls):
+        # Sans fréquence : jamais d'échéance
+        TypologieEvaluation.objects.create(nom='Ponctuelle', abreviation='PON', description='')
+        cls.sites = [cls.site, Site.objects.create(nom_commune='Quimper', code_postal='29000')]
+
+    def echeance(self):
+        return EcheanceEvaluation.objects.get(conducteur=self.conducteur, type_evaluation=self.type_evaluation)
+
+    def evaluer(self, jour):
+        return self.creer_evaluation(jour)
+
+    def etat(self):
+        return sorted(EcheanceEvaluation.objects.values_list(
+            'conducteur_id', 'type_evaluation_id', 'site_id', 'evaluateur_id', 'derniere_evaluation', 'date_echeance',
+        ))
+
+    def test_nouveau_conducteur_du_a_son_entree(self):
+        echeance = self.echeance()
+        self.assertIsNone(echeance.derniere_evaluation)
+        self.assertEqual(echeance.date_echeance, echeances.date_entree(self.conducteur))
+        self.assertEqual(EcheanceEvaluation.objects.count(), 1)
+
+    def test_evaluations(self):
+        premiere = self.evaluer(date(2024, 1, 10))
+        self.evaluer(date(2024, 3, 1))
+        echeance = self.echeance()
+        self.assertEqual(echeance.derniere_evaluation, date(2024, 3, 1))
+        self.assertEqual(echeance.date_echeance, date(2024, 3, 1) + timedelta(days=90))
+        self.assertEqual(echeance.evaluateur, self.evaluateur)
+
+        # Une évaluation plus ancienne ne change pas l'échéance
+        premiere.date_evaluation = date(2024, 2, 1)
+        premiere.save()
+        self.assertEqual(self.echeance().derniere_evaluation, date(2024, 3, 1))
+
+        Evaluation.objects.get(date_evaluation=date(2024, 3, 1)).delete()
+        self.assertEqual(self.echeance().date_echeance, date(2024, 2, 1) + timedelta(days=90))
+
+    def test_conducteur_desactive_puis_change_de_site(self):
+        self.evaluer(date(2024, 1, 10))
+        self.conducteur.salactif = False
+        self.conducteur.save()
+        self.assertFalse(EcheanceEvaluation.objects.exists())
+
+        self.conducteur.salactif = True
+        self.conducteur.save()
+        self.assertEqual(self.echeance().derniere_evaluation, date(2024, 1, 10))
+
+        self.conducteur.site = self.sites[1]
+        self.conducteur.save()
+        self.assertEqual(self.echeance().site, self.sites[1])
+
+        self.conducteur.delete()
+        self.assertFalse(EcheanceEvaluation.objects.exists())
+
+    def test_recalcul_en_bloc_identique(self):
+        self.evaluer(date(2024, 1, 10))
+        self.evaluer(date(2024, 5, 1))
+        incremental = self.etat()
+        self.assertEqual(echeances.recalculer_type(self.type_evaluation), 1)
+        self.assertEqual(self.etat(), incremental)
+
+        # Fréquence retirée : échéances supprimées
+        self.type_evaluation.frequence_jours = None
+        self.type_evaluation.save()
+        self.assertEqual(echeances.recalculer_type(self.type_evaluation), 0)
+        self.assertFalse(EcheanceEvaluation.objects.exists())
+
+    def test_a_faire(self):
+        aujourd_hui = date(2024, 6, 1)
+        self.evaluer(aujourd_hui - timedelta(days=100))
+        liste, compteurs = echeances.a_faire(14, aujourd_hui=aujourd_hui)
+        self.assertEqual(list(liste), [self.echeance()])
+        self.assertEqual(compteurs, {'en_retard': 1, 'a_venir': 0})
+
+        self.evaluer(aujourd_hui - timedelta(days=80))
+        liste, compteurs = echeances.a_faire(14, aujourd_hui=aujourd_hui)
+        self.assertEqual(compteurs, {'en_retard': 0, 'a_venir': 1})
+        self.assertFalse(echeances.a_faire(7, aujourd_hui=aujourd_hui)[0].exists())
+        self.assertFalse(echeances.a_faire(14, site=self.sites[1].pk, aujourd_hui=aujourd_hui)[0].exists())
+        self.assertTrue(echeances.a_faire(14, evaluateur=self.evaluateur.pk, aujourd_hui=aujourd_hui)[0].exists())
+
+
+@override_settings(CACHES=CACHES_TESTS, ALERTES_SCORE_SEUIL=50, ALERTES_SCORE_BAISSE=15)
+class AlertesTests(EvaluationsTestCase):
+    """Alertes de score : seuil, baisse sur l'évaluation précédente du même type et badge"""
+
+    @classmethod
+    def donnees(cls):
+        cls.critere = CritereEvaluation.objects.create(
+            nom='Critère', type_evaluation=cls.type_evaluation, valeur_mini=0, valeur_maxi=4,
+        )
+
+    def setUp(self):
+        alertes.invalider_nombre()
+
+    def evaluer(self, jour, valeur):
+        """Évaluation et sa note dans une transaction, comme submit_evaluation"""
+        with self.captureOnCommitCallbacks(execute=True):
+            evaluation = self.creer_evaluation(jour)
+            Note.objects.create(evaluation=evaluation, critere=self.critere, valeur=valeur)
+        return evaluation
+
+    def test_seuil_et_baisse(self):
+        self.evaluer(date(2024, 1, 1), 4)
+        self.assertFalse(AlerteScore.objects.exists())
+
+        # 100 % puis 75 % : baisse de 25 points
+        deuxieme = self.evaluer(date(2024, 2, 1), 3)
+        alerte = deuxieme.alerte
+        self.assertEqual((alerte.score, alerte.score_precedent, alerte.baisse), (75.0, 100.0, 25.0))
+        self.assertTrue(alerte.en_baisse)
+        self.assertFalse(alerte.sous_seuil)
+
+        # 25 % : sous le seuil et en baisse de 50 points
+        troisieme = self.evaluer(date(2024, 3, 1), 1)
+        self.assertTrue(troisieme.alerte.sous_seuil)
+        self.assertEqual(troisieme.alerte.evaluation_precedente, deuxieme)
+
+    def test_mise_a_jour_et_suppression(self):
+        self.evaluer(date(2024, 1, 1), 4)
+        deuxieme = self.evaluer(date(2024, 2, 1), 3)
+        troisieme = self.evaluer(date(2024, 3, 1), 3)
+        self.assertFalse(AlerteScore.objects.filter(evaluation=troisieme).exists())
+
+        # Note corrigée : plus d'alerte pour la deuxième, la troisième baisse désormais de 25 points.
+        # Note et évaluation écrites ensemble : une seule vérification au commit
+        note = deuxieme.notes.get()
+        note.valeur = 4
+        with mock.patch.object(alertes, 'evaluation_enregistree', wraps=alertes.evaluation_enregistree) as verifier, \
+                self.captureOnCommitCallbacks(execute=True):
+            note.save()
+            deuxieme.save()
+        self.assertEqual(verifier.call_count, 1)
+        self.assertFalse(AlerteScore.objects.filter(evaluation=deuxieme).exists())
+        self.assertTrue(AlerteScore.objects.get(evaluation=troisieme).en_baisse)
+
+        # Deuxième supprimée : la troisième se compare à la première
+        with self.captureOnCommitCallbacks(execute=True):
+            deuxieme.delete()
+        self.assertEqual(AlerteScore.objects.get(evaluation=troisieme).score_precedent, 100.0)
+
+    def test_badge(self):
+        self.evaluer(date(2024, 1, 1), 1)
+        self.evaluer(date(2024, 2, 1), 0)
+        self.assertEqual(alertes.nombre_ouvertes(), 2)
+        with self.assertNumQueries(0):
+            alertes.nombre_ouvertes()
+
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'motdepasse')
+        self.client.force_login(admin)
+        alerte = AlerteScore.objects.earliest('date_evaluation')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('suivi_conducteurs:traiter_alerte', args=[alerte.pk]), {'statut': 'ouvertes'},
+            )
+        self.assertRedirects(response, reverse('suivi_conducteurs:alertes_scores') + '?statut=ouvertes')
+        self.assertEqual(alertes.nombre_ouvertes(), 1)
+
+
+
+class MetriquesTests(TestCase):
+    """/metrics : adresse autorisée et jeton exigés"""
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_jeton_exige(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer faux'}).status_code, 403)
+        self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer secret'}).status_code, 200)
+        # Adresse exacte : 127.0.0.10 n'est pas 127.0.0.1
+        self.assertEqual(
+            self.client.get(url, headers={'Authorization': 'Bearer secret'}, REMOTE_ADDR='127.0.0.10').status_code,
+            403,
+        )
+
+    def test_wrappers_apres_une_requete_sur_connexion_neuve(self):
+        """La connexion ouverte pendant la requête garde la mesure du verrou, pas le compteur de la requête"""
+        def vue(request):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return HttpResponse('ok')
+
+        wrappers = []
+
+        def requete():
+            # Nouveau fil : nouvelle connexion, ouverte par la première requête SQL de la vue
+            try:
+                MesurePerformanceMiddleware(vue)(RequestFactory().get('/mesure/'))
+                wrappers.extend(connection.execute_wrappers)
+            finally:
+                connection.close()
+
+        fil = threading.Thread(target=requete)
+        fil.start()
+        fil.join()
+        self.assertEqual(wrappers, [metriques.mesurer_verrou_sqlite])
+
+    @override_settings(METRICS_TOKEN='')
+    def test_ferme_sans_jeton_configure(self):
+        self.assertEqual(self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer '}).status_code, 403)
+
+
+@override_settings(PERFORMANCE_BUDGETS={'default': {'queries': 3}}, PERFORMANCE_N_PLUS_ONE_THRESHOLD=5)
+class PerformanceTests(TestCase):
+    """Mesure par vue : budget dépassé et requêtes N+1 journalisés par le logger 'performance'"""
+
+    def mesurer(self, nombre):
+        def vue(request):
+            for pk in range(nombre):
+                User.objects.filter(pk=pk).first()
+            return HttpResponse('ok')
+
+        with self.assertLogs('performance', 'WARNING') as journal:
+            MesurePerformanceMiddleware(vue)(RequestFactory().get('/mesure/'))
+        return [enregistrement.performance for enregistrement in journal.records]
+
+    def test_budget_et_n_plus_un(self):
+        budget, n_plus_un = self.mesurer(6)
+        self.assertEqual((budget['requetes'], budget['depassements']), (6, ['requetes']))
+        forme, = n_plus_un['formes_repetees']
+        self.assertEqual(forme['nombre'], 6)
+        self.assertIn('auth_user', forme['sql'])
+
+    async def test_vue_asynchrone(self):
+        """Vue asynchrone mesurée sans adaptation en thread, ses requêtes comptées"""
+        async def vue(request):
+            for pk in range(6):
+                await User.objects.filter(pk=pk).afirst()
+            return HttpResponse('ok')
+
+        middleware = MesurePerformanceMiddleware(vue)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with self.assertLogs('performance', 'WARNING') as journal:
+            response = await middleware(RequestFactory().get('/mesure/'))
+        self.assertEqual(response.content, b'ok')
+        budget, n_plus_un = [enregistrement.performance for enregistrement in journal.records]
+        self.assertEqual(budget['requetes'], 6)
+        self.assertEqual(n_plus_un['formes_repetees'][0]['nombre'], 6)
+
+    def test_sous_les_seuils(self):
+        with self.assertNoLogs('performance', 'WARNING'):
+            MesurePerformanceMiddleware(lambda request: HttpResponse('ok'))(RequestFactory().get('/mesure/'))
+
+
+class ConnexionSQLiteTests(TestCase):
+    """PRAGMA de SQLITE_PRAGMAS appliqués à la connexion (journal_mode non vérifiable : base de test en mémoire)"""
+
+    def test_pragmas(self):
+        attendus = {
+            'synchronous': {'OFF': 0, 'NORMAL': 1, 'FULL': 2, 'EXTRA': 3}[settings.SQLITE_PRAGMAS['synchronous']],
+            'busy_timeout': settings.SQLITE_PRAGMAS['busy_timeout'],
+            'cache_size': settings.SQLITE_PRAGMAS['cache_size'],
+            'temp_store': {'DEFAULT': 0, 'FILE': 1, 'MEMORY': 2}[settings.SQLITE_PRAGMAS['temp_store']],
+        }
+        with connection.cursor() as cursor:
+            for pragma, valeur in attendus.items():
+                cursor.execute(f'PRAGMA {pragma}')
+                self.assertEqual(cursor.fetchone()[0], valeur, pragma)
+
+
+# Le client du benchmark s'annonce comme localhost
+@override_settings(CACHES=CACHES_TESTS, NOTES_SNAPSHOT_PATH=INSTANTANE_TESTS, ALLOWED_HOSTS=['localhost'])
+class BenchTests(TestCase):
+    """Commande bench : rapport JSON par route et profil, régressions détectées par --compare"""
+
+    def setUp(self):
+        for nom in ('performance', 'django.request'):
+            self.addCleanup(logging.getLogger(nom).setLevel, logging.getLogger(nom).level)
+        self.dossier = tempfile.mkdtemp(prefix='tests-bench-')
+        self.addCleanup(shutil.rmtree, self.dossier)
+        User.objects.create_superuser('rh', 'rh@example.com', 'motdepasse').groups.add(Group.objects.create(name='RH'))
+
+    def bench(self, fichier, **options):
+        sortie = os.path.join(self.dossier, fichier)
+        call_command(
+            'bench', profile=['RH'], url=['site_list'], iterations=2, warmup=0, output=sortie, stdout=StringIO(),
+            **options,
+        )
+        with open(sortie, encoding='utf-8') as rapport:
+            return json.load(rapport)
+
+    def test_rapport_et_comparaison(self):
+        rapport = self.bench('reference.json')
+        mesure = rapport['resultats']['suivi_conducteurs:site_list|RH']
+        self.assertEqual(mesure['statut'], 200)
+        self.assertGreater(mesure['requetes'], 0)
+        self.assertEqual(set(mesure), {'statut', 'p50_ms', 'p95_ms', 'p99_ms', 'requetes', 'memoire_pic_ko', 'octets'})
+
+        # Référence avec une requête SQL de moins : la nouvelle exécution est une régression
+        mesure['requetes'] -= 1
+        reference = os.path.join(self.dossier, 'reference.json')
+        with open(reference, 'w', encoding='utf-8') as fichier:
+            json.dump(rapport, fichier)
+        with self.assertRaisesMessage(CommandError, 'régression'):
+            self.bench('courant.json', compare=reference, threshold=10_000)
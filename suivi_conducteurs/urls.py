@@ -22,6 +22,7 @@ urlpatterns = [
     # Conducteurs - NOUVELLES ROUTES
     path('conducteurs/', views.conducteur_list, name='conducteur_list'),
     path('conducteurs/<int:pk>/', views.conducteur_detail, name='conducteur_detail'),
+    path('conducteurs/<int:pk>/scores/', views.conducteur_scores, name='conducteur_scores'),
     
     # Sociétés - NOUVELLES ROUTES
     path('societes/', views.societe_list, name='societe_list'),
@@ -31,9 +32,19 @@ urlpatterns = [
     
     # Statistiques - NOUVELLE ROUTE
     path('statistiques/', views.statistiques_view, name='statistiques'),
+    path('statistiques/fiabilite/', views.fiabilite_criteres, name='fiabilite_criteres'),
+    path('statistiques/evaluateurs/', views.calibrage_evaluateurs, name='calibrage_evaluateurs'),
+
+    # Échéances des évaluations
+    path('echeances/', views.echeances_evaluations, name='echeances'),
+
+    # Alertes de score
+    path('alertes/', views.alertes_scores, name='alertes_scores'),
+    path('alertes/<int:pk>/traiter/', views.traiter_alerte, name='traiter_alerte'),
     
     # HTMX endpoints
     path('evaluations/load-criteres/', views.load_criteres_htmx, name='load_criteres_htmx'),
+    path('evaluations/conducteurs/', views.rechercher_conducteurs_htmx, name='rechercher_conducteurs_htmx'),
     path('evaluations/validate-field/', views.validate_field_htmx, name='validate_field_htmx'),
     #path('debug/', views.debug_data, name='debug_data'),
     #path('test-htmx/', views.test_htmx, name='test_htmx'),
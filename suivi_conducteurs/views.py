@@ -1,39 +1,59 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, Http404, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.db import transaction
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db.models import Avg, Sum, Count, Q
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.paginator import Paginator
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from django.db.models import Avg, Sum, Count, Q, F
+from asgiref.sync import sync_to_async
+from collections import defaultdict
 from datetime import date
+import asyncio
 import json
+import time
 
 from .models import (
     Conducteur, Evaluateur, TypologieEvaluation, 
-    CritereEvaluation, Evaluation, Note, Societe, Site, Service
+    CritereEvaluation, Evaluation, Note, Societe, Site, Service, CumulSite, AlerteScore
 )
 from .forms import EvaluationForm
+from . import alertes, analytics, cumuls, echeances, fiabilite, scores, tableau_de_bord
+
+# Sélecteur de conducteur : suggestions affichées et longueur minimale de la recherche
+RECHERCHE_CONDUCTEURS_LIMITE = 20
+RECHERCHE_CONDUCTEURS_LONGUEUR_MINI = 2
+
+# Périodes proposées par le calibrage des évaluateurs, en mois (0 : tout l'historique)
+PERIODES_CALIBRAGE = (3, 6, 12, 24, 0)
+
+# Échéances et alertes affichées par page
+ECHEANCES_PAR_PAGE = 50
+ALERTES_PAR_PAGE = 50
+
+# Filtres de la liste des alertes
+STATUTS_ALERTES = {
+    'ouvertes': Q(traitee=False),
+    'traitees': Q(traitee=True),
+    'toutes': Q(),
+}
 
 
 @login_required
 def dashboard(request):
     """Page d'accueil du module de suivi des conducteurs"""
-    from datetime import date, timedelta
-    
     # Statistiques rapides
-    total_conducteurs = Conducteur.objects.filter(salactif=True).count() if request.user.has_perm('suivi_conducteurs.view_conducteur') else 0
-    total_evaluations = Evaluation.objects.count() if request.user.has_perm('suivi_conducteurs.view_evaluation') else 0
-    evaluations_ce_mois = Evaluation.objects.filter(
-        date_evaluation__gte=date.today().replace(day=1)
-    ).count() if request.user.has_perm('suivi_conducteurs.view_evaluation') else 0
+    stats = tableau_de_bord.statistiques(request.user)
     
     # Évaluations récentes (si permission)
-    evaluations_recentes = []
-    if request.user.has_perm('suivi_conducteurs.view_evaluation'):
-        evaluations_recentes = Evaluation.objects.select_related(
-            'conducteur', 'evaluateur', 'type_evaluation'
-        ).order_by('-date_evaluation')[:5]
+    evaluations_recentes = tableau_de_bord.evaluations_recentes(request.user)
     
     # Vérifier si l'utilisateur peut créer des évaluations (logique métier)
     user_peut_evaluer = False
@@ -41,9 +61,10 @@ def dashboard(request):
         user_peut_evaluer = request.user.profil.peut_evaluer()
     
     context = {
-        'total_conducteurs': total_conducteurs,
-        'total_evaluations': total_evaluations,
-        'evaluations_ce_mois': evaluations_ce_mois,
+        'total_conducteurs': stats['total_conducteurs'],
+        'total_evaluations': stats['total_evaluations'],
+        'evaluations_ce_mois': stats['evaluations_ce_mois'],
+        'alertes_ouvertes': stats['alertes_ouvertes'],
         'evaluations_recentes': evaluations_recentes,
         'user': request.user,
         'user_peut_evaluer': user_peut_evaluer,
@@ -51,10 +72,72 @@ def dashboard(request):
     return render(request, 'suivi_conducteurs/dashboard.html', context)
 
 
+@login_required
+def recent_activities(request):
+    """API : évaluations récentes du tableau de bord (JSON)"""
+    return JsonResponse(tableau_de_bord.activites_recentes(request.user), safe=False)
+
+
+@login_required
+async def dashboard_stream(request):
+    """
+    Flux Server-Sent Events du tableau de bord, à servir sous ASGI
+    (configurations/asgi.py). Le flux ne relit la base que lorsque la version
+    partagée change (Evaluation, Note, Conducteur, HistoriqueGroupes) et
+    n'envoie que les clefs modifiées depuis le dernier envoi.
+    Sous WSGI, un seul état est envoyé puis le navigateur se reconnecte
+    après un délai, comme l'ancien rafraîchissement périodique.
+    """
+    user = await request.auser()
+    intervalle = settings.DASHBOARD_STREAM_INTERVAL
+    if isinstance(request, ASGIRequest):
+        duree_max = settings.DASHBOARD_STREAM_MAX_DURATION
+        reconnexion_ms = int(intervalle * 1000)
+    else:
+        duree_max = 0
+        reconnexion_ms = 30000
+
+    async def evenements():
+        yield f'retry: {reconnexion_ms}\n\n'
+        etat_precedent = {}
+        version_precedente = object()
+        debut = derniere_emission = time.monotonic()
+        while True:
+            version = await tableau_de_bord.aget_version()
+            if version != version_precedente:
+                version_precedente = version
+                etat = await sync_to_async(tableau_de_bord.etat_tableau_de_bord)(user)
+                delta = {cle: valeur for cle, valeur in etat.items() if etat_precedent.get(cle) != valeur}
+                etat_precedent = etat
+                if delta:
+                    yield f'event: dashboard\ndata: {json.dumps(delta, cls=DjangoJSONEncoder)}\n\n'
+                    derniere_emission = time.monotonic()
+
+            maintenant = time.monotonic()
+            if maintenant - debut >= duree_max:
+                return
+            if maintenant - derniere_emission >= 15:
+                # Commentaire SSE pour garder la connexion ouverte derrière un proxy
+                yield ': keepalive\n\n'
+                derniere_emission = maintenant
+            await asyncio.sleep(intervalle)
+
+    return StreamingHttpResponse(
+        evenements(),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @login_required
 def create_evaluation(request):
     """Vue principale pour créer une évaluation"""
-    conducteurs = Conducteur.objects.filter(salactif=True).select_related('salsocid', 'site')
+    # Le conducteur se choisit par recherche (rechercher_conducteurs_htmx) : la page ne
+    # charge que le conducteur éventuellement présélectionné, quelle que soit la flotte
+    conducteur_selectionne = None
+    conducteur_id = request.GET.get('conducteur')
+    if conducteur_id and conducteur_id.isdigit():
+        conducteur_selectionne = Conducteur.objects.filter(pk=conducteur_id, salactif=True).first()
     types_evaluation = TypologieEvaluation.objects.all()
 
     # Seul l'utilisateur connecté peut être évaluateur s'il en a le droit
@@ -69,7 +152,10 @@ def create_evaluation(request):
         
 
     context = {
-        'conducteurs': conducteurs,
+        'conducteur_selectionne': conducteur_selectionne,
+        'sites': Site.objects.only('nom_commune').order_by('nom_commune'),
+        'societes': Societe.objects.only('socid', 'socnom').order_by('socnom'),
+        'longueur_mini': RECHERCHE_CONDUCTEURS_LONGUEUR_MINI,
         'evaluateurs': evaluateurs,
         'types_evaluation': types_evaluation,
         'evaluateur_connecte': evaluateur_connecte,
@@ -79,48 +165,68 @@ def create_evaluation(request):
     return render(request, 'suivi_conducteurs/create_evaluation.html', context)
 
 
+@login_required
 @require_http_methods(["GET"])
-def load_criteres_htmx(request):
-    """Charge les critères actifs pour un type d'évaluation donné via HTMX"""
+async def rechercher_conducteurs_htmx(request):
+    """Conducteurs actifs dont le nom commence par q, filtrés par site et société, via HTMX (vue asynchrone)"""
+    recherche = request.GET.get('q', '').strip()
+    site_id = request.GET.get('site', '')
+    societe_id = request.GET.get('societe', '')
+
+    conducteurs = []
+    if len(recherche) >= RECHERCHE_CONDUCTEURS_LONGUEUR_MINI:
+        conducteurs_filtres = Conducteur.objects.actifs().nom_commencant_par(recherche)
+        if site_id.isdigit():
+            conducteurs_filtres = conducteurs_filtres.filter(site_id=site_id)
+        if societe_id.isdigit():
+            conducteurs_filtres = conducteurs_filtres.filter(salsocid_id=societe_id)
+        conducteurs = [
+            conducteur async for conducteur in conducteurs_filtres.only(
+                'salnom', 'salnom2', 'salsocid__socnom', 'site__nom_commune',
+            )[:RECHERCHE_CONDUCTEURS_LIMITE]
+        ]
+
+    context = {
+        'conducteurs': conducteurs,
+        'recherche': recherche,
+        'longueur_mini': RECHERCHE_CONDUCTEURS_LONGUEUR_MINI,
+        'limite_atteinte': len(conducteurs) == RECHERCHE_CONDUCTEURS_LIMITE,
+    }
+    return render(request, 'suivi_conducteurs/partials/conducteurs_suggestions.html', context)
+
+
+@require_http_methods(["GET"])
+async def load_criteres_htmx(request):
+    """Charge les critères actifs pour un type d'évaluation donné via HTMX (vue asynchrone)"""
     type_evaluation_id = request.GET.get('type_evaluation')
     
-    print(f"DEBUG: Tous les paramètres GET = {dict(request.GET)}")
-    print(f"DEBUG: type_evaluation reçu = {type_evaluation_id}")
-    
-    if not type_evaluation_id or type_evaluation_id == '':
-        print("DEBUG: Aucun type_evaluation fourni ou vide")
+    if not type_evaluation_id:
         return HttpResponse('')
     
     try:
-        type_evaluation = TypologieEvaluation.objects.get(id=type_evaluation_id)
-        print(f"DEBUG: Type d'évaluation trouvé = {type_evaluation.nom}")
-        
-        criteres = CritereEvaluation.objects.filter(
+        type_evaluation = await TypologieEvaluation.objects.aget(id=type_evaluation_id)
+    except (TypologieEvaluation.DoesNotExist, ValueError):
+        return HttpResponse('')
+    
+    criteres = [
+        critere async for critere in CritereEvaluation.objects.filter(
             type_evaluation=type_evaluation,
             actif=True
         ).order_by('numero_ordre')
-        
-        print(f"DEBUG: Nombre de critères actifs trouvés = {criteres.count()}")
-        for critere in criteres:
-            print(f"DEBUG: Critère {critere.nom} - Min: {critere.valeur_mini}, Max: {critere.valeur_maxi}, Actif: {critere.actif}")
-        
-        context = {
-            'criteres': criteres,
-            'type_evaluation': type_evaluation,
-        }
-        return render(request, 'suivi_conducteurs/partials/criteres_form.html', context)
+    ]
     
-    except TypologieEvaluation.DoesNotExist:
-        print("DEBUG: TypologieEvaluation non trouvée")
-        return HttpResponse('')
-    except Exception as e:
-        print(f"DEBUG: Erreur = {e}")
-        return HttpResponse('')
+    context = {
+        'criteres': criteres,
+        'type_evaluation': type_evaluation,
+        # Utilisateur résolu en asynchrone : le template n'accède pas à la base
+        'user': await request.auser(),
+    }
+    return render(request, 'suivi_conducteurs/partials/criteres_form.html', context)
 
 
 @require_http_methods(["POST"])
-def validate_field_htmx(request):
-    """Validation en temps réel d'un champ via HTMX"""
+async def validate_field_htmx(request):
+    """Validation en temps réel d'un champ via HTMX (vue asynchrone)"""
     field_name = request.POST.get('field_name')
     field_value = request.POST.get('field_value')
     critere_id = request.POST.get('critere_id')
@@ -129,22 +235,21 @@ def validate_field_htmx(request):
         return JsonResponse({'valid': False, 'error': 'Données manquantes'})
     
     try:
-        critere = CritereEvaluation.objects.get(id=critere_id)
-        
-        # Validation de la note
-        try:
-            note_value = int(field_value)
-            if note_value < critere.valeur_mini or note_value > critere.valeur_maxi:
-                return JsonResponse({
-                    'valid': False, 
-                    'error': f'Note entre {critere.valeur_mini} et {critere.valeur_maxi}'
-                })
-            return JsonResponse({'valid': True})
-        except ValueError:
-            return JsonResponse({'valid': False, 'error': 'Nombre requis'})
-    
-    except CritereEvaluation.DoesNotExist:
+        critere = await CritereEvaluation.objects.aget(id=critere_id)
+    except (CritereEvaluation.DoesNotExist, ValueError):
         return JsonResponse({'valid': False, 'error': 'Critère invalide'})
+    
+    # Validation de la note
+    try:
+        note_value = int(field_value)
+    except ValueError:
+        return JsonResponse({'valid': False, 'error': 'Nombre requis'})
+    if note_value < critere.valeur_mini or note_value > critere.valeur_maxi:
+        return JsonResponse({
+            'valid': False, 
+            'error': f'Note entre {critere.valeur_mini} et {critere.valeur_maxi}'
+        })
+    return JsonResponse({'valid': True})
 
 
 @require_http_methods(["POST"])
@@ -220,14 +325,12 @@ def submit_evaluation(request):
                 date_evaluation=date_evaluation
             )
             
-            # Création des notes
-            for critere_id, note_value in notes_data.items():
-                critere = CritereEvaluation.objects.get(id=critere_id)
-                Note.objects.create(
-                    evaluation=evaluation,
-                    critere=critere,
-                    valeur=note_value
-                )
+            # Création des notes en une requête : les statistiques et les cumuls
+            # de l'évaluation sont calculés depuis ses notes au commit (signals.py)
+            Note.objects.bulk_create([
+                Note(evaluation=evaluation, critere_id=critere_id, valeur=note_value)
+                for critere_id, note_value in notes_data.items()
+            ])
             
             messages.success(
                 request, 
@@ -283,10 +386,9 @@ def evaluation_detail(request, pk):
 def evaluation_list(request):
     """Liste des évaluations avec filtres et scores"""
     # Requête de base avec les relations nécessaires
-    evaluations = Evaluation.objects.select_related(
-        'conducteur', 'evaluateur', 'type_evaluation', 'conducteur__salsocid', 'conducteur__site'
-    ).prefetch_related(
-        'notes__critere'
+    evaluations = Evaluation.objects.avec_score().select_related(
+        'conducteur', 'evaluateur', 'type_evaluation', 'conducteur__salsocid', 'conducteur__site',
+        'evaluateur__user__profil__service'
     ).order_by('-date_evaluation')
     
     # Récupérer les filtres
@@ -341,10 +443,8 @@ def conducteur_list(request):
     statut_filter = request.GET.get('statut', '')
     
     # Requête de base avec les relations nécessaires
-    conducteurs = Conducteur.objects.select_related(
+    conducteurs = Conducteur.objects.avec_statistiques_evaluations().select_related(
         'salsocid', 'site'
-    ).prefetch_related(
-        'evaluation_set__notes__critere'
     ).order_by('salnom', 'salnom2')
     
     # Application des filtres
@@ -379,25 +479,20 @@ def conducteur_list(request):
     elif statut_filter == 'sous_traitant':
         conducteurs = conducteurs.filter(sous_traitant_p=True)
     
+    # Dernières évaluations des conducteurs filtrés, avec leur score, en une requête
+    dernieres_evaluations = Evaluation.objects.avec_score().filter(
+        pk__in=conducteurs.values('derniere_evaluation_id')
+    ).in_bulk()
+    
     # Ajouter des statistiques pour chaque conducteur
     conducteurs_with_stats = []
     for conducteur in conducteurs:
-        # Dernière évaluation
-        derniere_eval = conducteur.evaluation_set.order_by('-date_evaluation').first()
-        
-        # Score de la dernière évaluation
-        dernier_score = None
-        if derniere_eval:
-            dernier_score = derniere_eval.calculate_score()
-        
-        # Nombre total d'évaluations
-        nb_evaluations = conducteur.evaluation_set.count()
-        
+        derniere_eval = dernieres_evaluations.get(conducteur.derniere_evaluation_id)
         conducteurs_with_stats.append({
             'conducteur': conducteur,
             'derniere_evaluation': derniere_eval,
-            'dernier_score': dernier_score,
-            'nb_evaluations': nb_evaluations,
+            'dernier_score': derniere_eval.calculate_score() if derniere_eval else None,
+            'nb_evaluations': conducteur.nb_evaluations,
         })
     
     # Données pour les filtres
@@ -426,49 +521,49 @@ def conducteur_detail(request, pk):
         pk=pk
     )
     
-    # Évaluations du conducteur
-    evaluations = conducteur.evaluation_set.select_related(
+    # Évaluations du conducteur, scores et nombre de notes calculés en base
+    evaluations = list(conducteur.evaluation_set.select_related(
         'evaluateur', 'type_evaluation'
-    ).prefetch_related('notes__critere').order_by('-date_evaluation')
+    ).avec_score().annotate(nb_notes=Count('notes')).order_by('-date_evaluation', '-id'))
     
-    # Ajouter le score pour chaque évaluation
-    evaluations_with_scores = []
-    for evaluation in evaluations:
-        score = evaluation.calculate_score()
-        evaluations_with_scores.append({
-            'evaluation': evaluation,
-            'score': score
-        })
+    evaluations_with_scores = [
+        {'evaluation': evaluation, 'score': evaluation.calculate_score()}
+        for evaluation in evaluations
+    ]
+    scores_valides = [item['score'] for item in evaluations_with_scores if item['score'] is not None]
     
-    # Statistiques du conducteur
+    # Statistiques du conducteur ; historique par type lu dans le cache des scores
     stats = {
-        'nb_evaluations': evaluations.count(),
-        'derniere_evaluation': evaluations.first(),
-        'moyenne_scores': None,
-        'evaluations_par_type': {},
+        'nb_evaluations': len(evaluations),
+        'derniere_evaluation': evaluations[0] if evaluations else None,
+        'moyenne_scores': sum(scores_valides) / len(scores_valides) if scores_valides else None,
+        'scores_par_type': scores.avec_traces(scores.scores_conducteur(conducteur.pk)),
     }
     
-    # Calcul de la moyenne des scores
-    scores = [item['score'] for item in evaluations_with_scores if item['score'] is not None]
-    if scores:
-        stats['moyenne_scores'] = sum(scores) / len(scores)
-    
-    # Évaluations par type
-    from collections import defaultdict
-    evals_par_type = defaultdict(list)
-    for item in evaluations_with_scores:
-        type_nom = item['evaluation'].type_evaluation.nom
-        evals_par_type[type_nom].append(item)
-    stats['evaluations_par_type'] = dict(evals_par_type)
+    # Tendance du conducteur comparée à celles de son site et de sa société (cumuls mensuels)
+    tendances = cumuls.tendances(Q(site=conducteur.site_id) | Q(societe=conducteur.salsocid_id))
     
     context = {
         'conducteur': conducteur,
         'evaluations_with_scores': evaluations_with_scores,
         'stats': stats,
+        'tendance_conducteur': cumuls.tendance_evaluations(evaluations_with_scores),
+        'tendance_site': tendances['site'][conducteur.site_id],
+        'tendance_societe': tendances['societe'][conducteur.salsocid_id],
     }
     return render(request, 'suivi_conducteurs/conducteur_detail.html', context)
 
 
+@login_required
+@permission_required('suivi_conducteurs.view_conducteur', raise_exception=True)
+def conducteur_scores(request, pk):
+    """API : scores du conducteur par type d'évaluation et moyennes mobiles (JSON, en cache par conducteur)"""
+    serie = scores.scores_conducteur(pk)
+    if serie is None:
+        raise Http404("Conducteur introuvable")
+    return JsonResponse(serie)
+
+
 @login_required
 @permission_required('suivi_conducteurs.view_societe', raise_exception=True)
 def societe_list(request):
@@ -479,7 +574,6 @@ def societe_list(request):
     societes = Societe.objects.all().order_by('socnom')
     
     if search:
-        from django.db.models import Q
         societes = societes.filter(
             Q(socnom__icontains=search) |
             Q(soccode__icontains=search) |
@@ -492,22 +586,25 @@ def societe_list(request):
         societes = societes.filter(socactif=False)
     
     # Ajouter le nombre de conducteurs par société
+    societes = societes.annotate(
+        nb_conducteurs=Count('conducteur'),
+        nb_conducteurs_actifs=Count('conducteur', filter=Q(conducteur__salactif=True)),
+    )
     societes_with_stats = []
     total_conducteurs_global = 0
     total_conducteurs_actifs_global = 0
+    tendances = cumuls.tendances()['societe']
     
     for societe in societes:
-        nb_conducteurs = Conducteur.objects.filter(salsocid=societe).count()
-        nb_conducteurs_actifs = Conducteur.objects.filter(salsocid=societe, salactif=True).count()
-        
         # Ajouter au total global
-        total_conducteurs_global += nb_conducteurs
-        total_conducteurs_actifs_global += nb_conducteurs_actifs
+        total_conducteurs_global += societe.nb_conducteurs
+        total_conducteurs_actifs_global += societe.nb_conducteurs_actifs
         
         societes_with_stats.append({
             'societe': societe,
-            'nb_conducteurs': nb_conducteurs,
-            'nb_conducteurs_actifs': nb_conducteurs_actifs,
+            'nb_conducteurs': societe.nb_conducteurs,
+            'nb_conducteurs_actifs': societe.nb_conducteurs_actifs,
+            'tendance': tendances[societe.socid],
         })
     
     context = {
@@ -580,9 +677,20 @@ def site_list(request):
         sites_query = sites_query.filter(code_postal=code_postal_filter)
     
     # Récupérer les sites avec leurs statistiques
-    sites_with_annotations = sites_query.prefetch_related(
-        'conducteur_set__salsocid'
-    )
+    sites_with_annotations = list(sites_query)
+    
+    # Sociétés actives de chaque site (10 premières par nom), en une requête
+    societes_par_site = defaultdict(list)
+    couples = Societe.objects.filter(
+        socactif=True,
+        conducteur__site__in=[site.pk for site in sites_with_annotations]
+    ).annotate(site_id=F('conducteur__site')).distinct().order_by('socnom')
+    for societe in couples:
+        if len(societes_par_site[societe.site_id]) < 10:
+            societes_par_site[societe.site_id].append(societe)
+    
+    # Tendance mensuelle de chaque site (cumuls mensuels)
+    tendances = cumuls.tendances()['site']
     
     # Enrichir avec les listes de sociétés et calculer les totaux
     sites_with_stats = []
@@ -594,12 +702,6 @@ def site_list(request):
     total_societes_global = 0
     
     for site in sites_with_annotations:
-        # Récupérer les sociétés distinctes pour ce site
-        societes_sur_site = Societe.objects.filter(
-            conducteur__site=site,
-            socactif=True
-        ).distinct().order_by('socnom')[:10]
-        
         # Ajouter aux totaux globaux
         total_conducteurs_global += site.nb_conducteurs
         total_conducteurs_actifs_global += site.nb_conducteurs_actifs
@@ -616,7 +718,8 @@ def site_list(request):
             'nb_interims': site.nb_interims,
             'nb_sous_traitants': site.nb_sous_traitants,
             'nb_societes': site.nb_societes,
-            'societes_list': list(societes_sur_site)
+            'societes_list': societes_par_site[site.pk],
+            'tendance': tendances[site.pk],
         })
     
     # Codes postaux pour le filtre
@@ -651,78 +754,79 @@ def statistiques_view(request):
     }
     
     # Statistiques des conducteurs par catégorie
-    conducteurs_stats = {
-        'total_actifs': Conducteur.objects.filter(salactif=True).count(),
-        'total_inactifs': Conducteur.objects.filter(salactif=False).count(),
-        'interim': Conducteur.objects.filter(salactif=True, interim_p=True).count(),
-        'sous_traitants': Conducteur.objects.filter(salactif=True, sous_traitant_p=True).count(),
-        'permanents': Conducteur.objects.filter(salactif=True, interim_p=False, sous_traitant_p=False).count(),
-    }
+    conducteurs_stats = Conducteur.objects.aggregate(
+        total_actifs=Count('pk', filter=Q(salactif=True)),
+        total_inactifs=Count('pk', filter=Q(salactif=False)),
+        interim=Count('pk', filter=Q(salactif=True, interim_p=True)),
+        sous_traitants=Count('pk', filter=Q(salactif=True, sous_traitant_p=True)),
+        permanents=Count('pk', filter=Q(salactif=True, interim_p=False, sous_traitant_p=False)),
+    )
     
     # Conducteurs par site
-    conducteurs_par_site = []
-    for site in Site.objects.all():
-        count_actifs = Conducteur.objects.filter(site=site, salactif=True).count()
-        count_total = Conducteur.objects.filter(site=site).count()
-        if count_total > 0:
-            conducteurs_par_site.append({
-                'site': site,
-                'actifs': count_actifs,
-                'total': count_total,
-                'inactifs': count_total - count_actifs
-            })
+    conducteurs_par_site = [
+        {
+            'site': site,
+            'actifs': site.actifs,
+            'total': site.total,
+            'inactifs': site.total - site.actifs,
+        }
+        for site in Site.objects.annotate(
+            total=Count('conducteur'),
+            actifs=Count('conducteur', filter=Q(conducteur__salactif=True)),
+        ).filter(total__gt=0).order_by('nom_commune')
+    ]
     
     # Conducteurs par société
-    conducteurs_par_societe = []
-    for societe in Societe.objects.filter(socactif=True):
-        count_actifs = Conducteur.objects.filter(salsocid=societe, salactif=True).count()
-        count_total = Conducteur.objects.filter(salsocid=societe).count()
-        count_interim = Conducteur.objects.filter(salsocid=societe, salactif=True, interim_p=True).count()
-        count_sous_traitants = Conducteur.objects.filter(salsocid=societe, salactif=True, sous_traitant_p=True).count()
-        if count_total > 0:
-            conducteurs_par_societe.append({
-                'societe': societe,
-                'actifs': count_actifs,
-                'total': count_total,
-                'inactifs': count_total - count_actifs,
-                'interim': count_interim,
-                'sous_traitants': count_sous_traitants,
-                'permanents': count_actifs - count_interim - count_sous_traitants
-            })
-    
-    # Évaluations par mois (derniers 12 mois)
-    from datetime import date, timedelta
-    from django.db.models import Count
-    from django.db.models.functions import TruncMonth
-    
-    fin_periode = date.today()
-    debut_periode = fin_periode - timedelta(days=365)
-    
-    evaluations_par_mois = Evaluation.objects.filter(
-        date_evaluation__gte=debut_periode
-    ).annotate(
-        mois=TruncMonth('date_evaluation')
+    conducteurs_par_societe = [
+        {
+            'societe': societe,
+            'actifs': societe.actifs,
+            'total': societe.total,
+            'inactifs': societe.total - societe.actifs,
+            'interim': societe.interim,
+            'sous_traitants': societe.sous_traitants,
+            'permanents': societe.actifs - societe.interim - societe.sous_traitants,
+        }
+        for societe in Societe.objects.filter(socactif=True).annotate(
+            total=Count('conducteur'),
+            actifs=Count('conducteur', filter=Q(conducteur__salactif=True)),
+            interim=Count('conducteur', filter=Q(conducteur__salactif=True, conducteur__interim_p=True)),
+            sous_traitants=Count('conducteur', filter=Q(conducteur__salactif=True, conducteur__sous_traitant_p=True)),
+        ).filter(total__gt=0).order_by('socnom')
+    ]
+    
+    # Évaluations par mois (12 derniers mois), lues dans les cumuls mensuels
+    evaluations_par_mois = CumulSite.objects.depuis(
+        cumuls.debut_periode(cumuls.MOIS_TENDANCE - 1)
     ).values('mois').annotate(
-        count=Count('id')
-    ).order_by('mois')
+        count=Sum('nombre_evaluations')
+    ).filter(count__gt=0).order_by('mois')
+    
+    # Scores par type d'évaluation et notes par critère : calcul vectorisé sur les notes,
+    # refait seulement quand les données changent
+    stats_notes = analytics.statistiques_notes()
+    stats_par_type = stats_notes['par_type']
+    stats_par_critere = stats_notes['par_critere']
+    nb_evaluations_par_type = dict(
+        Evaluation.objects.order_by().values_list('type_evaluation').annotate(nombre=Count('id'))
+    )
     
-    # Scores moyens par type d'évaluation
     scores_par_type = {}
     for type_eval in TypologieEvaluation.objects.all():
-        evaluations = Evaluation.objects.filter(type_evaluation=type_eval)
-        scores = []
-        for eval in evaluations:
-            score = eval.calculate_score()
-            if score is not None:
-                scores.append(score)
-        
-        if scores:
+        if type_eval.pk in stats_par_type:
             scores_par_type[type_eval.nom] = {
-                'moyenne': sum(scores) / len(scores),
-                'count': len(scores),
-                'total_evaluations': evaluations.count()
+                **stats_par_type[type_eval.pk],
+                'total_evaluations': nb_evaluations_par_type.get(type_eval.pk, 0),
             }
     
+    criteres_stats = [
+        {'critere': critere, **stats_par_critere[critere.pk]}
+        for critere in CritereEvaluation.objects.filter(actif=True).select_related(
+            'type_evaluation'
+        ).order_by('type_evaluation__nom', 'numero_ordre')
+        if critere.pk in stats_par_critere
+    ]
+    
     context = {
         'stats': stats,
         'conducteurs_stats': conducteurs_stats,
@@ -730,5 +834,133 @@ def statistiques_view(request):
         'conducteurs_par_societe': conducteurs_par_societe,
         'evaluations_par_mois': list(evaluations_par_mois),
         'scores_par_type': scores_par_type,
+        'criteres_stats': criteres_stats,
     }
     return render(request, 'suivi_conducteurs/statistiques.html', context)
+
+
+@login_required
+@permission_required('suivi_conducteurs.view_evaluation', raise_exception=True)
+def fiabilite_criteres(request):
+    """Corrélations entre critères et alpha de Cronbach par type d'évaluation"""
+    context = {
+        'rapports': fiabilite.rapports(),
+        'seuil_redondance': fiabilite.SEUIL_REDONDANCE,
+        'seuil_fiabilite': fiabilite.SEUIL_FIABILITE,
+    }
+    return render(request, 'suivi_conducteurs/fiabilite_criteres.html', context)
+
+
+@login_required
+@permission_required('suivi_conducteurs.view_evaluateur', raise_exception=True)
+def calibrage_evaluateurs(request):
+    """Volume, score moyen normalisé et écart à la moyenne du site par critère de chaque évaluateur"""
+    try:
+        periode = int(request.GET.get('periode', 12))
+    except ValueError:
+        periode = 12
+    if periode not in PERIODES_CALIBRAGE:
+        periode = 12
+
+    depuis = cumuls.debut_periode(periode) if periode else None
+
+    context = {
+        **cumuls.calibrage(depuis),
+        'periode': periode,
+        'periodes': PERIODES_CALIBRAGE,
+        'depuis': depuis,
+        'notes_minimum': cumuls.NOTES_MINIMUM,
+        'seuil_ecart': cumuls.SEUIL_ECART,
+    }
+    return render(request, 'suivi_conducteurs/calibrage_evaluateurs.html', context)
+
+
+def entier_ou_none(valeur):
+    try:
+        return int(valeur)
+    except (ValueError, TypeError):
+        return None
+
+
+@login_required
+@permission_required('suivi_conducteurs.view_conducteur', raise_exception=True)
+def echeances_evaluations(request):
+    """Évaluations en retard ou bientôt dues, par site, évaluateur et type"""
+    site_id = entier_ou_none(request.GET.get('site'))
+    evaluateur_id = entier_ou_none(request.GET.get('evaluateur'))
+    type_id = entier_ou_none(request.GET.get('type_evaluation'))
+    horizon = entier_ou_none(request.GET.get('horizon'))
+    if horizon not in echeances.HORIZONS:
+        horizon = echeances.HORIZONS[0]
+
+    liste, compteurs = echeances.a_faire(horizon, site=site_id, evaluateur=evaluateur_id, type_evaluation=type_id)
+    paginator = Paginator(liste, ECHEANCES_PAR_PAGE)
+    # Total déjà compté par a_faire : pas de second COUNT
+    paginator.count = compteurs['en_retard'] + compteurs['a_venir']
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    # Filtres conservés par la pagination
+    parametres = request.GET.copy()
+    parametres.pop('page', None)
+
+    context = {
+        'page_obj': page_obj,
+        'compteurs': compteurs,
+        'aujourd_hui': timezone.localdate(),
+        'horizon': horizon,
+        'horizons': echeances.HORIZONS,
+        'parametres': parametres.urlencode(),
+        'sites': Site.objects.order_by('nom_commune'),
+        'evaluateurs': Evaluateur.objects.select_related(None).prefetch_related(None).order_by('nom', 'prenom'),
+        'types_evaluation': TypologieEvaluation.objects.filter(frequence_jours__isnull=False).order_by('nom'),
+        'site_filter': site_id,
+        'evaluateur_filter': evaluateur_id,
+        'type_filter': type_id,
+    }
+    return render(request, 'suivi_conducteurs/echeances.html', context)
+
+
+@login_required
+@permission_required('suivi_conducteurs.view_evaluation', raise_exception=True)
+def alertes_scores(request):
+    """Scores sous le seuil ou en forte baisse, les plus récents d'abord"""
+    statut = request.GET.get('statut', 'ouvertes')
+    if statut not in STATUTS_ALERTES:
+        statut = 'ouvertes'
+
+    liste = AlerteScore.objects.filter(STATUTS_ALERTES[statut]).select_related(
+        'evaluation__conducteur__site', 'evaluation__type_evaluation', 'evaluation__evaluateur',
+    ).order_by('-date_evaluation', '-id')
+    paginator = Paginator(liste, ALERTES_PAR_PAGE)
+    if statut == 'ouvertes':
+        # Total déjà tenu pour le badge du tableau de bord : pas de COUNT
+        paginator.count = alertes.nombre_ouvertes()
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    context = {
+        'page_obj': page_obj,
+        'statut': statut,
+        'parametres': f'statut={statut}',
+        'seuil': settings.ALERTES_SCORE_SEUIL,
+        'baisse': settings.ALERTES_SCORE_BAISSE,
+    }
+    return render(request, 'suivi_conducteurs/alertes_scores.html', context)
+
+
+@login_required
+@permission_required('suivi_conducteurs.change_evaluation', raise_exception=True)
+@require_http_methods(["POST"])
+def traiter_alerte(request, pk):
+    """Marque une alerte traitée (ou la rouvre)"""
+    alerte = get_object_or_404(AlerteScore, pk=pk)
+    alerte.traitee = request.POST.get('traitee') != '0'
+    alerte.save(update_fields=['traitee'])
+
+    # Retour à la page de la liste d'où vient l'action
+    statut = request.POST.get('statut')
+    parametres = {'statut': statut if statut in STATUTS_ALERTES else 'ouvertes'}
+    page = entier_ou_none(request.POST.get('page'))
+    if page:
+        parametres['page'] = page
+    return redirect(f"{reverse('suivi_conducteurs:alertes_scores')}?{urlencode(parametres)}")
+